@@ -0,0 +1,222 @@
+"""Cold-storage archival of completed interviews.
+
+Interviews completed more than N days ago are moved out of the hot tables
+into gzip-compressed JSONL files partitioned by completion month:
+
+    {ARCHIVE_DIR}/{YYYY-MM}/interviews.jsonl.gz
+
+Each interview is written as its own gzip member (concatenated members are
+still one valid .gz file), and the member's byte offset is kept on the stub
+row, so rehydrating one interview is a seek plus decompressing a few KB.
+
+The stub left in `interviews` keeps every column the admin lists, stats and
+analytics need (ids, date, type, status, scores, completed_at) and drops the
+transcript; questions, responses and feedback rows are deleted. The
+questions' fingerprints stay on the stub (`question_fingerprints`) so
+near-duplicate detection keeps seeing what the candidate was asked.
+
+Run periodically (or via ``POST /api/admin/interviews/archive``):
+
+    python -m app.archive --older-than-days 180
+
+Runners take a lock file in ARCHIVE_DIR, so a second concurrent run (another
+worker, or the CLI) fails with `ArchiveBusy` instead of appending the same
+interviews twice.
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+from sqlalchemy.orm import Session, selectinload, undefer
+
+from . import models
+from .core_config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE_NAME = "interviews.jsonl.gz"
+LOCK_FILE_NAME = ".archive.lock"
+
+
+class ArchiveBusy(RuntimeError):
+    """Another archive run holds the lock."""
+
+
+@contextmanager
+def _runner_lock() -> Iterator[None]:
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(settings.ARCHIVE_DIR, LOCK_FILE_NAME), "a+b") as fh:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise ArchiveBusy("Another archive run is in progress") from None
+        yield  # released when the file is closed
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def serialize_interview(interview: models.Interview) -> Dict[str, Any]:
+    """Full record of an interview with its questions, responses and feedback."""
+    feedback = interview.feedback
+    return {
+        "interview_id": interview.interview_id,
+        "candidate_id": interview.candidate_id,
+        "interviewer_id": interview.interviewer_id,
+        "date": _iso(interview.date),
+        "time": _iso(interview.time),
+        "type": interview.type,
+        "status": interview.status,
+        "overall_score": interview.overall_score,
+        "completed_at": _iso(interview.completed_at),
+        "tavus_conversation_id": interview.tavus_conversation_id,
+        "tavus_conversation_url": interview.tavus_conversation_url,
+        "recording_url": interview.recording_url,
+        "transcript": interview.transcript,
+        "questions": [
+            {
+                "question_id": q.question_id,
+                "category_id": q.category_id,
+                "question_text": q.question_text,
+                "response": (
+                    {
+                        "answer_text": q.response.answer_text,
+                        "relevance_score": q.response.relevance_score,
+                        "confidence_level": q.response.confidence_level,
+                    }
+                    if q.response
+                    else None
+                ),
+            }
+            for q in sorted(interview.questions, key=lambda q: q.question_id)
+        ],
+        "feedback": (
+            {
+                "comments": feedback.comments,
+                "suggestions": feedback.suggestions,
+                "report_url": feedback.report_url,
+            }
+            if feedback
+            else None
+        ),
+    }
+
+
+def _archive_key(completed_at: datetime) -> str:
+    return f"{completed_at:%Y-%m}/{ARCHIVE_FILE_NAME}"
+
+
+def _append_member(key: str, record: Dict[str, Any]) -> int:
+    """Append `record` as one gzip member to the archive file; returns its offset."""
+    path = os.path.join(settings.ARCHIVE_DIR, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+    with open(path, "ab") as fh:
+        offset = fh.tell()
+        fh.write(gzip.compress(line))
+        fh.flush()
+        # The hot rows are deleted right after this; make sure the copy is durable first.
+        os.fsync(fh.fileno())
+    return offset
+
+
+def archive_completed_interviews(
+    db: Session, older_than_days: int, batch_size: int = 200
+) -> int:
+    """Archive interviews completed more than `older_than_days` ago; returns the count.
+
+    Raises ArchiveBusy if another run is in progress.
+    """
+    with _runner_lock():
+        return _archive_batches(db, older_than_days, batch_size)
+
+
+def _archive_batches(db: Session, older_than_days: int, batch_size: int) -> int:
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        batch: List[models.Interview] = (
+            db.query(models.Interview)
+            .options(
+                undefer(models.Interview.transcript),
+                selectinload(models.Interview.questions).selectinload(models.Question.response),
+                selectinload(models.Interview.questions).undefer(models.Question.fingerprint),
+                selectinload(models.Interview.feedback).undefer_group("feedback_text"),
+            )
+            .filter(
+                models.Interview.status == "Completed",
+                models.Interview.completed_at < cutoff,
+                models.Interview.archived_at.is_(None),
+            )
+            .order_by(models.Interview.interview_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return archived
+
+        for interview in batch:
+            key = _archive_key(interview.completed_at)
+            offset = _append_member(key, serialize_interview(interview))
+
+            interview.archive_path = key
+            interview.archive_offset = offset
+            interview.archived_at = datetime.now()
+            interview.transcript = None
+            interview.question_fingerprints = b"".join(
+                q.fingerprint for q in sorted(interview.questions, key=lambda q: q.question_id) if q.fingerprint
+            ) or None
+            interview.questions.clear()  # delete-orphan cascades to responses
+            if interview.feedback is not None:
+                db.delete(interview.feedback)
+
+        db.commit()
+        archived += len(batch)
+        logger.info("Archived %s interviews (up to id %s)", archived, batch[-1].interview_id)
+
+
+def load_archived_interview(interview: models.Interview) -> Dict[str, Any]:
+    """Rehydrate the full record of an archived interview from its archive file."""
+    path = os.path.join(settings.ARCHIVE_DIR, interview.archive_path)
+    decoder = zlib.decompressobj(wbits=31)  # a single gzip member
+    chunks = []
+    with open(path, "rb") as fh:
+        fh.seek(interview.archive_offset)
+        while not decoder.eof:
+            data = fh.read(64 * 1024)
+            if not data:
+                break
+            chunks.append(decoder.decompress(data))
+    return json.loads(b"".join(chunks))
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archive completed interviews to cold storage")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        count = archive_completed_interviews(db, args.older_than_days, args.batch_size)
+    print(f"Archived {count} interviews to {settings.ARCHIVE_DIR}")
@@ -1,5 +1,19 @@
+"""Password hashing and JWT helpers.
+
+bcrypt is deliberately slow (~250 ms of CPU per hash at the default cost), so
+it runs in a small process pool instead of on the request threads: the GIL is
+not held while a request waits for its hash, and at most
+PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE requests wait at once. Past
+that, `PasswordHasherBusy` is raised and the API answers 503 with Retry-After
+rather than queueing logins until they time out.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, Callable, Optional, Union
 
 import bcrypt
 from jose import jwt
@@ -9,22 +23,139 @@ from .core_config import get_settings
 settings = get_settings()
 
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt."""
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-    return hashed.decode("utf-8")
+# --- Worker functions (run in the pool processes) ----------------------------------
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against a hashed password."""
+def _bcrypt_hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _bcrypt_check(plain_password: str, hashed_password: str) -> bool:
     try:
-        return bcrypt.checkpw(
-            plain_password.encode("utf-8"), hashed_password.encode("utf-8")
-        )
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
     except Exception:
         return False
 
 
+def _noop() -> None:
+    return None
+
+
+# --- Pool ----------------------------------------------------------------------------
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot is taken; the caller should retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Password hashing is at capacity")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """bcrypt in a process pool, with a bounded number of waiting callers."""
+
+    def __init__(self, workers: int, queue_size: int, rounds: int, retry_after: int) -> None:
+        self.workers = workers
+        self.rounds = rounds
+        self.retry_after = retry_after
+        self.capacity = max(workers, 1) + max(queue_size, 0)
+        self.in_use = 0  # hashing or queued; read by the saturation gauges
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # With fork, the executor starts every worker on first use, which
+                # start() makes app startup, before request threads exist. The
+                # children only run bcrypt and never touch the inherited DB pool.
+                # (spawn would re-run unguarded __main__ scripts in every worker.)
+                method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+                )
+            return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy(self.retry_after)
+        with self._lock:
+            self.in_use += 1
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            for attempt in range(2):
+                pool = self._executor()
+                try:
+                    return pool.submit(fn, *args).result()
+                except BrokenProcessPool:
+                    # A worker died (OOM kill, ...): start a fresh pool and retry once
+                    self._discard(pool)
+                    if attempt:
+                        raise
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_bcrypt_hash, password, self.rounds)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_bcrypt_check, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True if `hashed_password` was made with a different cost than BCRYPT_ROUNDS."""
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def start(self) -> None:
+        """Start the worker processes now so the first logins don't pay for it."""
+        if self.workers > 0:
+            pool = self._executor()
+            for future in [pool.submit(_noop) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    rounds=settings.BCRYPT_ROUNDS,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password using bcrypt (in the hashing pool)."""
+    return password_hasher.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a plain password against a hashed password (in the hashing pool)."""
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash should be upgraded to the configured BCRYPT_ROUNDS."""
+    return password_hasher.needs_rehash(hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None) -> str:
     """Create a encoded JWT access token."""
     to_encode = data.copy()
@@ -0,0 +1,229 @@
+"""Record/replay of Gemini and Tavus HTTP traffic ("cassettes").
+
+With UPSTREAM_CASSETTE_MODE=record, every request the services make goes out
+as usual and the request/response pair is appended to
+``UPSTREAM_CASSETTE_DIR/<service>.jsonl``. With ``replay`` nothing goes out:
+each request is answered from the cassette, so prompt building, response
+parsing and everything downstream can be run and timed without keys or a
+network.
+
+- Secrets never reach the file: key parameters are dropped from URLs,
+  request headers are not stored, and configured API keys are masked
+  wherever they appear.
+- Requests match on method, URL path and query, and body, with whitespace
+  runs inside JSON strings collapsed, so reflowing a prompt template keeps
+  its recordings. The host is ignored: a cassette recorded against one base
+  URL (GEMINI_BASE_URL, TAVUS_BASE_URL) replays under any other.
+  A request recorded several times (transcript polls) replays its responses
+  in order, then repeats the last one.
+- UPSTREAM_CASSETTE_LATENCY replays instantly (``none``), with the recorded
+  latency (``recorded``) or with a fixed delay in milliseconds.
+- A request with no recording fails like a network error (`CassetteMiss`).
+
+`tracing.traced_session` mounts `CassetteAdapter` beneath its tracing adapter,
+so replayed calls still show up as client spans and in upstream metrics.
+Record with a single worker process; each process rewrites its cassettes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .core_config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+REDACTED = "REDACTED"
+MAX_STORED_BODY_CHARS = 4000  # requests still match on the full body; this is for reading
+
+_SECRET_PARAMS = {"key", "api_key", "apikey", "token", "access_token"}
+_SECRET_SETTINGS = ("GEMINI_API_KEY", "TAVUS_API_KEY", "OPENROUTER_API_KEY", "SUPABASE_KEY")
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Replay has no recorded response for a request."""
+
+
+def _redact(text: str) -> str:
+    for name in _SECRET_SETTINGS:
+        secret = getattr(settings, name, None)
+        if secret:
+            text = text.replace(secret, REDACTED)
+    return text
+
+
+def redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in _SECRET_PARAMS]
+    return _redact(urlunsplit(parts._replace(query=urlencode(query))))
+
+
+def _collapse(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, list):
+        return [_collapse(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _collapse(v) for k, v in value.items()}
+    return value
+
+
+def normalize_body(body: bytes) -> str:
+    """The request body as matched: canonical JSON with whitespace collapsed, secrets masked."""
+    if not body:
+        return ""
+    text = body.decode("utf-8", "replace")
+    try:
+        text = json.dumps(_collapse(json.loads(text)), sort_keys=True)
+    except ValueError:
+        text = " ".join(text.split())
+    return _redact(text)
+
+
+def _read_body(request: requests.PreparedRequest) -> bytes:
+    body = request.body
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode()
+    if isinstance(body, bytes):
+        return body
+    # A streamed body (Gemini's inline PDFs) can only be read once: send the bytes instead
+    data = body.read() if hasattr(body, "read") else b"".join(body)
+    request.body = data
+    return data
+
+
+def _replay_delay(entry: Dict[str, Any]) -> float:
+    latency = settings.UPSTREAM_CASSETTE_LATENCY.lower()
+    if latency == "none":
+        return 0.0
+    if latency == "recorded":
+        return entry["elapsed_ms"] / 1000
+    return float(latency) / 1000
+
+
+class Cassette:
+    """One service's recordings, shared by every adapter of this process."""
+
+    def __init__(self, path: str, mode: str) -> None:
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        if mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            open(path, "w").close()
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["match"], []).append(entry)
+        except FileNotFoundError:
+            logger.warning("Cassette %s does not exist; every request will miss", self.path)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as out:
+            out.write(json.dumps(entry) + "\n")
+
+    def next(self, match: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(match)
+            if not entries:
+                return None
+            served = self._served.get(match, 0)
+            self._served[match] = served + 1
+            return entries[min(served, len(entries) - 1)]
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(name: str) -> Optional[Cassette]:
+    """The cassette for service `name` in the configured mode, or None when the mode is ``off``."""
+    mode = settings.UPSTREAM_CASSETTE_MODE.lower()
+    if mode not in MODES:
+        raise RuntimeError(f"Unknown UPSTREAM_CASSETTE_MODE {settings.UPSTREAM_CASSETTE_MODE!r}")
+    if mode == "off":
+        return None
+    latency = settings.UPSTREAM_CASSETTE_LATENCY.lower()
+    if latency not in ("none", "recorded"):
+        try:
+            float(latency)
+        except ValueError:
+            raise RuntimeError(f"Unknown UPSTREAM_CASSETTE_LATENCY {settings.UPSTREAM_CASSETTE_LATENCY!r}") from None
+    path = os.path.join(settings.UPSTREAM_CASSETTE_DIR, f"{name}.jsonl")
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path, mode)
+        return _cassettes[path]
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Records the traffic it sends to `cassette`, or answers from it in replay mode."""
+
+    def __init__(self, cassette: Cassette, *args: Any, **kwargs: Any) -> None:
+        self.cassette = cassette
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        url = redact_url(request.url)
+        body = normalize_body(_read_body(request))
+        target = urlsplit(url)._replace(scheme="", netloc="").geturl()
+        match = hashlib.sha256(f"{request.method} {target}\n{body}".encode()).hexdigest()
+        if self.cassette.mode == "replay":
+            return self._replay(request, url, match)
+
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content
+        self.cassette.add({
+            "match": match,
+            "method": request.method,
+            "url": url,
+            "request_body": body[:MAX_STORED_BODY_CHARS],
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {"Content-Type": response.headers.get("Content-Type", "application/json")},
+            "response": _redact(content.decode(response.encoding or "utf-8", "replace")),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return response
+
+    def _replay(self, request, url: str, match: str) -> requests.Response:
+        entry = self.cassette.next(match)
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for {request.method} {url} in {self.cassette.path}", request=request)
+        delay = _replay_delay(entry)
+        if delay:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["response"].encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=delay)
+        response.connection = self
+        return response
@@ -0,0 +1,146 @@
+"""Transparent compression for large text columns.
+
+`CompressedText` is a drop-in column type: routers keep reading and writing
+`str`, while the database stores compressed bytes.
+
+Stored format (a BLOB / bytea):
+
+- values shorter than `MIN_COMPRESS_BYTES`, or that do not shrink, are stored
+  as plain UTF-8 bytes;
+- compressed values start with the two-byte header ``0xC0 <codec>``. 0xC0 can
+  never occur in valid UTF-8, so a header can't be confused with plain text
+  and rows written before the migration (plain TEXT, or bytea produced by
+  ``convert_to``) keep decoding as-is.
+
+zstd (the optional `zstandard` package) is used when installed, optionally
+with a trained dictionary (COMPRESSION_DICT_PATH), which helps a lot on short
+answers that share vocabulary; otherwise zlib.
+"""
+
+import argparse
+import struct
+import zlib
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from .core_config import get_settings
+
+try:  # Optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+
+settings = get_settings()
+
+MAGIC = 0xC0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_ZSTD_DICT = 3  # followed by the 4-byte dictionary id
+
+MIN_COMPRESS_BYTES = 256
+
+
+@lru_cache
+def _zstd_dict() -> Optional["zstandard.ZstdCompressionDict"]:
+    if zstandard is None or not settings.COMPRESSION_DICT_PATH:
+        return None
+    with open(settings.COMPRESSION_DICT_PATH, "rb") as fh:
+        return zstandard.ZstdCompressionDict(fh.read())
+
+
+def _codec() -> str:
+    if settings.COMPRESSION_CODEC == "zstd" and zstandard is None:
+        return "zlib"
+    return settings.COMPRESSION_CODEC
+
+
+def compress_text(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES or _codec() == "none":
+        return raw
+
+    if _codec() == "zstd":
+        dictionary = _zstd_dict()
+        if dictionary is not None:
+            body = zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL, dict_data=dictionary).compress(raw)
+            packed = bytes([MAGIC, CODEC_ZSTD_DICT]) + struct.pack(">I", dictionary.dict_id()) + body
+        else:
+            packed = bytes([MAGIC, CODEC_ZSTD]) + zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL).compress(raw)
+    else:
+        packed = bytes([MAGIC, CODEC_ZLIB]) + zlib.compress(raw, min(settings.COMPRESSION_LEVEL, 9))
+
+    return packed if len(packed) < len(raw) else raw
+
+
+def decompress_text(value: bytes) -> str:
+    if len(value) < 2 or value[0] != MAGIC:
+        return value.decode("utf-8")
+
+    codec = value[1]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(value[2:]).decode("utf-8")
+    if zstandard is None:
+        raise RuntimeError("Value is zstd-compressed but the `zstandard` package is not installed")
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(value[2:]).decode("utf-8")
+    if codec == CODEC_ZSTD_DICT:
+        (dict_id,) = struct.unpack(">I", value[2:6])
+        dictionary = _zstd_dict()
+        if dictionary is None or dictionary.dict_id() != dict_id:
+            raise RuntimeError(f"Value needs zstd dictionary {dict_id}; set COMPRESSION_DICT_PATH to it")
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(value[6:]).decode("utf-8")
+    raise ValueError(f"Unknown compression codec {codec}")
+
+
+def is_compressed(value: bytes) -> bool:
+    return len(value) >= 2 and value[0] == MAGIC
+
+
+class CompressedText(TypeDecorator):
+    """A `Text`-like column stored compressed; see the module docstring."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):  # legacy TEXT row on SQLite
+            return value
+        return decompress_text(bytes(value))
+
+
+def train_dictionary(samples: Iterable[str], dict_size: int = 112_640) -> bytes:
+    """Train a zstd dictionary from representative texts (needs `zstandard`)."""
+    if zstandard is None:
+        raise RuntimeError("Training a dictionary requires the `zstandard` package")
+    data = [s.encode("utf-8") for s in samples if s]
+    return zstandard.train_dictionary(dict_size, data).as_bytes()
+
+
+if __name__ == "__main__":
+    # python -m app.compression train-dict --out resume.dict
+    parser = argparse.ArgumentParser(description="Compression utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train-dict", help="Train a zstd dictionary from stored answers and resumes")
+    train.add_argument("--out", required=True)
+    train.add_argument("--limit", type=int, default=5000)
+    args = parser.parse_args()
+
+    from . import models
+    from .db import SessionLocal
+
+    with SessionLocal() as db:
+        texts = [t for (t,) in db.query(models.Response.answer_text).limit(args.limit)]
+        texts += [t for (t,) in db.query(models.User.resume_raw).limit(args.limit)]
+    with open(args.out, "wb") as fh:
+        fh.write(train_dictionary(texts))
+    print(f"Wrote dictionary trained on {len(texts)} samples to {args.out}")
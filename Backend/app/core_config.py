@@ -23,12 +23,107 @@ class Settings:
     TAVUS_API_KEY: str | None = os.getenv("TAVUS_API_KEY")
     TAVUS_PERSONA_ID: str | None = os.getenv("TAVUS_PERSONA_ID")
     TAVUS_REPLICA_ID: str | None = os.getenv("TAVUS_REPLICA_ID")
+    # Overridable so load tests can point the services at local stand-ins
+    GEMINI_BASE_URL: str = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1")
+    TAVUS_BASE_URL: str = os.getenv("TAVUS_BASE_URL", "https://tavusapi.com")
 
     # JWT Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-for-development-only")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "43200")) # 30 days default
 
+    # Password hashing (see app/auth_utils.py). Hashes with another cost are upgraded on login.
+    # Workers + queue bounds the request threads waiting on bcrypt; keep it under the
+    # threadpool size (40) so a login burst can't starve other routes. 0 workers hashes inline.
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "16"))
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "2"))
+
+    # Compression for large text columns (see app/compression.py).
+    # "zstd" falls back to zlib when the zstandard package is missing; "none" stores plain UTF-8.
+    COMPRESSION_CODEC: str = os.getenv("COMPRESSION_CODEC", "zstd")
+    COMPRESSION_LEVEL: int = int(os.getenv("COMPRESSION_LEVEL", "6"))
+    COMPRESSION_DICT_PATH: str | None = os.getenv("COMPRESSION_DICT_PATH")
+
+    # Authenticated-user cache used by get_current_user
+    IDENTITY_CACHE_TTL_SECONDS: float = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+    IDENTITY_CACHE_MAX_ENTRIES: int = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000"))
+
+    # How long computed score analytics may be served from cache. A candidate's history is
+    # cleared when their scores change; cohort results are only refreshed by this TTL
+    ANALYTICS_CACHE_TTL_SECONDS: float = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+
+    # Near-duplicate question filter (see app/services/question_dedup.py)
+    QUESTION_DEDUP_THRESHOLD: float = float(os.getenv("QUESTION_DEDUP_THRESHOLD", "0.7"))
+    QUESTION_DEDUP_MAX_ATTEMPTS: int = int(os.getenv("QUESTION_DEDUP_MAX_ATTEMPTS", "2"))
+
+    # File storage (see app/services/storage.py): "supabase" or "local"
+    SUPABASE_URL: str | None = os.getenv("SUPABASE_URL")
+    SUPABASE_KEY: str | None = os.getenv("SUPABASE_KEY")
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "supabase" if os.getenv("SUPABASE_URL") else "local")
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "./storage")
+    # Where this API is reachable from browsers; used in links to locally stored files
+    PUBLIC_BASE_URL: str = os.getenv("PUBLIC_BASE_URL", "http://localhost:8001")
+    STORAGE_IO_THREADS: int = int(os.getenv("STORAGE_IO_THREADS", "8"))
+    STORAGE_MULTIPART_THRESHOLD: int = int(os.getenv("STORAGE_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+    STORAGE_PART_SIZE: int = int(os.getenv("STORAGE_PART_SIZE", str(2 * 1024 * 1024)))
+    STORAGE_UPLOAD_CONCURRENCY: int = int(os.getenv("STORAGE_UPLOAD_CONCURRENCY", "4"))
+    # Signed links to private files: lifetime, and how long a handed-out link must stay valid
+    SIGNED_URL_TTL_SECONDS: int = int(os.getenv("SIGNED_URL_TTL_SECONDS", "3600"))
+    SIGNED_URL_MIN_REMAINING_SECONDS: int = int(os.getenv("SIGNED_URL_MIN_REMAINING_SECONDS", "900"))
+    SIGNED_URL_CACHE_MAX_ENTRIES: int = int(os.getenv("SIGNED_URL_CACHE_MAX_ENTRIES", "50000"))
+    # Deduplicated document blobs (see app/services/blobs.py)
+    DOCUMENT_VERSIONS_KEEP: int = int(os.getenv("DOCUMENT_VERSIONS_KEEP", "10"))
+    BLOB_GC_GRACE_SECONDS: int = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+    BLOB_GC_INTERVAL_SECONDS: int = int(os.getenv("BLOB_GC_INTERVAL_SECONDS", "3600"))  # 0 disables
+
+    # Uploaded PDFs (resumes, documents); see app/uploads.py
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    MAX_UPLOAD_PAGES: int = int(os.getenv("MAX_UPLOAD_PAGES", "30"))
+
+    # Resume text extraction (see app/services/resume_extraction.py): local text below
+    # this quality score (0..1) is re-extracted by Gemini
+    PDF_QUALITY_THRESHOLD: float = float(os.getenv("PDF_QUALITY_THRESHOLD", "0.5"))
+    PDF_EXTRACT_WORKERS: int = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "4"))
+
+    # Cold storage for completed interviews (see app/archive.py)
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "./archive")
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+    # Incremental exports (see app/export.py) stop this far behind now, longer than any
+    # transaction that changes an interview stays open (Gemini/Tavus calls included)
+    EXPORT_SETTLE_SECONDS: int = int(os.getenv("EXPORT_SETTLE_SECONDS", "300"))
+
+    # GET /metrics (Prometheus); when set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # Request tracing (see app/tracing.py): "file", "otlp" or "none" (off, the default).
+    # Traces slower than TRACE_SLOW_MS (or failing) are always kept, others with
+    # probability TRACE_SAMPLE_RATE.
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "./traces.jsonl")
+    # TRACE_FILE is moved to TRACE_FILE.1 (replacing it) once it grows past this
+    TRACE_FILE_MAX_BYTES: int = int(os.getenv("TRACE_FILE_MAX_BYTES", str(100 * 1024 * 1024)))
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SERVICE_NAME: str = os.getenv("TRACE_SERVICE_NAME", "interviewdost-api")
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    TRACE_SLOW_MS: int = int(os.getenv("TRACE_SLOW_MS", "1000"))
+
+    # Per-request profiling (see app/profiling.py): admins send "X-Profile: 1", or a
+    # PROFILE_SAMPLE_RATE share of all requests is profiled (0 = only on request)
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_TRACEMALLOC_FRAMES: int = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+    PROFILE_MAX_KEPT: int = int(os.getenv("PROFILE_MAX_KEPT", "100"))
+
+    # Gemini/Tavus record/replay (see app/cassettes.py): "off", "record" or "replay".
+    # UPSTREAM_CASSETTE_LATENCY is "none", "recorded" or a fixed delay in milliseconds.
+    UPSTREAM_CASSETTE_MODE: str = os.getenv("UPSTREAM_CASSETTE_MODE", "off")
+    UPSTREAM_CASSETTE_DIR: str = os.getenv("UPSTREAM_CASSETTE_DIR", "./cassettes")
+    UPSTREAM_CASSETTE_LATENCY: str = os.getenv("UPSTREAM_CASSETTE_LATENCY", "none")
+
 
 @lru_cache
 def get_settings() -> Settings:
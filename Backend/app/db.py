@@ -2,6 +2,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from .core_config import get_settings
+from . import tracing
+from .metrics import instrument_engine
 
 
 settings = get_settings()
@@ -12,11 +14,28 @@ if settings.DATABASE_URL.startswith("sqlite"):
     connect_args["check_same_thread"] = False
 
 engine = create_engine(settings.DATABASE_URL, echo=False, connect_args=connect_args)
+instrument_engine(engine)
+tracing.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+def dialect_insert(db, table):
+    """Return an INSERT for `table` that supports ``on_conflict_do_*`` on the bound dialect.
+
+    Both SQLite and PostgreSQL implement ``INSERT ... ON CONFLICT``; SQLAlchemy
+    only exposes it through the dialect-specific insert constructs. `db` is a
+    Session or a Connection (as handed to mapper events).
+    """
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 # Dependency for FastAPI routes
 def get_db():
     db = SessionLocal()
@@ -1,18 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from . import models, schemas
 from .core_config import get_settings
-from .db import get_db
+from .db import SessionLocal, get_db
 
 settings = get_settings()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
-    """Dependency to get the current authenticated user."""
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller: identity fields only, no ORM state.
+
+    Routes that need the full `models.User` (resume text, relationships,
+    or to modify it) should depend on `get_current_user_model` instead.
+    """
+
+    user_id: int
+    name: Optional[str]
+    email: Optional[str]
+    role: Optional[str]
+    is_active: bool
+
+
+class IdentityCache:
+    """Bounded LRU of user_id -> Principal with a per-entry TTL.
+
+    Entries are dropped whenever a User row is updated or deleted through the
+    ORM in this process (see the listeners below); the TTL bounds staleness
+    for changes made by other processes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.user_id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(principal.user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache(
+    max_entries=settings.IDENTITY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.IDENTITY_CACHE_TTL_SECONDS,
+)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: models.User) -> None:
+    identity_cache.invalidate(target.user_id)
+    # Drop it again after commit: a concurrent request may have re-cached the
+    # old committed row between this flush and the commit.
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.user_id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for user_id in session.info.pop("changed_user_ids", ()):
+        identity_cache.invalidate(user_id)
+
+
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    # Plain column query: no ORM identity/state overhead and never the resume columns
+    row = (
+        db.query(models.User.name, models.User.email, models.User.role, models.User.is_active)
+        .filter(models.User.user_id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return Principal(
+        user_id=user_id,
+        name=row.name,
+        email=row.email,
+        role=row.role,
+        is_active=bool(row.is_active),
+    )
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Dependency to get the current authenticated user.
+
+    Served from `identity_cache` after the first request, so the common
+    path is a JWT decode plus a dictionary lookup.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,12 +135,48 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.user_id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    
-    if not user.is_active:
+
+    principal = identity_cache.get(int(user_id))
+    if principal is None:
+        principal = _load_principal(db, int(user_id))
+        if principal is None:
+            raise credentials_exception
+        identity_cache.put(principal)
+
+    if not principal.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-        
+
+    return principal
+
+
+def get_current_admin(principal: Principal = Depends(get_current_user)) -> Principal:
+    """Dependency that only lets admins through."""
+    if principal.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return principal
+
+
+def admin_from_token(token: str) -> Optional[Principal]:
+    """The admin a bearer token belongs to, or None; for checks outside of route dependencies."""
+    try:
+        user_id = int(jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+    principal = identity_cache.get(user_id)
+    if principal is None:
+        with SessionLocal() as db:
+            principal = _load_principal(db, user_id)
+        if principal is None:
+            return None
+        identity_cache.put(principal)
+    return principal if principal.is_active and principal.role == "admin" else None
+
+
+def get_current_user_model(
+    principal: Principal = Depends(get_current_user), db: Session = Depends(get_db)
+) -> models.User:
+    """Dependency that loads the full ORM row for the authenticated user."""
+    user = db.get(models.User, principal.user_id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
     return user
@@ -0,0 +1,340 @@
+"""Streaming bulk export of interviews for offline analysis.
+
+Interviews are read with `yield_per` (a server-side cursor on PostgreSQL) and
+encoded chunk by chunk, so memory stays constant however many rows there are:
+
+- ``ndjson``: one nested record per interview (same shape as the archive);
+- ``csv``: one flat row per question, interview and feedback columns repeated;
+- ``parquet``: nested records, one row group per chunk (needs `pyarrow`).
+
+Only completed interviews are exported. Every flush that changes an
+interview, its questions, responses or feedback stamps `Interview.updated_at`,
+and incremental exports use it as a watermark: an export covers
+``since < updated_at <= watermark``, and the watermark is returned (the
+``X-Export-Watermark`` header, or stderr for the CLI) to pass as ``since``
+next time. An interview changed after an export (feedback generated, score
+rewritten) is exported again, so consumers should upsert on interview_id.
+
+The watermark trails the clock by EXPORT_SETTLE_SECONDS: a stamp is taken
+before its transaction commits, and an export must not move past a change
+that isn't visible yet. Recent changes therefore show up one export later.
+
+    python -m app.export --format ndjson --since 2026-05-01T09:30:00 --out interviews.ndjson
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload, undefer
+
+from . import archive, models
+from .core_config import get_settings
+from .db import SessionLocal
+
+try:  # Optional dependency, only needed for Parquet
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - depends on environment
+    pyarrow = None
+
+settings = get_settings()
+
+FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+DEFAULT_CHUNK_SIZE = 500
+EPOCH = datetime(1970, 1, 1)  # `since` for a first, full export
+
+CSV_COLUMNS = [
+    "interview_id",
+    "candidate_id",
+    "interviewer_id",
+    "date",
+    "time",
+    "type",
+    "status",
+    "overall_score",
+    "completed_at",
+    "question_id",
+    "question_text",
+    "answer_text",
+    "relevance_score",
+    "confidence_level",
+    "feedback_comments",
+    "feedback_suggestions",
+]
+
+
+def _owning_interview(session: Session, obj: Any) -> Optional[models.Interview]:
+    if isinstance(obj, models.Interview):
+        return obj
+    if isinstance(obj, models.Response):
+        question = session.get(models.Question, obj.question_id) if obj.question_id else None
+        obj = question
+    if isinstance(obj, (models.Question, models.Feedback)) and obj.interview_id:
+        return session.get(models.Interview, obj.interview_id)
+    return None
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _stamp_updated_at(session: Session, flush_context, instances) -> None:
+    now = datetime.now()
+    for obj in list(session.new) + [o for o in session.dirty if session.is_modified(o)]:
+        interview = _owning_interview(session, obj)
+        if interview is not None:
+            interview.updated_at = now
+
+
+def current_watermark(db: Session) -> datetime:
+    """Upper bound for an export started now; the next one resumes from here.
+
+    Changes stamped before it have committed by the time it is used, so none is skipped.
+    """
+    return datetime.now() - timedelta(seconds=settings.EXPORT_SETTLE_SECONDS)
+
+
+def iter_interview_records(
+    db: Session,
+    *,
+    since: datetime = EPOCH,
+    until: Optional[datetime] = None,
+    include_transcript: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Yield full records of completed interviews with `since < updated_at <= until`, oldest change first."""
+    options = [
+        selectinload(models.Interview.questions).selectinload(models.Question.response),
+        selectinload(models.Interview.feedback).undefer_group("feedback_text"),
+    ]
+    if include_transcript:
+        options.append(undefer(models.Interview.transcript))
+
+    query = (
+        db.query(models.Interview)
+        .options(*options)
+        .filter(models.Interview.status == "Completed", models.Interview.updated_at > since)
+        .order_by(models.Interview.updated_at, models.Interview.interview_id)
+    )
+    if until is not None:
+        query = query.filter(models.Interview.updated_at <= until)
+
+    for interview in query.yield_per(chunk_size):
+        if interview.archived_at is not None:
+            record = archive.load_archived_interview(interview)
+            # The stub row is authoritative for fields that may change after archiving
+            record["overall_score"] = interview.overall_score
+            record["status"] = interview.status
+        else:
+            record = archive.serialize_interview(interview)
+        if not include_transcript:
+            record.pop("transcript", None)
+        yield record
+
+
+def _chunks(records: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_rows(record: Dict[str, Any]) -> Iterator[List[Any]]:
+    feedback = record.get("feedback") or {}
+    base = [
+        record["interview_id"],
+        record["candidate_id"],
+        record["interviewer_id"],
+        record["date"],
+        record["time"],
+        record["type"],
+        record["status"],
+        record["overall_score"],
+        record["completed_at"],
+    ]
+    tail = [feedback.get("comments"), feedback.get("suggestions")]
+    if not record["questions"]:
+        yield base + [None] * 5 + tail
+        return
+    for q in record["questions"]:
+        response = q["response"] or {}
+        yield base + [
+            q["question_id"],
+            q["question_text"],
+            response.get("answer_text"),
+            response.get("relevance_score"),
+            response.get("confidence_level"),
+        ] + tail
+
+
+def encode_ndjson(records: Iterator[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    for chunk in _chunks(records, chunk_size):
+        yield "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in chunk).encode("utf-8")
+
+
+def encode_csv(records: Iterator[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for chunk in _chunks(records, chunk_size):
+        for record in chunk:
+            writer.writerows(_csv_rows(record))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _parquet_schema():
+    response = pyarrow.struct(
+        [
+            ("answer_text", pyarrow.string()),
+            ("relevance_score", pyarrow.int64()),
+            ("confidence_level", pyarrow.int64()),
+        ]
+    )
+    question = pyarrow.struct(
+        [
+            ("question_id", pyarrow.int64()),
+            ("category_id", pyarrow.int64()),
+            ("question_text", pyarrow.string()),
+            ("response", response),
+        ]
+    )
+    feedback = pyarrow.struct(
+        [
+            ("comments", pyarrow.string()),
+            ("suggestions", pyarrow.string()),
+            ("report_url", pyarrow.string()),
+        ]
+    )
+    return pyarrow.schema(
+        [
+            ("interview_id", pyarrow.int64()),
+            ("candidate_id", pyarrow.int64()),
+            ("interviewer_id", pyarrow.int64()),
+            ("date", pyarrow.string()),
+            ("time", pyarrow.string()),
+            ("type", pyarrow.string()),
+            ("status", pyarrow.string()),
+            ("overall_score", pyarrow.int64()),
+            ("completed_at", pyarrow.string()),
+            ("tavus_conversation_id", pyarrow.string()),
+            ("tavus_conversation_url", pyarrow.string()),
+            ("recording_url", pyarrow.string()),
+            ("transcript", pyarrow.string()),
+            ("questions", pyarrow.list_(question)),
+            ("feedback", feedback),
+        ]
+    )
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out as they are written."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def encode_parquet(records: Iterator[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    if pyarrow is None:
+        raise RuntimeError("Parquet export requires the `pyarrow` package")
+    schema = _parquet_schema()
+    sink = _DrainableSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in _chunks(records, chunk_size):
+        writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv, "parquet": encode_parquet}
+
+
+def check_format(fmt: str) -> None:
+    """Raise ValueError for unknown or unavailable formats before streaming starts."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; choose one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and pyarrow is None:
+        raise ValueError("Parquet export requires the `pyarrow` package")
+
+
+def export_interviews(
+    db: Session,
+    fmt: str,
+    *,
+    since: datetime = EPOCH,
+    until: Optional[datetime] = None,
+    include_transcript: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Encoded export of interviews in `fmt`, as a stream of byte chunks."""
+    check_format(fmt)
+    records = iter_interview_records(
+        db, since=since, until=until, include_transcript=include_transcript, chunk_size=chunk_size
+    )
+    return ENCODERS[fmt](records, chunk_size)
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export interviews for offline analysis")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument(
+        "--since", type=datetime.fromisoformat, default=EPOCH, help="Watermark from the previous export"
+    )
+    parser.add_argument("--include-transcript", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--out", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        watermark = current_watermark(db)
+        stream = export_interviews(
+            db,
+            args.format,
+            since=args.since,
+            until=watermark,
+            include_transcript=args.include_transcript,
+            chunk_size=args.chunk_size,
+        )
+        out = open(args.out, "wb") if args.out else sys.stdout.buffer
+        try:
+            for data in stream:
+                out.write(data)
+        finally:
+            if args.out:
+                out.close()
+    print(f"watermark={watermark.isoformat()}", file=sys.stderr)
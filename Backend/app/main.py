@@ -1,44 +1,140 @@
-import uvicorn
-from fastapi import FastAPI
+"""FastAPI application factory.
+
+`create_app()` builds the app; serve it with ``uvicorn app.main:app`` or
+``uvicorn --factory app.main:create_app``. Importing this module builds
+nothing: routers are imported by `create_app`, `app` is created on first
+access, and the Gemini, Tavus and storage clients are constructed the first
+time a request needs them (the ``get_*_service`` dependencies, which tests
+can swap through ``app.dependency_overrides``).
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .core_config import get_settings
-from .db import Base, engine
-from .routers import interview, users, health, profile, auth
+from . import migrations
+from .auth_utils import PasswordHasherBusy, password_hasher
+from .db import Base, SessionLocal, engine
+from . import profiling, tracing
+from .metrics import MetricsMiddleware, register_saturation_gauges, track_route
+from .services import admin_stats, blobs, resume_extraction
+from .services.storage import get_storage_service
+from .uploads import UploadLimitMiddleware
 
 settings = get_settings()
 
-app = FastAPI(title=settings.PROJECT_NAME)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "http://localhost:5174",
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1:5174"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.on_event("startup")
+
 def on_startup() -> None:
-    # Create tables if they do not exist. In production, use Alembic migrations instead.
-    Base.metadata.create_all(bind=engine)
+    # A database the migrations already manage gets new tables from upgrade();
+    # only a fresh one needs the full create_all
+    if not migrations.is_managed(engine):
+        Base.metadata.create_all(bind=engine)
+    # Add new tables / columns and apply data migrations to databases created earlier.
+    migrations.upgrade(engine)
+
+    # Seed the admin dashboard rollups for databases created before they existed.
+    with SessionLocal() as db:
+        admin_stats.ensure_seeded(db)
+
+    password_hasher.start()
+    resume_extraction.start_pool()
+
+
+def on_shutdown() -> None:
+    password_hasher.shutdown()
+    if get_storage_service.cache_info().currsize:  # never built, nothing to stop
+        get_storage_service().shutdown()
+    resume_extraction.shutdown_pool()
+    tracing.shutdown()
+
+
+_background_tasks = []
+
+
+async def start_background_tasks() -> None:
+    if settings.BLOB_GC_INTERVAL_SECONDS > 0:
+        _background_tasks.append(asyncio.create_task(blobs.gc_loop()))
+
 
+async def stop_background_tasks() -> None:
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
 
-app.include_router(interview.router, prefix="/api/interview", tags=["interview"])
-app.include_router(users.router, prefix="/api/users", tags=["users"])
-app.include_router(health.router, tags=["health"])
-app.include_router(profile.router, prefix="/api", tags=["profile"])
-app.include_router(auth.router, prefix="/api", tags=["auth"])
-from .routers import documents
-app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
-from .routers import admin
-app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+
+def password_hasher_busy(request: Request, exc: PasswordHasherBusy) -> JSONResponse:
+    # Shed load instead of queueing logins until clients time out
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-ins right now, please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def create_app() -> FastAPI:
+    from .routers import admin, auth, documents, health, interview, profile, users
+
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        dependencies=[Depends(track_route), Depends(profiling.attach_endpoint)],
+    )
+
+    # Innermost: profiles cover the app itself
+    app.add_middleware(profiling.ProfilingMiddleware)
+    # Added before CORS so that CORS wraps it and 413s still carry its headers
+    app.add_middleware(UploadLimitMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            "http://localhost:5173",
+            "http://localhost:5174",
+            "http://127.0.0.1:5173",
+            "http://127.0.0.1:5174"
+        ],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Outermost, so rejected uploads and CORS preflights are measured too
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(tracing.TracingMiddleware)
+    register_saturation_gauges(engine, get_storage_service, password_hasher)
+
+    app.on_event("startup")(on_startup)
+    app.on_event("startup")(start_background_tasks)
+    app.on_event("shutdown")(on_shutdown)
+    app.on_event("shutdown")(stop_background_tasks)
+    app.add_exception_handler(PasswordHasherBusy, password_hasher_busy)
+
+    app.include_router(interview.router, prefix="/api/interview", tags=["interview"])
+    app.include_router(users.router, prefix="/api/users", tags=["users"])
+    app.include_router(health.router, tags=["health"])
+    app.include_router(profile.router, prefix="/api", tags=["profile"])
+    app.include_router(auth.router, prefix="/api", tags=["auth"])
+    app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+    return app
+
+
+_app: Optional[FastAPI] = None
+
+
+def __getattr__(name: str):
+    # `app` is built on first access, so ``uvicorn app.main:app`` keeps working
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("app.main:app", host="0.0.0.0", port=8001, reload=True)
@@ -0,0 +1,460 @@
+"""Prometheus metrics, served at ``GET /metrics`` in the text exposition format.
+
+A small in-process registry (counters, gauges, histograms) rather than a
+client library: everything here runs in one process and only needs rendering.
+
+What is measured:
+
+- HTTP: request latency and in-flight requests per route *template*
+  (``/api/interview/{interview_id}``), so ids never become label values;
+  requests no route matches share the label ``unmatched``.
+- Upstreams: duration of every public `GeminiService` / `TavusService` method
+  and their errors, both raised ones and ones the method swallowed into a
+  fallback answer (see `instrument_upstream`).
+- Database: statement durations by kind, and statements and time per request.
+- Saturation: the request threadpool, the storage I/O pool, the password
+  hashing queue and the SQLAlchemy connection pool, read when scraped.
+
+Label values always come from fixed sets (route templates, method names,
+exception class names), which keeps the number of series bounded.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.requests import Request
+
+from . import tracing
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+        name = f"{name}{{{rendered}}}"
+    if value == int(value) and abs(value) < 1e15:
+        return f"{name} {int(value)}"
+    return f"{name} {value!r}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels!r}")
+        return tuple(str(v) for v in labels)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(f"{self.name}_total", self._labels(k), v) for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(k), v) for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (plus +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[Sample]:
+        out = []
+        with self._lock:
+            items = [(k, list(c), t[0]) for k, (c, t) in self._values.items()]
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                out.append((f"{self.name}_bucket", {**labels, "le": le}, cumulative))
+            out.append((f"{self.name}_count", labels, cumulative))
+            out.append((f"{self.name}_sum", labels, total))
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        # Gauges read from elsewhere at scrape time: fn() -> [(labels, value)]
+        self._collectors: List[Tuple[Gauge, Callable[[], Iterable[Tuple[Sequence[str], float]]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(
+        self, name: str, documentation: str, labelnames: Sequence[str],
+        fn: Callable[[], Iterable[Tuple[Sequence[str], float]]],
+    ) -> None:
+        # Replaces an earlier callback of that name, so building the app again doesn't duplicate it
+        self._collectors = [c for c in self._collectors if c[0].name != name]
+        self._collectors.append((Gauge(name, documentation, labelnames), fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(_format(*s) for s in metric.samples())
+        for gauge, fn in self._collectors:
+            for labels, value in fn():
+                gauge.set(value, *labels)
+            lines.append(f"# HELP {gauge.name} {gauge.documentation}")
+            lines.append(f"# TYPE {gauge.name} gauge")
+            lines.extend(_format(*s) for s in gauge.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests being handled, by route template.", ("method", "route")
+))
+UPSTREAM_DURATION = REGISTRY.register(Histogram(
+    "upstream_call_duration_seconds", "Latency of Gemini/Tavus service methods.", ("service", "method"),
+    buckets=UPSTREAM_BUCKETS,
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "upstream_call_errors",
+    "Failed Gemini/Tavus calls; outcome is 'raised', or 'fallback' when the method answered without the upstream.",
+    ("service", "method", "outcome", "error"),
+))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency by statement kind.", ("statement",), buckets=QUERY_BUCKETS
+))
+DB_QUERIES_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.", ("method", "route"), buckets=COUNT_BUCKETS
+))
+DB_TIME_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per HTTP request.", ("method", "route"), buckets=DEFAULT_BUCKETS
+))
+
+
+# --- HTTP ---------------------------------------------------------------------------
+
+
+class _RequestStats:
+    __slots__ = ("route", "queries", "query_seconds")
+
+    def __init__(self) -> None:
+        self.route: Optional[str] = None
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+# Set per request by MetricsMiddleware; threadpool calls run in a copy of the
+# context, so the same object collects the statements of sync routes too
+_request_stats: ContextVar[Optional[_RequestStats]] = ContextVar("request_stats", default=None)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(request: Request) -> str:
+    """Path template of the route handling `request`, e.g. /api/interview/{interview_id}.
+
+    FastAPI hands the endpoint its route as declared on the router, without
+    the prefix it was included under, so the prefix is taken from the front of
+    the actual path: the shortest one after which the route's pattern matches.
+    """
+    route = request.scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return UNMATCHED_ROUTE
+    segments = request.url.path.split("/")[1:]
+    for k in range(len(segments) + 1):
+        if route.path_regex.match("/" + "/".join(segments[k:])):
+            prefix = "/".join(segments[:k])
+            return f"/{prefix}{path}" if prefix else path
+    return path
+
+
+async def track_route(request: Request) -> None:
+    """App-wide dependency: label the current request with its route template."""
+    stats = _request_stats.get()
+    if stats is not None and stats.route is None:
+        stats.route = route_template(request)
+        HTTP_IN_FLIGHT.inc(request.method, stats.route)
+    tracing.set_route(request.method, stats.route if stats is not None else route_template(request))
+
+
+class MetricsMiddleware:
+    """Record latency, status and SQL statements of every HTTP request by route template.
+
+    Requests that never reach an endpoint (404s, rejected uploads, CORS
+    preflights) are labelled ``unmatched``.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            method = scope["method"]
+            route = stats.route or UNMATCHED_ROUTE
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route, status)
+            if stats.route is not None:
+                HTTP_IN_FLIGHT.dec(method, route)
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, method, route)
+            DB_TIME_PER_REQUEST.observe(stats.query_seconds, method, route)
+            _request_stats.reset(token)
+
+
+# --- Upstreams ----------------------------------------------------------------------
+
+
+class _UpstreamCall:
+    __slots__ = ("failure",)
+
+    def __init__(self) -> None:
+        self.failure: Optional[str] = None
+
+
+_upstream_call: ContextVar[Optional[_UpstreamCall]] = ContextVar("upstream_call", default=None)
+
+
+def _instrument(fn, service: str, method: Optional[str]):
+    """Wrap `fn`; `method=None` marks an internal helper that only reports failures to its caller."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        parent = _upstream_call.get()
+        call = _UpstreamCall()
+        token = _upstream_call.set(call)
+        start = time.perf_counter()
+        with tracing.span(f"{service}.{method}") if method is not None else nullcontext() as span:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                if parent is not None:
+                    parent.failure = parent.failure or type(exc).__name__
+                if method is not None:
+                    UPSTREAM_ERRORS.inc(service, method, "raised", type(exc).__name__)
+                raise
+            finally:
+                _upstream_call.reset(token)
+                if method is not None:
+                    UPSTREAM_DURATION.observe(time.perf_counter() - start, service, method)
+            if call.failure is not None:
+                # A nested upstream call failed and this method answered from a fallback instead
+                if parent is not None:
+                    parent.failure = parent.failure or call.failure
+                if method is not None:
+                    UPSTREAM_ERRORS.inc(service, method, "fallback", call.failure)
+                if span is not None:
+                    span.set_attribute("upstream.fallback", call.failure)
+        return result
+
+    return wrapper
+
+
+def instrument_upstream(service: str, internal: Sequence[str] = ()):
+    """Class decorator timing every public method of an upstream API client.
+
+    Methods named in `internal` (the raw HTTP helpers) get no series of their
+    own; when they raise inside a public method that then returns normally, the
+    public method counts a 'fallback' error, so degraded answers stay visible.
+    """
+
+    def decorate(cls):
+        for name, fn in list(vars(cls).items()):
+            if not inspect.isfunction(fn):
+                continue
+            if name in internal:
+                setattr(cls, name, _instrument(fn, service, None))
+            elif not name.startswith("_"):
+                setattr(cls, name, _instrument(fn, service, name))
+        return cls
+
+    return decorate
+
+
+# --- Database -----------------------------------------------------------------------
+
+_STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip()[:16].split(None, 1)
+    kind = head[0].upper() if head else ""
+    return kind if kind in _STATEMENT_KINDS else "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement `engine` runs and attribute it to the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        DB_QUERY_DURATION.observe(elapsed, _statement_kind(statement))
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute does not fire for a failed statement
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# --- Saturation ---------------------------------------------------------------------
+
+
+def _threadpool_samples() -> List[Tuple[Sequence[str], float]]:
+    # Starlette runs sync routes and dependencies on anyio's default limiter;
+    # this needs the event loop, which the /metrics route provides
+    import anyio.to_thread
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    return [(("busy",), stats.borrowed_tokens), (("limit",), limiter.total_tokens), (("waiting",), stats.tasks_waiting)]
+
+
+def register_saturation_gauges(engine, get_storage, password_hasher) -> None:
+    """Gauges for the pools requests can queue on, read at scrape time.
+
+    `get_storage` is the cached storage provider. Scrapes never build the
+    backend (that may connect to Supabase and fail): the storage gauge stays
+    empty until a request has created it.
+    """
+
+    def storage_samples():
+        if not get_storage.cache_info().currsize:
+            return []
+        storage = get_storage()
+        return [(("in_flight",), storage.io_in_flight), (("limit",), storage.io_threads)]
+
+    REGISTRY.gauge_callback(
+        "threadpool_threads", "Request threadpool: threads busy, thread limit, and tasks waiting for one.",
+        ("state",), _threadpool_samples,
+    )
+    REGISTRY.gauge_callback(
+        "storage_io_threads", "Storage I/O pool: calls in flight (queued included) and thread count.",
+        ("state",), storage_samples,
+    )
+    REGISTRY.gauge_callback(
+        "password_hash_slots", "Password hashing: calls hashing or queued, and the limit before shedding.",
+        ("state",), lambda: [(("in_use",), password_hasher.in_use), (("limit",), password_hasher.capacity)],
+    )
+
+    def pool_samples():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            return []
+        samples = [(("checked_out",), pool.checkedout())]
+        if hasattr(pool, "size"):
+            samples.append((("size",), pool.size()))
+            samples.append((("overflow",), max(pool.overflow(), 0)))
+        return samples
+
+    REGISTRY.gauge_callback(
+        "db_pool_connections", "SQLAlchemy connection pool: connections checked out, pool size and overflow in use.",
+        ("state",), pool_samples,
+    )
@@ -0,0 +1,341 @@
+"""Minimal, versioned schema migrations.
+
+`create_all` only creates missing tables, so existing databases never pick
+up new columns or type changes. `upgrade()` fills that gap:
+
+1. creates tables the models define but the database lacks, and adds any
+   nullable column that the models define but a table lacks;
+2. applies numbered data/type migrations once each, recording them in
+   `schema_migrations`.
+
+Run automatically on startup, or by hand with ``python -m app.migrations``.
+A database with `schema_migrations` is kept current by `upgrade()` alone,
+so startup only runs `create_all` on a fresh one (`is_managed`).
+"""
+
+import logging
+from datetime import date, datetime, time
+from types import SimpleNamespace
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models  # noqa: F401  (registers all tables on Base.metadata)
+from . import search
+from .compression import compress_text, is_compressed
+from .db import Base
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+_version_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def is_managed(engine: Engine) -> bool:
+    """Whether `upgrade()` has run against this database before."""
+    return inspect(engine).has_table(schema_migrations.name)
+
+
+def create_missing_tables(conn: Connection) -> List[str]:
+    """CREATE TABLE (with indexes) for model tables absent from the database."""
+    existing_tables = set(inspect(conn).get_table_names())
+    missing = [t for t in Base.metadata.sorted_tables if t.name not in existing_tables]
+    if missing:
+        Base.metadata.create_all(bind=conn, tables=missing, checkfirst=False)
+    return [t.name for t in missing]
+
+
+def add_missing_columns(conn: Connection) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for nullable model columns absent from the database."""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present or not column.nullable:
+                continue
+            ddl_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}'))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+# --- Numbered migrations -------------------------------------------------------
+
+# (table, primary key, column) pairs stored with CompressedText
+COMPRESSED_COLUMNS = [
+    ("interviews", "interview_id", "transcript"),
+    ("users", "user_id", "resume_raw"),
+    ("responses", "response_id", "answer_text"),
+]
+
+
+def _compress_columns(conn: Connection) -> None:
+    """Convert text columns to binary (PostgreSQL) and compress every existing value."""
+    inspector = inspect(conn)
+    for table, pk, column in COMPRESSED_COLUMNS:
+        types = {c["name"]: c["type"] for c in inspector.get_columns(table)}
+        # A database created after CompressedText existed already has bytea columns
+        if conn.dialect.name == "postgresql" and isinstance(types.get(column), String):
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE bytea "
+                    f"USING convert_to({column}, 'UTF8')"
+                )
+            )
+        # SQLite keeps the declared TEXT affinity but stores BLOBs as-is.
+
+        last_pk = 0
+        while True:
+            rows = conn.execute(
+                text(
+                    f"SELECT {pk}, {column} FROM {table} "
+                    f"WHERE {pk} > :last AND {column} IS NOT NULL ORDER BY {pk} LIMIT :n"
+                ),
+                {"last": last_pk, "n": BACKFILL_BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            for row_pk, value in rows:
+                if isinstance(value, str):
+                    plain = value
+                else:
+                    value = bytes(value)
+                    if is_compressed(value):
+                        continue
+                    plain = value.decode("utf-8")
+                conn.execute(
+                    text(f"UPDATE {table} SET {column} = :v WHERE {pk} = :pk"),
+                    {"v": compress_text(plain), "pk": row_pk},
+                )
+            last_pk = rows[-1][0]
+            logger.info("Compressed %s.%s up to %s=%s", table, column, pk, last_pk)
+
+
+def _fingerprint_questions(conn: Connection) -> None:
+    """Index the candidate-history lookup and fingerprint existing questions for dedup."""
+    from .services import question_dedup
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_interviews_candidate_id ON interviews (candidate_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_questions_interview_id ON questions (interview_id)"))
+
+    for table, pk, column in (("questions", "question_id", "question_text"), ("question_bank", "id", "text")):
+        last_pk = 0
+        while True:
+            rows = conn.execute(
+                text(
+                    f"SELECT {pk}, {column} FROM {table} "
+                    f"WHERE {pk} > :last AND fingerprint IS NULL ORDER BY {pk} LIMIT :n"
+                ),
+                {"last": last_pk, "n": BACKFILL_BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            for row_pk, value in rows:
+                fingerprint = question_dedup.fingerprint(value)
+                if fingerprint is None:
+                    continue
+                conn.execute(
+                    text(f"UPDATE {table} SET fingerprint = :f WHERE {pk} = :pk"),
+                    {"f": fingerprint, "pk": row_pk},
+                )
+            last_pk = rows[-1][0]
+            logger.info("Fingerprinted %s up to %s=%s", table, pk, last_pk)
+
+
+def _index_completed_at(conn: Connection) -> None:
+    """Index completion time, the watermark of incremental exports."""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_interviews_completed_at ON interviews (completed_at)"))
+
+
+def _drop_bank_buckets(conn: Connection) -> None:
+    """Drop the question-bank LSH buckets; nothing reads them any more."""
+    conn.execute(text("DROP TABLE IF EXISTS question_bank_lsh"))
+
+
+def _backfill_completion_times(conn: Connection) -> None:
+    """Fill completed_at for completed interviews that predate it, and updated_at for every interview."""
+    last_pk = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT interview_id, date, time FROM interviews "
+                "WHERE interview_id > :last AND status = 'Completed' AND completed_at IS NULL "
+                "ORDER BY interview_id LIMIT :n"
+            ),
+            {"last": last_pk, "n": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        for interview_id, day, at in rows:
+            # Best available guess: when the interview was scheduled
+            completed = datetime.combine(_as_date(day), _as_time(at)) if day else datetime.now()
+            conn.execute(
+                text("UPDATE interviews SET completed_at = :c WHERE interview_id = :id"),
+                {"c": completed, "id": interview_id},
+            )
+        last_pk = rows[-1][0]
+        logger.info("Backfilled completed_at up to interview_id=%s", last_pk)
+    conn.execute(
+        text("UPDATE interviews SET updated_at = COALESCE(completed_at, :now) WHERE updated_at IS NULL"),
+        {"now": datetime.now()},
+    )
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_interviews_updated_at ON interviews (updated_at)"))
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _as_time(value) -> time:
+    if value is None:
+        return time()
+    return value if isinstance(value, time) else time.fromisoformat(str(value))
+
+
+def _fingerprint_archived_questions(conn: Connection) -> None:
+    """Keep question fingerprints on interviews archived before the stub carried them."""
+    from . import archive
+    from .services import question_dedup
+
+    last_pk = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT interview_id, archive_path, archive_offset FROM interviews "
+                "WHERE interview_id > :last AND archived_at IS NOT NULL AND question_fingerprints IS NULL "
+                "ORDER BY interview_id LIMIT :n"
+            ),
+            {"last": last_pk, "n": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        for interview_id, path, offset in rows:
+            try:
+                record = archive.load_archived_interview(SimpleNamespace(archive_path=path, archive_offset=offset))
+            except OSError:
+                logger.warning("Archive file %s is missing; interview %s keeps no fingerprints", path, interview_id)
+                continue
+            fingerprints = [question_dedup.fingerprint(q["question_text"]) for q in record["questions"]]
+            conn.execute(
+                text("UPDATE interviews SET question_fingerprints = :f WHERE interview_id = :id"),
+                {"f": b"".join(f for f in fingerprints if f) or None, "id": interview_id},
+            )
+        last_pk = rows[-1][0]
+        logger.info("Fingerprinted archived interviews up to interview_id=%s", last_pk)
+
+
+_SCORED = (
+    "FROM responses r JOIN questions q ON q.question_id = r.question_id "
+    "WHERE q.interview_id = interviews.interview_id "
+    "AND r.relevance_score IS NOT NULL AND r.confidence_level IS NOT NULL"
+)
+
+
+def _recompute_score_aggregates(conn: Connection) -> None:
+    """Fill the running score sums of interviews that predate them (see interview_scores)."""
+    missing = "relevance_sum IS NULL OR confidence_sum IS NULL OR scored_responses IS NULL"
+    conn.execute(
+        text(
+            f"UPDATE interviews SET "
+            f"relevance_sum = (SELECT COALESCE(SUM(r.relevance_score), 0) {_SCORED}), "
+            f"confidence_sum = (SELECT COALESCE(SUM(r.confidence_level), 0) {_SCORED}), "
+            f"scored_responses = (SELECT COUNT(*) {_SCORED}) "
+            f"WHERE archived_at IS NULL AND ({missing})"
+        )
+    )
+
+    # Archived interviews have no response rows left; their archive records do
+    from . import archive
+
+    rows = conn.execute(
+        text(f"SELECT interview_id, archive_path, archive_offset FROM interviews WHERE archived_at IS NOT NULL AND ({missing})")
+    ).all()
+    for interview_id, path, offset in rows:
+        try:
+            record = archive.load_archived_interview(SimpleNamespace(archive_path=path, archive_offset=offset))
+        except OSError:
+            logger.warning("Archive file %s is missing; interview %s keeps no score sums", path, interview_id)
+            continue
+        scored = [
+            q["response"] for q in record["questions"]
+            if q["response"] and q["response"]["relevance_score"] is not None
+            and q["response"]["confidence_level"] is not None
+        ]
+        conn.execute(
+            text("UPDATE interviews SET relevance_sum = :r, confidence_sum = :c, scored_responses = :n WHERE interview_id = :id"),
+            {
+                "r": sum(s["relevance_score"] for s in scored),
+                "c": sum(s["confidence_level"] for s in scored),
+                "n": len(scored),
+                "id": interview_id,
+            },
+        )
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Compress transcripts, raw resumes and answers", _compress_columns),
+    (2, "Full-text search index", search.reindex),
+    (3, "Question fingerprints for near-duplicate detection", _fingerprint_questions),
+    (4, "Completion-time index for incremental exports", _index_completed_at),
+    (5, "Drop unused question-bank LSH buckets", _drop_bank_buckets),
+    (6, "Completion and change times for existing interviews", _backfill_completion_times),
+    (7, "Question fingerprints for archived interviews", _fingerprint_archived_questions),
+    (8, "Score sums for interviews that predate them", _recompute_score_aggregates),
+]
+
+
+def applied_versions(conn: Connection) -> set:
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """Bring the database schema up to date; returns the migration versions applied."""
+    _version_metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        created = create_missing_tables(conn)
+        added = add_missing_columns(conn)
+    if created:
+        logger.info("Created tables: %s", ", ".join(created))
+    if added:
+        logger.info("Added columns: %s", ", ".join(added))
+
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            # Re-checked under the transaction: another worker may have just applied it
+            if version in applied_versions(conn):
+                continue
+            logger.info("Applying migration %s: %s", version, description)
+            migrate(conn)
+            conn.execute(
+                schema_migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.now()
+                )
+            )
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from .db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    print(f"Applied migrations: {upgrade(engine) or 'none'}")
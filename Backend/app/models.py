@@ -1,8 +1,23 @@
-from datetime import date
-
-from sqlalchemy import Boolean, Column, Date, ForeignKey, Integer, String, Text, Time
-from sqlalchemy.orm import relationship
-
+from datetime import date, datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    Time,
+)
+from sqlalchemy.orm import deferred, relationship
+
+from .compression import CompressedText
 from .db import Base
 
 
@@ -14,9 +29,11 @@ class User(Base):
     email = Column(String(255), nullable=True, unique=True)
     password_hash = Column(String(255), nullable=True)
     role = Column(String(50), nullable=True)  # e.g., "candidate", "interviewer", "admin"
-    resume_summary = Column(Text, nullable=True)
+    # Large text columns are deferred (group "resume") so auth, lists and joins
+    # don't drag them along; load with undefer_group("resume") where needed.
+    resume_summary = deferred(Column(Text, nullable=True), group="resume")
     # Raw resume text extracted from uploaded PDF or plain text input
-    resume_raw = Column(Text, nullable=True)
+    resume_raw = deferred(Column(CompressedText, nullable=True), group="resume")
     is_active = Column(Boolean, default=True)
 
     # Relationships
@@ -78,17 +95,35 @@ class Interview(Base):
     __tablename__ = "interviews"
 
     interview_id = Column(Integer, primary_key=True, index=True)
-    candidate_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    candidate_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     interviewer_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     date = Column(Date, nullable=True)
     time = Column(Time, nullable=True)
     type = Column(String(100), nullable=True)
     overall_score = Column(Integer, nullable=True)
+    # Running score aggregates over this interview's responses, updated per answer.
+    # NULL means "not aggregated yet" (rows predating these columns) and
+    # triggers a one-off SQL recompute.
+    relevance_sum = Column(Integer, nullable=True, default=0)
+    confidence_sum = Column(Integer, nullable=True, default=0)
+    scored_responses = Column(Integer, nullable=True, default=0)
     status = Column(String(50), default="Scheduled") # Scheduled, In Progress, Completed, Aborted
     tavus_conversation_id = Column(String(100), nullable=True)
-    transcript = Column(Text, nullable=True)  # Store full conversation transcript
+    # Opaque id sent to Tavus as the conversation name: correlates without sharing candidate details
+    conversation_ref = Column(String(36), nullable=True)
+    transcript = deferred(Column(CompressedText, nullable=True))  # Store full conversation transcript
     tavus_conversation_url = Column(String(255), nullable=True)
     recording_url = Column(String(512), nullable=True)
+    completed_at = Column(DateTime, nullable=True, index=True)  # Set when status moves to Completed
+    # Last change to the interview, its questions, responses or feedback (stamped by app/export.py)
+    updated_at = Column(DateTime, nullable=True, index=True)
+    # Cold storage (see app/archive.py): once archived, the questions, responses,
+    # feedback and transcript live only in the archive file at this offset.
+    archived_at = Column(DateTime, nullable=True)
+    archive_path = Column(String(512), nullable=True)
+    archive_offset = Column(Integer, nullable=True)
+    # Once archived: the questions' MinHash signatures, concatenated, so repeat detection still sees them
+    question_fingerprints = deferred(Column(LargeBinary, nullable=True))
 
     candidate = relationship("User", foreign_keys=[candidate_id], back_populates="candidate_interviews")
     interviewer = relationship("User", foreign_keys=[interviewer_id], back_populates="interviewer_interviews")
@@ -115,6 +150,7 @@ class QuestionBank(Base):
     category_id = Column(Integer, ForeignKey("categories.category_id"), nullable=True)
     created_at = Column(Date, default=date.today)
     is_active = Column(Boolean, default=True)
+    fingerprint = deferred(Column(LargeBinary, nullable=True))  # MinHash signature, see services/question_dedup.py
 
     category = relationship("Category", back_populates="question_bank")
     skills = relationship("Skill", secondary="question_bank_skills", back_populates="question_bank_items")
@@ -131,9 +167,10 @@ class Question(Base):
     __tablename__ = "questions"
 
     question_id = Column(Integer, primary_key=True, index=True)
-    interview_id = Column(Integer, ForeignKey("interviews.interview_id"), nullable=False)
+    interview_id = Column(Integer, ForeignKey("interviews.interview_id"), nullable=False, index=True)
     category_id = Column(Integer, ForeignKey("categories.category_id"), nullable=True)
     question_text = Column(Text, nullable=False)
+    fingerprint = deferred(Column(LargeBinary, nullable=True))  # MinHash signature, see services/question_dedup.py
 
     interview = relationship("Interview", back_populates="questions")
     category = relationship("Category", back_populates="questions")
@@ -145,7 +182,7 @@ class Response(Base):
 
     response_id = Column(Integer, primary_key=True, index=True)
     question_id = Column(Integer, ForeignKey("questions.question_id"), nullable=False, unique=True)
-    answer_text = Column(Text, nullable=True)
+    answer_text = Column(CompressedText, nullable=True)
     relevance_score = Column(Integer, nullable=True)
     confidence_level = Column(Integer, nullable=True)
 
@@ -157,8 +194,8 @@ class Feedback(Base):
 
     feedback_id = Column(Integer, primary_key=True, index=True)
     interview_id = Column(Integer, ForeignKey("interviews.interview_id"), nullable=False, unique=True)
-    comments = Column(Text, nullable=True)
-    suggestions = Column(Text, nullable=True)
+    comments = deferred(Column(Text, nullable=True), group="feedback_text")
+    suggestions = deferred(Column(Text, nullable=True), group="feedback_text")
     report_url = Column(String(255), nullable=True)
 
     interview = relationship("Interview", back_populates="feedback")
@@ -174,7 +211,103 @@ class Document(Base):
     file_type = Column(String(50), nullable=True)     # e.g., "resume", "syllabus"
     file_url = Column(String(512), nullable=True)     # Public/Signed URL
     created_at = Column(Date, default=date.today)
+    # Content of the current version (file_path is then that blob's path); NULL for legacy uploads
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+
+    user = relationship("User", back_populates="documents")
+    versions = relationship(
+        "DocumentVersion",
+        back_populates="document",
+        cascade="all, delete-orphan",
+        order_by="DocumentVersion.version.desc()",
+    )
+
+
+class Blob(Base):
+    """Stored file content, addressed by its SHA-256 and shared by every document version with it."""
+
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100), nullable=False)
+    storage_path = Column(String(512), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    # Bumped whenever a version starts pointing here; GC leaves recently used blobs alone
+    last_used_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class DocumentVersion(Base):
+    """One upload of a document; versions of a (user, file_type) document are numbered from 1."""
+
+    __tablename__ = "document_versions"
+    __table_args__ = (Index("ix_document_versions_document_version", "document_id", "version", unique=True),)
+
+    version_id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.document_id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=False, index=True)
+    file_name = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    document = relationship("Document", back_populates="versions")
+    blob = relationship("Blob")
+
+
+class AdminCounter(Base):
+    """Running totals for the admin dashboard tiles, kept in step with writes."""
+
+    __tablename__ = "admin_counters"
+
+    name = Column(String(50), primary_key=True)  # total_users, total_interviews, active_sessions
+    value = Column(Integer, nullable=False, default=0)
+
+
+class DailyStat(Base):
+    """Per-day rollup backing the admin time-series charts."""
+
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    new_users = Column(Integer, nullable=False, default=0)
+    interviews_started = Column(Integer, nullable=False, default=0)
+    interviews_completed = Column(Integer, nullable=False, default=0)
+    # Sum/count of overall scores of interviews completed that day (avg = sum / count)
+    score_sum = Column(Integer, nullable=False, default=0)
+    score_count = Column(Integer, nullable=False, default=0)
+
+
+class ActivityEvent(Base):
+    """Append-only log of notable actions, read newest-first by the admin feed.
+
+    `event_id` is monotonic (AUTOINCREMENT on SQLite), so keyset pagination on
+    it is also time order and every feed page is a single index range scan.
+    """
+
+    __tablename__ = "activity_events"
+    __table_args__ = (
+        Index("ix_activity_events_type_id", "event_type", "event_id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    event_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    event_type = Column(String(50), nullable=False)  # user_signup, interview_started, ...
+    user_id = Column(Integer, nullable=True)
+    interview_id = Column(Integer, nullable=True)
+    message = Column(String(255), nullable=True)
+
 
-    user = relationship("User", back_populates="documents")    
+class ResumeExtraction(Base):
+    """One uploaded resume: which extraction tier produced its text and how well local extraction did."""
 
+    __tablename__ = "resume_extractions"
 
+    extraction_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now, index=True)
+    user_id = Column(Integer, nullable=True)
+    tier = Column(String(20), nullable=False)  # local, gemini, local_fallback
+    pages = Column(Integer, nullable=False, default=0)
+    chars = Column(Integer, nullable=False, default=0)
+    quality = Column(Float, nullable=False, default=0.0)  # score of the local text, 0..1
+    duration_ms = Column(Integer, nullable=False, default=0)
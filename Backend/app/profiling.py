@@ -0,0 +1,367 @@
+"""On-demand profiling of individual production requests.
+
+A request is profiled when an admin sends it with ``X-Profile: 1`` (and their
+bearer token), or at random with probability PROFILE_SAMPLE_RATE (0 = never).
+For that request this captures:
+
+- a sampling CPU profile: a background thread reads the request's stacks
+  every PROFILE_INTERVAL_MS (``sys._current_frames``), written as a speedscope
+  file (open it at https://www.speedscope.app);
+- an allocation snapshot: tracemalloc runs for the duration of the request
+  and the largest allocation sites still alive when the response starts are
+  listed, with the peak traced memory;
+- the SQL statements the request ran, with their durations.
+
+Results are kept under PROFILE_DIR (the newest PROFILE_MAX_KEPT) and served by
+the admin profile routes; the response carries ``X-Profile-Id``.
+
+Nothing runs while no request is being profiled: no sampler, no tracemalloc,
+and the SQLAlchemy listeners (registered once, since adding and removing them
+while other requests run queries is not thread-safe) return at once. Only one request is profiled at a time
+(tracemalloc is process-wide). Stacks are attributed to the request by its own
+coroutine frame on the event loop and by its endpoint and dependency functions
+in threadpool threads, so a concurrent request to the *same* endpoint can add
+samples; allocations are process-wide, SQL statements exact.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from .core_config import get_settings
+from .db import engine
+from .dependencies import admin_from_token
+from .metrics import route_template
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+TOP_ALLOCATIONS = 30
+MAX_SQL_STATEMENTS = 1000
+MAX_STACK_DEPTH = 200
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+class _Profile:
+    def __init__(self, method: str, path: str, trigger: str) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.route: Optional[str] = None
+        self.started = time.time()
+        self.loop_thread = threading.get_ident()
+        self.request_frame = None  # the middleware's coroutine frame for this request
+        self.codes: Set[Any] = set()  # endpoint + dependency code objects
+        self.samples: Dict[Tuple[Tuple[str, str, int], ...], float] = {}
+        self.statements: List[Dict[str, Any]] = []
+        self.allocations: List[Dict[str, Any]] = []
+        self.peak_bytes = 0
+
+
+_active: ContextVar[Optional[_Profile]] = ContextVar("active_profile", default=None)
+_busy = threading.Lock()
+
+
+# --- Stack sampling -------------------------------------------------------------------
+
+
+def _stack(frame, profile: _Profile, loop: bool) -> Optional[Tuple[Tuple[str, str, int], ...]]:
+    """Root-to-leaf (function, file, first line) of `frame` if it belongs to the request."""
+    frames = []
+    ours = False
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        if (frame is profile.request_frame) if loop else (code in profile.codes):
+            ours = True
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    if not ours:
+        return None
+    frames.reverse()
+    return tuple(frames)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: _Profile, interval: float) -> None:
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        profile = self.profile
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            elapsed_ms = (now - last) * 1000
+            last = now
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _stack(frame, profile, loop=ident == profile.loop_thread)
+                if stack is not None:
+                    profile.samples[stack] = profile.samples.get(stack, 0.0) + elapsed_ms
+
+
+# --- SQL ------------------------------------------------------------------------------
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is None or not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    if len(profile.statements) < MAX_SQL_STATEMENTS:
+        profile.statements.append({"statement": statement, "ms": round(elapsed_ms, 3), "executemany": executemany})
+
+
+event.listen(engine, "before_cursor_execute", _before_execute)
+event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+# --- Allocations ----------------------------------------------------------------------
+
+
+def _allocation_snapshot(profile: _Profile) -> None:
+    if not tracemalloc.is_tracing():
+        return
+    profile.peak_bytes = tracemalloc.get_traced_memory()[1]
+    # Drops the sampler's own bookkeeping (allocated in this module) and tracemalloc's
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__))
+    )
+    profile.allocations = [
+        {
+            "size_bytes": stat.size,
+            "count": stat.count,
+            # Innermost frame first
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in reversed(stat.traceback)],
+        }
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]
+    ]
+
+
+# --- Trigger --------------------------------------------------------------------------
+
+
+def _bearer_token(headers: Dict[bytes, bytes]) -> Optional[str]:
+    value = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = value.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+async def _trigger(headers: Dict[bytes, bytes]) -> Optional[str]:
+    if headers.get(PROFILE_HEADER, b"").strip() not in (b"", b"0"):
+        token = _bearer_token(headers)
+        if token and await run_in_threadpool(admin_from_token, token) is not None:
+            return "header"
+        return None
+    if settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+async def attach_endpoint(request: Request) -> None:
+    """App-wide dependency: tell an active profile which functions serve this request."""
+    profile = _active.get()
+    route = request.scope.get("route")
+    if profile is None or route is None:
+        return
+    profile.route = route_template(request)
+    pending = [getattr(route, "dependant", None)]
+    while pending:
+        dependant = pending.pop()
+        if dependant is None:
+            continue
+        code = getattr(dependant.call, "__code__", None)
+        if code is not None:
+            profile.codes.add(code)
+        pending.extend(dependant.dependencies)
+
+
+class ProfilingMiddleware:
+    """Profile the requests selected by `_trigger`; a header lookup for all others."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = await _trigger(dict(scope["headers"]))
+        if trigger is None or not _busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, trigger)
+        finally:
+            _busy.release()
+
+    async def _profile(self, scope, receive, send, trigger: str) -> None:
+        profile = _Profile(scope["method"], scope["path"], trigger)
+        profile.request_frame = sys._getframe()
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                _allocation_snapshot(profile)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+        sampler = _Sampler(profile, settings.PROFILE_INTERVAL_MS / 1000)
+        token = _active.set(profile)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            sampler.stopped.set()
+            sampler.join()
+            _active.reset(token)
+            if started_tracemalloc:
+                tracemalloc.stop()
+            try:
+                await run_in_threadpool(_save, profile, status, duration_ms)
+            except Exception:
+                logger.exception("Saving profile %s failed", profile.id)
+
+
+# --- Storage --------------------------------------------------------------------------
+
+
+def _speedscope(profile: _Profile, duration_ms: float) -> Dict[str, Any]:
+    frames: List[Dict[str, Any]] = []
+    index: Dict[Tuple[str, str, int], int] = {}
+    samples, weights = [], []
+    for stack, weight in profile.samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            ids.append(index[frame])
+        samples.append(ids)
+        weights.append(round(weight, 3))
+    name = f"{profile.method} {profile.route or profile.path}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "interviewdost",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(max(duration_ms, sum(weights)), 3),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+def _save(profile: _Profile, status: int, duration_ms: float) -> None:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    summary = {
+        "id": profile.id,
+        "created_at": profile.started,
+        "method": profile.method,
+        "path": profile.path,
+        "route": profile.route,
+        "status": status,
+        "trigger": profile.trigger,
+        "duration_ms": round(duration_ms, 3),
+        "sampled_ms": round(sum(profile.samples.values()), 3),
+        "sql": {
+            "count": len(profile.statements),
+            "total_ms": round(sum(s["ms"] for s in profile.statements), 3),
+            "statements": profile.statements,
+        },
+        "memory": {"peak_traced_bytes": profile.peak_bytes, "top_allocations": profile.allocations},
+    }
+    with open(profile_path(profile.id, "speedscope"), "w", encoding="utf-8") as f:
+        json.dump(_speedscope(profile, duration_ms), f)
+    # Written last: list_profiles only shows profiles whose summary exists
+    with open(profile_path(profile.id, "summary"), "w", encoding="utf-8") as f:
+        json.dump(summary, f)
+    _prune()
+
+
+def profile_path(profile_id: str, kind: str) -> str:
+    """Path of a stored profile file; `kind` is "summary" or "speedscope"."""
+    if not _PROFILE_ID.match(profile_id):
+        raise ValueError("Invalid profile id")
+    suffix = {"summary": ".json", "speedscope": ".speedscope.json"}[kind]
+    return os.path.join(settings.PROFILE_DIR, profile_id + suffix)
+
+
+def _summaries() -> List[Tuple[float, str]]:
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    out = []
+    for name in os.listdir(settings.PROFILE_DIR):
+        profile_id, ext = os.path.splitext(name)
+        if ext == ".json" and _PROFILE_ID.match(profile_id):
+            out.append((os.path.getmtime(os.path.join(settings.PROFILE_DIR, name)), profile_id))
+    out.sort(reverse=True)
+    return out
+
+
+def _prune() -> None:
+    for _, profile_id in _summaries()[settings.PROFILE_MAX_KEPT:]:
+        for kind in ("summary", "speedscope"):
+            try:
+                os.remove(profile_path(profile_id, kind))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest stored profiles, without their statement and allocation details."""
+    out = []
+    for _, profile_id in _summaries()[:limit]:
+        try:
+            with open(profile_path(profile_id, "summary"), encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        out.append(
+            {
+                key: summary[key]
+                for key in ("id", "created_at", "method", "path", "route", "status", "trigger", "duration_ms")
+            }
+            | {"sql_count": summary["sql"]["count"], "peak_traced_bytes": summary["memory"]["peak_traced_bytes"]}
+        )
+    return out
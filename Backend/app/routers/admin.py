@@ -1,70 +1,224 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, undefer, undefer_group
 from sqlalchemy import func, desc
 from typing import List, Optional
 from datetime import datetime, timedelta
 
-from .. import models, schemas
-from ..db import get_db
+from .. import archive, export, models, profiling, schemas, search
+from ..core_config import get_settings
+from ..db import SessionLocal, get_db
+from ..dependencies import get_current_admin
+from ..services import activity, admin_stats, score_analytics
+from ..services.storage import StorageBackend, get_storage_service
+from .documents import signed_document_urls
 
+settings = get_settings()
 router = APIRouter()
 
+# How often the activity stream checks for new events when idle
+ACTIVITY_POLL_SECONDS = 2.0
+
 @router.get("/stats")
 def get_admin_stats(db: Session = Depends(get_db)):
     """
     Get overview statistics for the admin dashboard.
+
+    Served from the incrementally maintained counters, so this is a single
+    small read regardless of table sizes.
     """
-    total_users = db.query(models.User).count()
-    total_interviews = db.query(models.Interview).count()
-    
-    # Active sessions: Interviews scheduled/started in the last 24 hours (Proxy logic)
-    # Adjust logic based on actual "status" field if available later.
-    one_day_ago = datetime.now().date() - timedelta(days=1)
-    # Using 'date' column for simplicity as 'time' is separate and models.Interview.date is a Date object
-    active_sessions = db.query(models.Interview).filter(models.Interview.date >= one_day_ago).count()
+    counters = admin_stats.read_counters(db)
 
     return {
-        "total_users": total_users,
-        "total_interviews": total_interviews,
-        "active_sessions": active_sessions,
+        "total_users": counters["total_users"],
+        "total_interviews": counters["total_interviews"],
+        # Interviews currently "In Progress"
+        "active_sessions": counters["active_sessions"],
         "system_health": "99.9%" # Mocked for now, implies server is reachable
     }
 
+
+@router.get("/dashboard")
+def get_admin_dashboard(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db)):
+    """
+    Dashboard tiles plus per-day time series for the last `days` days.
+
+    Reads only the counters and `days` rollup rows.
+    """
+    series = admin_stats.read_daily(db, days)
+    completed = sum(d["interviews_completed"] for d in series)
+    scored = sum(d["scored_interviews"] for d in series)
+    score_total = sum(d["score_sum"] for d in series)
+
+    return {
+        "tiles": {
+            **admin_stats.read_counters(db),
+            "interviews_completed": completed,
+            "new_users": sum(d["new_users"] for d in series),
+            "average_score": round(score_total / scored, 2) if scored else None,
+        },
+        "series": series,
+    }
+
+
+@router.post("/stats/rebuild")
+def rebuild_admin_stats(db: Session = Depends(get_db)):
+    """
+    Recompute counters and rollups from the source tables (compactor / repair).
+    """
+    return admin_stats.rebuild_rollups(db)
+
+@router.post("/interviews/archive", dependencies=[Depends(get_current_admin)])
+def archive_interviews(
+    older_than_days: int = Query(settings.ARCHIVE_AFTER_DAYS, ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Move interviews completed more than `older_than_days` ago to cold storage.
+    """
+    try:
+        return {"archived": archive.archive_completed_interviews(db, older_than_days)}
+    except archive.ArchiveBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/storage/metrics")
+def get_storage_metrics(storage: StorageBackend = Depends(get_storage_service)):
+    """
+    Latency, error and byte counts per operation of the storage backend (this process).
+    """
+    return {"backend": storage.name, "operations": storage.metrics.snapshot()}
+
+@router.get("/profiles", dependencies=[Depends(get_current_admin)])
+def get_profiles(limit: int = Query(50, ge=1, le=500)):
+    """
+    Profiled requests (X-Profile header or sampling), newest first.
+    """
+    return profiling.list_profiles(limit)
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(get_current_admin)])
+def get_profile(profile_id: str):
+    """
+    One profile: timings, the SQL statements it ran and its largest allocations.
+    """
+    try:
+        path = profiling.profile_path(profile_id, "summary")
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+@router.get("/profiles/{profile_id}/speedscope", dependencies=[Depends(get_current_admin)])
+def download_profile_flamegraph(profile_id: str):
+    """
+    The CPU profile as a speedscope file (open at https://www.speedscope.app).
+    """
+    try:
+        path = profiling.profile_path(profile_id, "speedscope")
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"profile-{profile_id}.speedscope.json")
+
+@router.get("/resume-extractions")
+def get_resume_extraction_stats(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db)):
+    """
+    How resume uploads of the last `days` days were extracted: count, median
+    time and average local-text quality per tier (local, gemini, local_fallback).
+    """
+    since = datetime.now() - timedelta(days=days)
+    recent = db.query(models.ResumeExtraction).filter(models.ResumeExtraction.created_at >= since)
+    tiers = []
+    for tier, count, avg_quality in (
+        recent.with_entities(
+            models.ResumeExtraction.tier,
+            func.count(models.ResumeExtraction.extraction_id),
+            func.avg(models.ResumeExtraction.quality),
+        )
+        .group_by(models.ResumeExtraction.tier)
+        .all()
+    ):
+        median_ms = (
+            recent.filter(models.ResumeExtraction.tier == tier)
+            .with_entities(models.ResumeExtraction.duration_ms)
+            .order_by(models.ResumeExtraction.duration_ms)
+            .offset(count // 2)
+            .limit(1)
+            .scalar()
+        )
+        tiers.append(
+            {"tier": tier, "count": count, "median_ms": median_ms, "average_quality": round(avg_quality or 0, 3)}
+        )
+    total = sum(t["count"] for t in tiers)
+    gemini = sum(t["count"] for t in tiers if t["tier"] == "gemini")
+    return {
+        "days": days,
+        "total": total,
+        "gemini_share": round(gemini / total, 3) if total else None,
+        "tiers": tiers,
+    }
+
 @router.get("/activity")
-def get_recent_activity(db: Session = Depends(get_db)):
+def get_recent_activity(
+    limit: int = Query(20, ge=1, le=200),
+    before: Optional[int] = Query(None, description="Return events older than this event_id"),
+    after: Optional[int] = Query(None, description="Tail mode: events newer than this event_id, oldest first"),
+    type: Optional[str] = Query(None, description="Filter by event type, e.g. interview_started"),
+    db: Session = Depends(get_db),
+):
     """
-    Get a combined list of recent activities (User signups, Interviews created).
+    Get recent activity from the append-only event log, newest first.
+
+    Paginate with `before=<last event_id>`; poll with `after=<newest event_id>`.
+    A poll can miss an event that commits after a higher id was returned;
+    `/activity/stream` re-checks skipped ids and does not.
     """
-    # Fetch recent users
-    recent_users = db.query(models.User).order_by(desc(models.User.user_id)).limit(5).all()
-    
-    # Fetch recent interviews
-    recent_interviews = db.query(models.Interview).order_by(desc(models.Interview.interview_id)).limit(5).all()
-
-    activity_log = []
-
-    for user in recent_users:
-        activity_log.append({
-            "type": "user_signup",
-            "message": f"New user joined: {user.name or user.email}",
-            # No created_at on User model based on previous view, using ID as proxy for "recent"
-            # In a real app, add created_at to User.
-            "timestamp": "Recently" 
-        })
+    events = activity.list_events(db, limit=limit, before=before, after=after, event_type=type)
+    return [activity.serialize(e) for e in events]
 
-    for interview in recent_interviews:
-        # Fetch candidate name
-        candidate = db.query(models.User).filter(models.User.user_id == interview.candidate_id).first()
-        name = candidate.name if candidate else "Unknown Candidate"
-        
-        activity_log.append({
-            "type": "interview_created",
-            "message": f"Interview scheduled for {name}",
-            "timestamp": f"{interview.date} {interview.time}" if interview.date else "Recently"
-        })
 
-    # Sort simplisticly or just return combined (refining this would require precise timestamps on all models)
-    return activity_log
+@router.get("/activity/stream")
+async def stream_activity(
+    request: Request,
+    after: Optional[int] = Query(None, description="Resume after this event_id; defaults to the newest event"),
+    type: Optional[str] = Query(None),
+):
+    """
+    Server-Sent Events stream of new activity for live dashboards.
+    """
+
+    def newest_id() -> int:
+        with SessionLocal() as db:
+            latest = activity.list_events(db, limit=1, event_type=type)
+            return latest[0].event_id if latest else 0
+
+    def fetch(tail: activity.Tail) -> List[dict]:
+        with SessionLocal() as db:
+            return [activity.serialize(e) for e in tail.poll(db)]
+
+    async def event_source():
+        start = after if after is not None else await run_in_threadpool(newest_id)
+        tail = activity.Tail(start, event_type=type)
+        last = start
+        while not await request.is_disconnected():
+            events = await run_in_threadpool(fetch, tail)
+            for event in events:
+                # Late events carry lower ids; `id:` stays the newest id sent, the resume point
+                last = max(last, event["event_id"])
+                yield f"id: {last}\ndata: {json.dumps(event)}\n\n"
+            if not events:
+                yield ": keep-alive\n\n"
+                await asyncio.sleep(ACTIVITY_POLL_SECONDS)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream")
 
 
 @router.get("/users")
@@ -91,7 +245,12 @@ def get_user_details(user_id: int, db: Session = Depends(get_db)):
     """
     Get comprehensive details of a specific user.
     """
-    user = db.query(models.User).filter(models.User.user_id == user_id).first()
+    user = (
+        db.query(models.User)
+        .options(undefer_group("resume"))
+        .filter(models.User.user_id == user_id)
+        .first()
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -108,8 +267,9 @@ def get_user_details(user_id: int, db: Session = Depends(get_db)):
 
     # Fetch documents
     documents = db.query(models.Document).filter(models.Document.user_id == user_id).all()
+    urls = signed_document_urls(documents)
     docs_list = [
-        {"file_name": d.file_name, "file_type": d.file_type, "file_url": d.file_url}
+        {"file_name": d.file_name, "file_type": d.file_type, "file_url": urls.get(d.file_path, d.file_url)}
         for d in documents
     ]
 
@@ -134,19 +294,110 @@ def get_user_details(user_id: int, db: Session = Depends(get_db)):
     }
 
 
+@router.get("/users/{user_id}/score-history")
+def get_user_score_history(user_id: int, window: int = Query(3, ge=1, le=20), db: Session = Depends(get_db)):
+    """
+    A candidate's scores across interviews with moving averages and trends.
+    """
+    if db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return score_analytics.candidate_history(db, user_id, window)
+
+
+@router.get("/analytics/cohort")
+def get_cohort_analytics(
+    days: Optional[int] = Query(None, ge=1, le=3650, description="Only interviews from the last N days"),
+    top_skills: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Score distribution across all candidates, with a per-skill breakdown.
+    """
+    return score_analytics.cohort_stats(db, days, top_skills)
+
+
+@router.get("/search", dependencies=[Depends(get_current_admin)])
+def search_documents(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None, description="transcript, answer, resume, resume_summary"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranked full-text search over transcripts, answers and resumes with highlighted snippets.
+    """
+    unknown = set(types or ()) - set(search.DOC_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown document types: {', '.join(sorted(unknown))}")
+
+    # One extra row tells us whether there is a next page without a COUNT(*)
+    hits = search.search(db, q, types=types, limit=page_size + 1, offset=(page - 1) * page_size)
+    has_more = len(hits) > page_size
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more,
+        "results": search.attach_context(db, hits[:page_size]),
+    }
+
+
+@router.get("/export/interviews")
+def export_interviews(
+    format: str = Query("ndjson", description="ndjson, csv or parquet"),
+    since: datetime = Query(export.EPOCH, description="Watermark returned by the previous export"),
+    include_transcript: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Stream every completed interview with its questions, responses, scores and feedback.
+
+    The `X-Export-Watermark` response header is the `since` for the next incremental export.
+    """
+    try:
+        export.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    watermark = export.current_watermark(db)
+
+    def body():
+        # Own session: the request-scoped one is closed before the body is streamed
+        with SessionLocal() as stream_db:
+            yield from export.export_interviews(
+                stream_db, format, since=since, until=watermark, include_transcript=include_transcript
+            )
+
+    return StreamingResponse(
+        body(),
+        media_type=export.MEDIA_TYPES[format],
+        headers={
+            "X-Export-Watermark": watermark.isoformat(),
+            "Content-Disposition": (
+                f'attachment; filename="interviews-{since:%Y%m%dT%H%M%S}-{watermark:%Y%m%dT%H%M%S}.{format}"'
+            ),
+        },
+    )
+
+
 @router.get("/interviews")
 def get_all_interviews(db: Session = Depends(get_db)):
     """
     Get list of all interviews in LIFO order.
     """
-    interviews = db.query(models.Interview).order_by(desc(models.Interview.interview_id)).all()
+    # Candidate name comes from the same query instead of one lookup per row
+    interviews = (
+        db.query(models.Interview, models.User.name)
+        .outerjoin(models.User, models.User.user_id == models.Interview.candidate_id)
+        .order_by(desc(models.Interview.interview_id))
+        .all()
+    )
     
     results = []
-    for i in interviews:
-        candidate = db.query(models.User).filter(models.User.user_id == i.candidate_id).first()
+    for i, candidate_name in interviews:
         results.append({
             "interview_id": i.interview_id,
-            "candidate_name": candidate.name if candidate else "Unknown",
+            "candidate_name": candidate_name if candidate_name is not None else "Unknown",
             "date": i.date,
             "time": i.time,
             "type": i.type,
@@ -161,23 +412,50 @@ def get_interview_details(interview_id: int, db: Session = Depends(get_db)):
     """
     Get full details of a specific interview session.
     """
-    interview = db.query(models.Interview).filter(models.Interview.interview_id == interview_id).first()
+    interview = (
+        db.query(models.Interview)
+        .options(undefer(models.Interview.transcript))
+        .filter(models.Interview.interview_id == interview_id)
+        .first()
+    )
     if not interview:
         raise HTTPException(status_code=404, detail="Interview not found")
 
     candidate = db.query(models.User).filter(models.User.user_id == interview.candidate_id).first()
-    feedback = db.query(models.Feedback).filter(models.Feedback.interview_id == interview_id).first()
-    questions = db.query(models.Question).filter(models.Question.interview_id == interview_id).all()
-
-    transcript = []
-    for q in questions:
-        response = db.query(models.Response).filter(models.Response.question_id == q.question_id).first()
-        transcript.append({
-            "question": q.question_text,
-            "answer": response.answer_text if response else None,
-            "score": response.relevance_score if response else None,
-            "feedback": None # If per-question feedback exists later
-        })
+
+    if interview.archived_at is not None:
+        # Rehydrate from cold storage; the stub row only keeps the summary columns
+        record = archive.load_archived_interview(interview)
+        feedback = record["feedback"] or {}
+        transcript = [
+            {
+                "question": q["question_text"],
+                "answer": (q["response"] or {}).get("answer_text"),
+                "score": (q["response"] or {}).get("relevance_score"),
+                "feedback": None,
+            }
+            for q in record["questions"]
+        ]
+        transcript_full = record["transcript"]
+    else:
+        fb = db.query(models.Feedback).options(undefer_group("feedback_text")).filter(models.Feedback.interview_id == interview_id).first()
+        feedback = (
+            {"comments": fb.comments, "suggestions": fb.suggestions, "report_url": fb.report_url}
+            if fb
+            else {}
+        )
+        questions = db.query(models.Question).filter(models.Question.interview_id == interview_id).all()
+
+        transcript = []
+        for q in questions:
+            response = db.query(models.Response).filter(models.Response.question_id == q.question_id).first()
+            transcript.append({
+                "question": q.question_text,
+                "answer": response.answer_text if response else None,
+                "score": response.relevance_score if response else None,
+                "feedback": None # If per-question feedback exists later
+            })
+        transcript_full = interview.transcript
 
     return {
         "interview_id": interview.interview_id,
@@ -194,12 +472,13 @@ def get_interview_details(interview_id: int, db: Session = Depends(get_db)):
         "tavus_conversation_url": interview.tavus_conversation_url,
         "recording_url": interview.recording_url,
         "feedback": {
-            "comments": feedback.comments if feedback else None,
-            "suggestions": feedback.suggestions if feedback else None,
-            "report_url": feedback.report_url if feedback else None,
+            "comments": feedback.get("comments"),
+            "suggestions": feedback.get("suggestions"),
+            "report_url": feedback.get("report_url"),
         },
         "transcript_list": transcript, # Renamed to distinguish from full text
-        "transcript_full": interview.transcript # The raw text from Tavus
+        "transcript_full": transcript_full, # The raw text from Tavus
+        "archived_at": interview.archived_at,
     }
 
 
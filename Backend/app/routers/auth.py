@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from .. import models, schemas
 from ..db import get_db
-from ..auth_utils import hash_password, verify_password, create_access_token
+from ..services import activity, admin_stats
+from ..auth_utils import PasswordHasherBusy, hash_password, needs_rehash, verify_password, create_access_token
 
 
 router = APIRouter()
@@ -33,6 +34,9 @@ def register_admin(db: Session = Depends(get_db)):
         role="admin",
     )
     db.add(user)
+    admin_stats.record_user_created(db)
+    db.flush()
+    activity.record_event(db, activity.USER_SIGNUP, f"New admin joined: {user.name}", user_id=user.user_id)
     db.commit()
     db.refresh(user)
     return user
@@ -44,6 +48,7 @@ def register(payload: schemas.UserRegisterRequest, db: Session = Depends(get_db)
     existing_user = db.query(models.User).filter_by(email=payload.email).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    db.rollback()  # hand the connection back to the pool while bcrypt runs
 
     # Create new user
     new_user = models.User(
@@ -53,6 +58,14 @@ def register(payload: schemas.UserRegisterRequest, db: Session = Depends(get_db)
         role=payload.role or "candidate",
     )
     db.add(new_user)
+    admin_stats.record_user_created(db)
+    db.flush()
+    activity.record_event(
+        db,
+        activity.USER_SIGNUP,
+        f"New user joined: {new_user.name or new_user.email}",
+        user_id=new_user.user_id,
+    )
     db.commit()
     db.refresh(new_user)
     
@@ -71,10 +84,24 @@ def login(payload: schemas.AuthLoginRequest, db: Session = Depends(get_db)):
     user = db.query(models.User).filter_by(email=payload.email).first()
     if not user or not user.password_hash:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    password_hash = user.password_hash
+    # Don't hold a pooled connection while bcrypt runs, or a login burst exhausts
+    # the pool (and times out every other route) long before the hashing queue fills
+    db.rollback()
 
-    if not verify_password(payload.password, user.password_hash):
+    if not verify_password(payload.password, password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    if needs_rehash(password_hash):
+        # BCRYPT_ROUNDS changed since this hash was made: upgrade it while we have the password
+        try:
+            user.password_hash = hash_password(payload.password)
+        except PasswordHasherBusy:
+            pass  # not worth failing the login over; the next one upgrades it
+
+    activity.record_event(db, activity.USER_LOGIN, f"User signed in: {user.name or user.email}", user_id=user.user_id)
+    db.commit()
+
     # Generate real JWT token
     access_token = create_access_token(data={"sub": str(user.user_id)})
 
@@ -1,86 +1,193 @@
+import logging
+import os
+from typing import Dict, List
+
+import anyio
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from .. import models, schemas
 from ..db import get_db
-from ..services.storage import storage_service
-from ..dependencies import get_current_user
-from datetime import date
+from ..services import activity, blobs
+from ..services.storage import (
+    LocalStorage, SignedUrlCache, StorageBackend, get_signed_url_cache, get_storage_service,
+)
+from ..dependencies import Principal, get_current_user
+from ..uploads import open_pdf
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+DOCUMENT_BUCKET = blobs.BUCKET
+
+
+def signed_document_urls(docs: List[models.Document]) -> Dict[str, str]:
+    """Signed links for `docs` keyed by file_path, in at most one storage round trip.
+
+    For sync routes (runs the cache lookup on the event loop). Documents that
+    can't be signed right now keep their stored URL.
+    """
+    paths = [d.file_path for d in docs if d.file_path]
+    if not paths:
+        return {}
+    try:
+        return anyio.from_thread.run(get_signed_url_cache().urls, DOCUMENT_BUCKET, paths)
+    except Exception:
+        logger.exception("Signing document URLs failed")
+        return {}
 
 @router.post("/upload", response_model=dict)
 async def upload_document(
     file: UploadFile = File(...),
     file_type: str = "resume",
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage_service),
 ):
     """
-    Upload a document (PDF only) to Supabase Storage.
-    Replaces existing document of the same type for the user.
+    Upload a document (PDF only) to the configured storage backend.
+    Becomes the new version of the user's document of the same type; content
+    that is already stored is not uploaded again.
     """
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
-    
+
+    # Checks the spooled upload in place; it is streamed to storage from disk, never read whole
+    content = await run_in_threadpool(open_pdf, file)
+    sha256, size = await run_in_threadpool(blobs.hash_file, content)
+
     # Use authenticated user from dependency
     user = current_user
     user_id = user.user_id
 
-    content = await file.read()
-    
-    # Define storage path: user_id/file_type.pdf (e.g., 123/resume.pdf)
-    # This ensures "replace" logic naturally works if we overwrite
-    file_ext = "pdf"
-    file_path = f"{user_id}/{file_type}.{file_ext}"
-    bucket_name = "pdfs" # Ensure this bucket exists in Supabase
-
-    try:
-        # Upload to Supabase
-        public_url = storage_service.upload_file(bucket_name, file_path, content)
-        
-        # Check DB for existing document of this type
-        existing_doc = db.query(models.Document).filter(
-            models.Document.user_id == user_id,
-            models.Document.file_type == file_type
-        ).first()
-
-        if existing_doc:
-            # Update existing record
-            existing_doc.file_name = file.filename
-            existing_doc.file_path = file_path
-            existing_doc.file_url = public_url
-            existing_doc.created_at = date.today()
-        else:
-            # Create new record
-            new_doc = models.Document(
-                user_id=user_id,
-                file_name=file.filename,
-                file_path=file_path,
-                file_type=file_type,
-                file_url=public_url
-            )
-            db.add(new_doc)
-        
+    def save_document(storage_path: str):
+        document, changed, legacy_path = blobs.record_version(
+            db, user_id, file_type, file.filename, sha256, size, "application/pdf", storage_path
+        )
+        activity.record_event(
+            db,
+            activity.DOCUMENT_UPLOADED,
+            f"{user.name or user.email} uploaded a {file_type}",
+            user_id=user_id,
+        )
         db.commit()
-        
-        return {"url": public_url, "message": "Upload successful"}
+        return document.file_path, document.file_url, document.versions[0].version, changed, legacy_path
 
+    try:
+        stored_path = await run_in_threadpool(blobs.reuse, db, sha256)
+        uploaded_path = None
+        if stored_path is None:
+            uploaded_path = blobs.new_blob_path(sha256, "application/pdf")
+            await storage.upload(DOCUMENT_BUCKET, uploaded_path, content)
+        file_path, public_url, version, changed, legacy_path = await run_in_threadpool(
+            save_document, stored_path or uploaded_path
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    if uploaded_path is not None and uploaded_path != file_path:
+        # Someone stored the same content concurrently and their copy won; drop ours
+        try:
+            await storage.delete(DOCUMENT_BUCKET, uploaded_path)
+        except Exception:
+            logger.exception("Deleting duplicate upload %s failed", uploaded_path)
+
+    if legacy_path is not None:
+        # The pre-blob upload this replaced has no blob row, so GC would never remove it
+        try:
+            await storage.delete(DOCUMENT_BUCKET, legacy_path)
+        except Exception:
+            logger.exception("Deleting replaced legacy upload %s failed", legacy_path)
+        get_signed_url_cache().invalidate(DOCUMENT_BUCKET, legacy_path)
+
+    return {
+        "url": public_url,
+        "message": "Upload successful",
+        "version": version,
+        # Whether the content was already stored is not reported: storage is
+        # shared, so it would tell the caller that someone else has this file
+        "new_version": changed,
+    }
+
+
+@router.get("/{document_id}/versions", response_model=list)
+def get_document_versions(
+    document_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    url_cache: SignedUrlCache = Depends(get_signed_url_cache),
+):
+    """
+    Version history of one of the current user's documents, newest first.
+    """
+    doc = db.query(models.Document).filter(
+        models.Document.document_id == document_id,
+        models.Document.user_id == current_user.user_id
+    ).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    versions = (
+        db.query(models.DocumentVersion, models.Blob)
+        .join(models.Blob, models.Blob.sha256 == models.DocumentVersion.blob_sha256)
+        .filter(models.DocumentVersion.document_id == document_id)
+        .order_by(models.DocumentVersion.version.desc())
+        .all()
+    )
+    paths = [blob.storage_path for _, blob in versions]
+    try:
+        urls = anyio.from_thread.run(url_cache.urls, DOCUMENT_BUCKET, paths) if paths else {}
+    except Exception:
+        logger.exception("Signing document URLs failed")
+        urls = {}
+    return [
+        {
+            "version": version.version,
+            "file_name": version.file_name,
+            "size": blob.size,
+            "sha256": blob.sha256,
+            "file_url": urls.get(blob.storage_path),
+            "created_at": version.created_at,
+            "current": i == 0,
+        }
+        for i, (version, blob) in enumerate(versions)
+    ]
+
+
+@router.get("/files/{bucket}/{path:path}")
+def get_local_file(
+    bucket: str, path: str, expires: int, signature: str, storage: StorageBackend = Depends(get_storage_service)
+):
+    """
+    Serve a file kept by the local storage backend, given a link it signed.
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not storage.verify(bucket, path, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    try:
+        full_path = storage.file_path(bucket, path)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(full_path)
+
 @router.get("/me", response_model=list)
 def get_my_documents(
-    current_user: models.User = Depends(get_current_user), 
+    current_user: Principal = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
     user_id = current_user.user_id
     docs = db.query(models.Document).filter(models.Document.user_id == user_id).all()
+    urls = signed_document_urls(docs)
     return [
         {
             "document_id": d.document_id,
             "file_name": d.file_name,
             "file_type": d.file_type,
-            "file_url": d.file_url,
+            "file_url": urls.get(d.file_path, d.file_url),
             "created_at": d.created_at
         }
         for d in docs
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from ..core_config import get_settings
 from ..db import get_db
+from ..metrics import REGISTRY
 
 
+settings = get_settings()
 router = APIRouter()
 
 
@@ -12,3 +16,11 @@ router = APIRouter()
 def db_health(db: Session = Depends(get_db)):
     db.execute(text("SELECT 1"))
     return {"status": "ok"}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(authorization: str | None = Header(default=None)):
+    # Async: the threadpool gauges are read on the event loop
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
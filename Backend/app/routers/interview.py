@@ -1,16 +1,21 @@
 import logging
+import uuid
 from datetime import datetime
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer, undefer_group
 
-from .. import models, schemas
+from .. import archive, models, schemas
 from ..db import get_db
-from ..services.gemini_service import gemini_service
-from ..services.tavus_service import tavus_service
-from ..dependencies import get_current_user
-
+from ..core_config import get_settings
+from ..services import activity, admin_stats, interview_scores, question_dedup
+from ..services.gemini_service import GeminiService, get_gemini_service
+from ..services.skills import skill_key, skill_resolver
+from ..services.tavus_service import TavusService, get_tavus_service
+from ..dependencies import Principal, get_current_user
+
+settings = get_settings()
 router = APIRouter()
 
 from ..services.cloudinary_utils import get_upload_signature
@@ -18,6 +23,44 @@ from ..services.cloudinary_utils import get_upload_signature
 logger = logging.getLogger(__name__)
 
 
+# --- Helpers ------------------------------------------------------------------
+
+
+def _generate_fresh_questions(
+    db: Session,
+    gemini: GeminiService,
+    candidate_id: int,
+    candidate_profile: dict,
+    skill_names: list[str],
+    count: int,
+) -> list[str]:
+    """Generate `count` questions, dropping near-duplicates of the candidate's past questions.
+
+    Asks Gemini again (telling it what to avoid) while too many were dropped,
+    then tops up from the question bank.
+    """
+    history = question_dedup.candidate_signatures(db, candidate_id)
+    questions: list[str] = []
+    rejected: list[str] = []
+    for _ in range(settings.QUESTION_DEDUP_MAX_ATTEMPTS):
+        generated = gemini.generate_interview_questions(
+            candidate_profile, count=count, avoid=(questions + rejected) or None
+        )
+        fresh = question_dedup.filter_repeats(questions + generated, history)[len(questions):]
+        rejected += [q for q in generated if q not in fresh]
+        questions += fresh[: count - len(questions)]
+        if len(questions) >= count:
+            return questions
+
+    if rejected:
+        logger.info("Dropped %s repeated questions for candidate %s", len(rejected), candidate_id)
+    questions += question_dedup.bank_fill(
+        db, question_dedup.extend(history, questions), skill_names, count - len(questions)
+    )
+    # Better a repeat than an empty interview
+    return questions or gemini.generate_interview_questions(candidate_profile, count=count)
+
+
 # --- Routes -------------------------------------------------------------------
 
 
@@ -54,45 +97,18 @@ def update_recording_url(interview_id: int, payload: dict, db: Session = Depends
 @router.post("/start", response_model=schemas.InterviewStartResponse)
 def start_interview(
     payload: schemas.InterviewStartRequest, 
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    gemini: GeminiService = Depends(get_gemini_service),
+    tavus: TavusService = Depends(get_tavus_service),
 ):
-    # Use the authenticated user
-    candidate = current_user
-
-    # Attach skills to candidate if provided
-    skill_names: list[str] = []
-    if payload.skills:
-        for skill_name in payload.skills:
-            normalized = (skill_name or "").strip()
-            if not normalized:
-                continue
-            existing_skill = (
-                db.query(models.Skill)
-                .filter(models.Skill.skill_name.ilike(normalized))
-                .first()
-            )
-            if existing_skill is None:
-                existing_skill = models.Skill(skill_name=normalized)
-                db.add(existing_skill)
-                db.commit()
-                db.refresh(existing_skill)
-
-            link_exists = (
-                db.query(models.UserSkill)
-                .filter_by(user_id=candidate.user_id, skill_id=existing_skill.skill_id)
-                .first()
-            )
-            if not link_exists:
-                user_skill = models.UserSkill(
-                    user_id=candidate.user_id,
-                    skill_id=existing_skill.skill_id,
-                    proficiency=None,
-                )
-                db.add(user_skill)
-                db.commit()
-
-            skill_names.append(existing_skill.skill_name)
+    # Use the authenticated user; the resume columns feed the Gemini prompts
+    candidate = (
+        db.query(models.User)
+        .options(undefer_group("resume"))
+        .filter_by(user_id=current_user.user_id)
+        .one()
+    )
 
     # For now, interviewer is not created dynamically; we require an interviewer_id
     if payload.interviewer_id is None:
@@ -121,19 +137,13 @@ def start_interview(
         except ValueError:
             pass
 
-    interview = models.Interview(
-        candidate_id=candidate.user_id,
-        interviewer_id=interviewer.user_id,
-        date=interview_date,
-        time=interview_time,
-        type=payload.interview_type,
-        status="In Progress",
-    )
-    db.add(interview)
-    db.commit()
-    db.refresh(interview)
+    # All upstream calls (Gemini, Tavus) happen before the first write so the
+    # database transaction below stays short and commits exactly once; a
+    # failure anywhere leaves no half-created interview behind.
+    skill_names = list({
+        skill_key(name): " ".join(name.split()) for name in (payload.skills or []) if skill_key(name)
+    }.values())
 
-    # Create Tavus CVI conversation for this interview
     candidate_profile = {
         "name": candidate.name,
         "email": candidate.email,
@@ -143,28 +153,14 @@ def start_interview(
         "skills": skill_names,
     }
 
-    skills_section = ", ".join(skill_names) if skill_names else "(skills not provided)"
-    resume_section = candidate.resume_summary or "No explicit resume summary was provided."
-
-    # Pre-generate 5 questions using Gemini
-    question_texts = gemini_service.generate_interview_questions(candidate_profile, count=5)
-    
-    db_questions = []
-    for q_text in question_texts:
-        q_model = models.Question(
-            interview_id=interview.interview_id,
-            question_text=q_text,
-        )
-        db.add(q_model)
-        db_questions.append(q_model)
-    
-    db.commit()
-    for q in db_questions:
-        db.refresh(q)
+    # Pre-generate 5 questions using Gemini, never repeating what this candidate was asked before
+    question_texts = _generate_fresh_questions(
+        db, gemini, candidate.user_id, candidate_profile, skill_names, count=5
+    )
 
     # Regerate Tavus context with the specific questions included
     questions_list_str = "\n".join([f"- {q}" for q in question_texts])
-    context_str = gemini_service.generate_tavus_interviewer_context(
+    context_str = gemini.generate_tavus_interviewer_context(
         {
             "name": candidate_profile.get("name"),
             "target_role": candidate_profile.get("role") or payload.interview_type,
@@ -178,13 +174,17 @@ def start_interview(
     # Append the list of questions explicitly to the context
     context_str += f"\n\nPlease ask these specific questions in order:\n{questions_list_str}"
 
+    # Create Tavus CVI conversation for this interview
     tavus_data: dict | None = None
     tavus_error: str | None = None
     conv_id: str | None = None
     conv_url: str | None = None
+    # The interview has no id yet (it is inserted last); an opaque reference
+    # stored on it ties the Tavus conversation back without sending candidate PII
+    conversation_ref = str(uuid.uuid4())
     try:
-        tavus_data = tavus_service.create_conversation(
-            conversation_name=f"InterviewDost Interview {interview.interview_id}",
+        tavus_data = tavus.create_conversation(
+            conversation_name=f"InterviewDost Interview {conversation_ref}",
             context=context_str,
         )
 
@@ -205,7 +205,7 @@ def start_interview(
 
         if conv_id and not conv_url:
             try:
-                detail = tavus_service.get_conversation(conv_id)
+                detail = tavus.get_conversation(conv_id)
                 nested_detail = detail.get("data") if isinstance(detail.get("data"), dict) else None
                 conv_url = (
                     detail.get("conversation_url")
@@ -218,24 +218,51 @@ def start_interview(
     except RuntimeError as e:
         tavus_error = str(e)
 
-    interview.tavus_conversation_id = conv_id
-    interview.tavus_conversation_url = conv_url
-    db.add(interview)
-    db.commit()
-    db.refresh(interview)
-
     if tavus_error:
         logger.error("Tavus setup failed: %s", tavus_error)
 
-    return schemas.InterviewStartResponse(
+    # --- Single unit of work ---------------------------------------------------
+    if skill_names:
+        resolved = skill_resolver.resolve(db, skill_names)
+        skill_resolver.link_user(db, candidate.user_id, [(skill_id, None) for skill_id, _ in resolved.values()])
+
+    interview = models.Interview(
+        candidate_id=candidate.user_id,
+        interviewer_id=interviewer.user_id,
+        date=interview_date,
+        time=interview_time,
+        type=payload.interview_type,
+        status="In Progress",
+        tavus_conversation_id=conv_id,
+        tavus_conversation_url=conv_url,
+        conversation_ref=conversation_ref,
+        questions=[models.Question(question_text=q_text) for q_text in question_texts],
+    )
+    db.add(interview)
+    admin_stats.record_interview_started(db)
+    # One flush inserts the interview and its questions; primary keys come back
+    # via RETURNING, so no refresh() round trips are needed.
+    db.flush()
+    activity.record_event(
+        db,
+        activity.INTERVIEW_STARTED,
+        f"Interview started for {candidate.name or candidate.email}",
+        user_id=candidate.user_id,
+        interview_id=interview.interview_id,
+    )
+
+    # Build the response before committing: commit expires loaded attributes.
+    response = schemas.InterviewStartResponse(
         interview_id=interview.interview_id,
         questions=[
             schemas.Question(question_id=q.question_id, text=q.question_text)
-            for q in db_questions
+            for q in interview.questions
         ],
         conversation_url=conv_url,
         tavus_error=tavus_error,
     )
+    db.commit()
+    return response
 
 
 @router.post("/{interview_id}/questions/{question_id}/answer", response_model=schemas.AnswerResponse)
@@ -244,6 +271,7 @@ def submit_answer(
     question_id: int,
     payload: schemas.AnswerRequest,
     db: Session = Depends(get_db),
+    gemini: GeminiService = Depends(get_gemini_service),
 ):
     interview: Optional[models.Interview] = (
         db.query(models.Interview).filter_by(interview_id=interview_id).first()
@@ -251,9 +279,12 @@ def submit_answer(
     if not interview:
         raise HTTPException(status_code=404, detail="Interview not found")
 
+    # Locked until commit: chunks of one answer arrive concurrently, and each must
+    # see the text and scores the previous one committed (see record_answer_scores)
     question: Optional[models.Question] = (
         db.query(models.Question)
         .filter_by(question_id=question_id, interview_id=interview_id)
+        .with_for_update()
         .first()
     )
     if not question:
@@ -267,64 +298,69 @@ def submit_answer(
         # Append new text to existing
         full_answer_text = f"{existing_response.answer_text} {payload.answer_text}"
 
-    scores = gemini_service.evaluate_answer(question.question_text, full_answer_text)
+    scores = gemini.evaluate_answer(question.question_text, full_answer_text)
 
+    old_scores = (None, None)
     if existing_response:
+        old_scores = (existing_response.relevance_score, existing_response.confidence_level)
         existing_response.answer_text = full_answer_text
         existing_response.relevance_score = scores["relevance_score"]
         existing_response.confidence_level = scores["confidence_level"]
-        db.add(existing_response)
-        db.commit()
-        db.refresh(existing_response)
     else:
-        response = models.Response(
-            question_id=question.question_id,
-            answer_text=full_answer_text,
-            relevance_score=scores["relevance_score"],
-            confidence_level=scores["confidence_level"],
+        db.add(
+            models.Response(
+                question_id=question.question_id,
+                answer_text=full_answer_text,
+                relevance_score=scores["relevance_score"],
+                confidence_level=scores["confidence_level"],
+            )
         )
-        db.add(response)
-        db.commit()
-        db.refresh(response)
 
-    # Update overall score - Simple average of all responses so far
-    all_responses = (
-        db.query(models.Response)
-        .join(models.Question)
-        .filter(models.Question.interview_id == interview_id)
-        .all()
+    # Update overall score from the interview's running aggregates (O(1))
+    interview_scores.record_answer_scores(
+        db,
+        interview,
+        old=old_scores,
+        new=(scores["relevance_score"], scores["confidence_level"]),
     )
-    
-    if all_responses:
-        total_score = sum([(r.relevance_score + r.confidence_level) / 2 for r in all_responses])
-        interview.overall_score = int(total_score / len(all_responses))
-        db.add(interview)
-        db.commit()
+
+    db.commit()
 
     return schemas.AnswerResponse(
-        interview_id=interview.interview_id,
-        question_id=question.question_id,
+        interview_id=interview_id,
+        question_id=question_id,
         follow_up_question=None,
         done=True,
     )
 
 
 @router.post("/{interview_id}/end")
-def end_interview(interview_id: int, db: Session = Depends(get_db)):
+def end_interview(
+    interview_id: int,
+    db: Session = Depends(get_db),
+    tavus: TavusService = Depends(get_tavus_service),
+):
     """
     Explicitly end the interview (e.g. on tab close or finish button).
     """
-    interview = db.query(models.Interview).filter_by(interview_id=interview_id).first()
+    interview = db.query(models.Interview).options(undefer(models.Interview.transcript)).filter_by(interview_id=interview_id).first()
     if not interview:
         raise HTTPException(status_code=404, detail="Interview not found")
 
-    interview.status = "Completed"
+    if admin_stats.record_interview_completed(db, interview):
+        activity.record_event(
+            db,
+            activity.INTERVIEW_COMPLETED,
+            f"Interview {interview_id} completed",
+            user_id=interview.candidate_id,
+            interview_id=interview_id,
+        )
     
     # End Tavus conversation if active AND fetch transcript
     if interview.tavus_conversation_id:
         try:
             # 1. Fetch transcript details first (while it might still be active/accessible)
-            detail = tavus_service.get_conversation(interview.tavus_conversation_id)
+            detail = tavus.get_conversation(interview.tavus_conversation_id)
             logger.info(f"End Interview {interview_id}: Tavus response: {detail}")
 
             nested = detail.get("data") if isinstance(detail.get("data"), dict) else {}
@@ -355,7 +391,7 @@ def end_interview(interview_id: int, db: Session = Depends(get_db)):
                  logger.warning(f"End Interview {interview_id}: No transcript found in Tavus response")
 
             # 2. End the conversation
-            tavus_service.end_conversation(interview.tavus_conversation_id)
+            tavus.end_conversation(interview.tavus_conversation_id)
         except Exception as e:
             logger.warning(f"Failed to process Tavus end sequence: {e}")
 
@@ -368,7 +404,11 @@ def end_interview(interview_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{interview_id}/transcript")
-def get_live_transcript(interview_id: int, db: Session = Depends(get_db)):
+def get_live_transcript(
+    interview_id: int,
+    db: Session = Depends(get_db),
+    tavus: TavusService = Depends(get_tavus_service),
+):
     """
     Fetch the live conversation transcript from Tavus.
     """
@@ -381,7 +421,7 @@ def get_live_transcript(interview_id: int, db: Session = Depends(get_db)):
         return {"transcript": []}
 
     try:
-        detail = tavus_service.get_conversation(interview.tavus_conversation_id)
+        detail = tavus.get_conversation(interview.tavus_conversation_id)
         # Handle nested data structure if present
         nested = detail.get("data") if isinstance(detail.get("data"), dict) else {}
         transcript_data = detail.get("transcript") or nested.get("transcript") or []
@@ -415,6 +455,7 @@ def push_system_message(
     interview_id: int,
     payload: schemas.SystemMessageRequest,
     db: Session = Depends(get_db),
+    tavus: TavusService = Depends(get_tavus_service),
 ):
     interview: Optional[models.Interview] = (
         db.query(models.Interview).filter_by(interview_id=interview_id).first()
@@ -424,7 +465,7 @@ def push_system_message(
     if not interview.tavus_conversation_id:
         raise HTTPException(status_code=400, detail="No Tavus conversation linked")
     try:
-        tavus_service.send_system_message(interview.tavus_conversation_id, payload.message)
+        tavus.send_system_message(interview.tavus_conversation_id, payload.message)
         return {"status": "ok"}
     except RuntimeError as e:
         raise HTTPException(status_code=502, detail=str(e))
@@ -434,7 +475,9 @@ def push_system_message(
 def interview_assistant(
     interview_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    gemini: GeminiService = Depends(get_gemini_service),
+    tavus: TavusService = Depends(get_tavus_service),
 ):
     interview = db.query(models.Interview).filter_by(interview_id=interview_id).first()
     if not interview:
@@ -444,7 +487,7 @@ def interview_assistant(
         return schemas.AssistantResponse(tip="Avatar not started yet. Good luck!")
 
     try:
-        detail = tavus_service.get_conversation(interview.tavus_conversation_id)
+        detail = tavus.get_conversation(interview.tavus_conversation_id)
         # Tavus provides a transcript in the conversation details if available
         # Note: Tavus API structure for transcript might vary, usually in 'data' or top-level
         nested = detail.get("data") if isinstance(detail.get("data"), dict) else {}
@@ -458,7 +501,7 @@ def interview_assistant(
                 text = entry.get("text", "")
                 transcript_str += f"{role}: {text}\n"
         
-        tip = gemini_service.get_chat_assistant_response(
+        tip = gemini.get_chat_assistant_response(
             transcript_str, 
             interview.candidate.name or "Candidate", 
             interview.type or "Job Interview"
@@ -473,7 +516,8 @@ def interview_assistant(
 def finish_interview(
     interview_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    tavus: TavusService = Depends(get_tavus_service),
 ):
     interview = db.query(models.Interview).filter_by(interview_id=interview_id).first()
     if not interview:
@@ -482,7 +526,7 @@ def finish_interview(
     transcript_text = "No transcript available."
     if interview.tavus_conversation_id:
         try:
-            detail = tavus_service.get_conversation(interview.tavus_conversation_id)
+            detail = tavus.get_conversation(interview.tavus_conversation_id)
             logger.info(f"Finish Interview {interview_id}: Tavus response: {detail}")
 
             nested = detail.get("data") if isinstance(detail.get("data"), dict) else {}
@@ -508,7 +552,7 @@ def finish_interview(
                  logger.info(f"Finish Interview {interview_id}: Transcript extracted, len={len(transcript_text)}")
 
             # Explicitly end the conversation to save credits
-            tavus_service.end_conversation(interview.tavus_conversation_id)
+            tavus.end_conversation(interview.tavus_conversation_id)
         except Exception as e:
             logger.warning(f"Could not fetch final transcript or end conversation: {e}")
 
@@ -526,11 +570,32 @@ def finish_interview(
 @router.get("/{interview_id}/summary", response_model=schemas.InterviewSummaryResponse)
 def get_summary(interview_id: int, db: Session = Depends(get_db)):
     interview: Optional[models.Interview] = (
-        db.query(models.Interview).filter_by(interview_id=interview_id).first()
+        db.query(models.Interview).options(undefer(models.Interview.transcript)).filter_by(interview_id=interview_id).first()
     )
     if not interview:
         raise HTTPException(status_code=404, detail="Interview not found")
 
+    if interview.archived_at is not None:
+        record = archive.load_archived_interview(interview)
+        return schemas.InterviewSummaryResponse(
+            interview_id=interview.interview_id,
+            overall_score=interview.overall_score,
+            average_relevance=interview_scores.average_relevance(interview),
+            average_confidence=interview_scores.average_confidence(interview),
+            items=[
+                schemas.InterviewSummaryItem(
+                    question=q["question_text"],
+                    answer=(q["response"] or {}).get("answer_text"),
+                    relevance_score=(q["response"] or {}).get("relevance_score"),
+                    confidence_level=(q["response"] or {}).get("confidence_level"),
+                )
+                for q in record["questions"]
+            ],
+            transcript=record["transcript"],
+            completed_at=None,
+            recording_url=interview.recording_url,
+        )
+
     questions = (
         db.query(models.Question)
         .filter_by(interview_id=interview_id)
@@ -553,6 +618,8 @@ def get_summary(interview_id: int, db: Session = Depends(get_db)):
     return schemas.InterviewSummaryResponse(
         interview_id=interview.interview_id,
         overall_score=interview.overall_score,
+        average_relevance=interview_scores.average_relevance(interview),
+        average_confidence=interview_scores.average_confidence(interview),
         items=items,
         transcript=interview.transcript,
         completed_at=None,
@@ -577,7 +644,7 @@ def create_feedback(
     if not interview:
         raise HTTPException(status_code=404, detail="Interview not found")
 
-    fb = db.query(models.Feedback).filter_by(interview_id=interview_id).first()
+    fb = db.query(models.Feedback).options(undefer_group("feedback_text")).filter_by(interview_id=interview_id).first()
     if not fb:
         fb = models.Feedback(
             interview_id=interview_id,
@@ -607,20 +674,35 @@ def create_feedback(
 
 
 @router.get("/{interview_id}/feedback", response_model=dict)
-def get_feedback(interview_id: int, db: Session = Depends(get_db)):
-    fb = db.query(models.Feedback).filter_by(interview_id=interview_id).first()
+def get_feedback(
+    interview_id: int,
+    db: Session = Depends(get_db),
+    gemini: GeminiService = Depends(get_gemini_service),
+    tavus: TavusService = Depends(get_tavus_service),
+):
+    fb = db.query(models.Feedback).options(undefer_group("feedback_text")).filter_by(interview_id=interview_id).first()
 
     if not fb:
-        interview = db.query(models.Interview).filter_by(interview_id=interview_id).first()
+        interview = db.query(models.Interview).options(undefer(models.Interview.transcript)).filter_by(interview_id=interview_id).first()
         if not interview:
             raise HTTPException(status_code=404, detail="Interview not found")
 
+        if interview.archived_at is not None:
+            # Never regenerate feedback for an archived interview; serve the archived copy
+            archived_fb = archive.load_archived_interview(interview)["feedback"] or {}
+            return {
+                "feedback_id": None,
+                "interview_id": interview_id,
+                "comments": archived_fb.get("comments"),
+                "suggestions": archived_fb.get("suggestions"),
+                "report_url": archived_fb.get("report_url"),
+            }
+
         # Fallback: specific check for missing transcript
         if not interview.transcript and interview.tavus_conversation_id:
             try:
                 # Attempt to fetch it one last time
-                from ..services.tavus_service import tavus_service
-                detail = tavus_service.get_conversation(interview.tavus_conversation_id)
+                detail = tavus.get_conversation(interview.tavus_conversation_id)
                 nested = detail.get("data") if isinstance(detail.get("data"), dict) else {}
                 transcript_data = detail.get("transcript") or nested.get("transcript") or []
                 
@@ -668,7 +750,7 @@ def get_feedback(interview_id: int, db: Session = Depends(get_db)):
                 }
             )
 
-        summary = gemini_service.summarize_interview(
+        summary = gemini.summarize_interview(
             interview_info, 
             qa_items, 
             raw_transcript=interview.transcript # Pass the full raw transcript
@@ -683,10 +765,17 @@ def get_feedback(interview_id: int, db: Session = Depends(get_db)):
 
         # Update overall score from the smart analysis
         if summary.get("overall_score"):
-            interview.overall_score = summary.get("overall_score")
+            admin_stats.set_overall_score(db, interview, summary.get("overall_score"))
             db.add(interview) # ensure interview update is tracked
 
         db.add(fb)
+        activity.record_event(
+            db,
+            activity.FEEDBACK_GENERATED,
+            f"Feedback generated for interview {interview_id}",
+            user_id=interview.candidate_id,
+            interview_id=interview_id,
+        )
         db.commit()
         db.refresh(fb)
 
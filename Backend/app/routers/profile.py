@@ -3,11 +3,12 @@ from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..db import get_db
-from io import BytesIO
 import json
-from PyPDF2 import PdfReader
-from ..services.gemini_service import gemini_service
-from ..dependencies import get_current_user
+from ..services import resume_extraction
+from ..services.gemini_service import GeminiService, get_gemini_service
+from ..services.skills import skill_resolver
+from ..dependencies import Principal, get_current_user, get_current_user_model
+from ..uploads import open_pdf
 
 
 router = APIRouter()
@@ -16,8 +17,9 @@ router = APIRouter()
 @router.post("/profile/enrich", response_model=schemas.ProfileEnrichResponse)
 def enrich_profile(
     payload: schemas.CandidateProfileInput, 
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_user_model),
+    db: Session = Depends(get_db),
+    gemini: GeminiService = Depends(get_gemini_service),
 ):
     """Create or update a candidate profile and enrich it via Gemini.
 
@@ -30,7 +32,7 @@ def enrich_profile(
     user = current_user
 
     raw_profile = payload.model_dump()
-    enriched = gemini_service.summarize_candidate_profile(raw_profile)
+    enriched = gemini.summarize_candidate_profile(raw_profile)
     resume_summary = enriched.get("resume_summary") or ""
     skills = enriched.get("skills") or []
 
@@ -61,34 +63,10 @@ def enrich_profile(
     db.commit()
 
     # Persist skills
-    normalized_skills = []
-    for skill_name in skills:
-        normalized = (skill_name or "").strip()
-        if not normalized:
-            continue
-
-        skill = (
-            db.query(models.Skill)
-            .filter(models.Skill.skill_name.ilike(normalized))
-            .first()
-        )
-        if skill is None:
-            skill = models.Skill(skill_name=normalized)
-            db.add(skill)
-            db.commit()
-            db.refresh(skill)
-
-        link_exists = (
-            db.query(models.UserSkill)
-            .filter_by(user_id=user.user_id, skill_id=skill.skill_id)
-            .first()
-        )
-        if not link_exists:
-            link = models.UserSkill(user_id=user.user_id, skill_id=skill.skill_id)
-            db.add(link)
-            db.commit()
-
-        normalized_skills.append(skill.skill_name)
+    resolved = skill_resolver.resolve(db, skills)
+    skill_resolver.link_user(db, user.user_id, [(skill_id, None) for skill_id, _ in resolved.values()])
+    db.commit()
+    normalized_skills = [name for _, name in resolved.values()]
 
     return schemas.ProfileEnrichResponse(
         user_id=user.user_id,
@@ -99,7 +77,7 @@ def enrich_profile(
 
 @router.get("/profile/me", response_model=schemas.UserProfileResponse)
 def get_my_profile(
-    current_user: models.User = Depends(get_current_user), 
+    current_user: Principal = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
     """Retrieve detailed profile for the authenticated user."""
@@ -120,7 +98,7 @@ def get_my_profile(
 
 
 @router.post("/profile/upload_resume")
-async def upload_resume(file: UploadFile = File(...)) -> dict:
+def upload_resume(file: UploadFile = File(...)) -> dict:
     """Accept a PDF resume upload and return extracted text.
 
     The frontend can then send this text as `resume_text` to the existing
@@ -130,22 +108,18 @@ async def upload_resume(file: UploadFile = File(...)) -> dict:
     if file.content_type not in {"application/pdf", "application/x-pdf"}:
         raise HTTPException(status_code=400, detail="Only PDF resumes are supported")
 
-    content = await file.read()
-
-    # Prefer Gemini's PDF understanding via inlineData; fall back to PyPDF2
-    try:
-        full_text = gemini_service.extract_resume_text_from_pdf(content)
-    except Exception:
-        reader = PdfReader(BytesIO(content))
-        extracted_text_parts = []
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            extracted_text_parts.append(page_text)
+    pdf = open_pdf(file)
 
-        full_text = "\n".join(extracted_text_parts).strip()
+    # Local extraction first; Gemini only for scanned or badly encoded PDFs
+    extraction = resume_extraction.extract_resume_text(pdf)
+    resume_extraction.record(extraction)
+    full_text = extraction.text
 
     # Truncate to a safe length for downstream LLM calls
     if len(full_text) > 20000:
         full_text = full_text[:20000]
 
-    return {"resume_text": full_text}
+    return {
+        "resume_text": full_text,
+        "extraction": {"tier": extraction.tier, "quality": extraction.quality, "pages": extraction.pages},
+    }
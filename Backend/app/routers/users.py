@@ -1,17 +1,19 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..db import get_db
-from ..dependencies import get_current_user
+from ..dependencies import Principal, get_current_user, get_current_user_model
+from ..services import score_analytics
+from ..services.skills import skill_key, skill_resolver
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=dict)
-def get_current_user_details(current_user: models.User = Depends(get_current_user)):
+def get_current_user_details(current_user: Principal = Depends(get_current_user)):
     """Return details of the currently authenticated user."""
     return {
         "user_id": current_user.user_id,
@@ -22,8 +24,18 @@ def get_current_user_details(current_user: models.User = Depends(get_current_use
     }
 
 
+@router.get("/me/score-history", response_model=dict)
+def get_my_score_history(
+    window: int = Query(3, ge=1, le=20),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Scores across my interviews with moving averages, trends and cohort percentile."""
+    return score_analytics.candidate_history(db, current_user.user_id, window)
+
+
 @router.get("/{user_id}", response_model=dict)
-def get_user(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def get_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Note: in a real app, restrict this to admin or self
     user = db.query(models.User).filter_by(user_id=user_id).first()
     if not user:
@@ -47,7 +59,7 @@ def get_user(user_id: int, db: Session = Depends(get_db), current_user: models.U
 @router.put("/me", response_model=dict)
 def update_my_user(
     payload: schemas.UserUpdateRequest,
-    current_user: models.User = Depends(get_current_user),
+    current_user: models.User = Depends(get_current_user_model),
     db: Session = Depends(get_db),
 ):
     """Update current user profile (name, password)."""
@@ -82,7 +94,7 @@ def update_my_user(
 def add_skills_to_me(
     skill_names: List[str],
     proficiencies: Optional[List[str]] = None,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Attach one or more skills to the current user."""
@@ -94,27 +106,21 @@ def add_skills_to_me(
     if proficiencies and len(proficiencies) != len(skill_names):
         raise HTTPException(status_code=400, detail="proficiencies length must match skill_names length")
 
+    resolved = skill_resolver.resolve(db, skill_names)
     created = []
     for idx, name in enumerate(skill_names):
-        skill = db.query(models.Skill).filter_by(skill_name=name).first()
-        if not skill:
-            skill = models.Skill(skill_name=name)
-            db.add(skill)
-            db.commit()
-            db.refresh(skill)
-
-        proficiency = None
-        if proficiencies:
-            proficiency = proficiencies[idx]
-
-        link = db.query(models.UserSkill).filter_by(user_id=user_id, skill_id=skill.skill_id).first()
-        if not link:
-            link = models.UserSkill(user_id=user_id, skill_id=skill.skill_id, proficiency=proficiency)
-            db.add(link)
-        else:
-            link.proficiency = proficiency
-        created.append({"skill_id": skill.skill_id, "skill_name": skill.skill_name, "proficiency": proficiency})
-
+        ref = resolved.get(skill_key(name))
+        if ref is None:
+            continue
+        proficiency = proficiencies[idx] if proficiencies else None
+        created.append({"skill_id": ref[0], "skill_name": ref[1], "proficiency": proficiency})
+
+    skill_resolver.link_user(
+        db,
+        user_id,
+        [(item["skill_id"], item["proficiency"]) for item in created],
+        overwrite_proficiency=True,
+    )
     db.commit()
 
     return {"user_id": user_id, "skills": created}
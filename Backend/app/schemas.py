@@ -94,6 +94,8 @@ class InterviewSummaryItem(BaseModel):
 class InterviewSummaryResponse(BaseModel):
     interview_id: int
     overall_score: Optional[int]
+    average_relevance: Optional[float] = None
+    average_confidence: Optional[float] = None
     items: List[InterviewSummaryItem]
     transcript: Optional[str] = None
     completed_at: Optional[datetime]
@@ -0,0 +1,331 @@
+"""Full-text search over transcripts, answers and resumes.
+
+The searchable columns are stored compressed (see app/compression.py), so the
+database can't index them in place. Instead their plain text is mirrored into
+one search table, keyed by ``doc_key = doc_id * 8 + type code``:
+
+- SQLite: an FTS5 virtual table ``search_index`` ranked with bm25;
+- PostgreSQL: ``search_documents`` with a generated ``tsvector`` column and a
+  GIN index, ranked with ``ts_rank_cd``.
+
+The table is kept up to date incrementally from an ``after_flush`` hook, in
+the same transaction as the write. Bulk ``query.update()``/``delete()`` bypass
+it; run ``python -m app.search reindex`` after those.
+
+Archived interviews (app/archive.py) drop out of the index with their text.
+"""
+
+import argparse
+import html
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import SessionLocal
+
+# doc_type -> (type code, model, primary key attribute, indexed attribute)
+DOC_TYPES = {
+    "transcript": (1, models.Interview, "interview_id", "transcript"),
+    "answer": (2, models.Response, "response_id", "answer_text"),
+    "resume": (3, models.User, "user_id", "resume_raw"),
+    "resume_summary": (4, models.User, "user_id", "resume_summary"),
+}
+_TYPE_BY_CODE = {code: name for name, (code, *_rest) in DOC_TYPES.items()}
+
+BACKFILL_BATCH_SIZE = 500
+# Ranking cost grows with the number of matches; rank at most this many (newest first)
+RANK_WINDOW = 2000
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+# The database highlights with these private-use characters; the snippet is HTML-escaped
+# before they become SNIPPET_START/END, since the text is whatever candidates wrote
+_HIT_START = "\ue000"
+_HIT_END = "\ue001"
+
+
+def doc_key(doc_type: str, doc_id: int) -> int:
+    return doc_id * 8 + DOC_TYPES[doc_type][0]
+
+
+def _split_key(key: int) -> Tuple[str, int]:
+    return _TYPE_BY_CODE[key % 8], key // 8
+
+
+def _is_postgres(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+# --- Schema ------------------------------------------------------------------------
+
+
+def create_index(conn: Connection) -> None:
+    """Create the search table for the connected backend (idempotent)."""
+    if _is_postgres(conn):
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS search_documents ("
+                " doc_key BIGINT PRIMARY KEY,"
+                " body TEXT NOT NULL,"
+                " tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', body)) STORED)"
+            )
+        )
+        conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)")
+        )
+    else:
+        conn.execute(
+            text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+                "body, tokenize = 'porter unicode61')"
+            )
+        )
+
+
+# --- Writes ------------------------------------------------------------------------
+
+
+def upsert_documents(conn: Connection, docs: Sequence[Tuple[int, Optional[str]]]) -> None:
+    """Replace the indexed text of each `(doc_key, body)`; a blank body removes the document."""
+    if not docs:
+        return
+    keys = [key for key, _ in docs]
+    rows = [{"k": key, "b": body} for key, body in docs if body and body.strip()]
+    if _is_postgres(conn):
+        conn.execute(text("DELETE FROM search_documents WHERE doc_key = ANY(:keys)"), {"keys": keys})
+        if rows:
+            conn.execute(text("INSERT INTO search_documents (doc_key, body) VALUES (:k, :b)"), rows)
+    else:
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join(f":k{i}" for i in range(len(chunk)))
+            conn.execute(
+                text(f"DELETE FROM search_index WHERE rowid IN ({placeholders})"),
+                {f"k{i}": key for i, key in enumerate(chunk)},
+            )
+        if rows:
+            conn.execute(text("INSERT INTO search_index (rowid, body) VALUES (:k, :b)"), rows)
+
+
+_PENDING_KEY = "search_pending_docs"
+
+
+def _stage(target, doc_type: str, body: Optional[str]) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        pk_attr = DOC_TYPES[doc_type][2]
+        session.info.setdefault(_PENDING_KEY, {})[doc_key(doc_type, getattr(target, pk_attr))] = body
+
+
+def _make_listeners(doc_type: str) -> None:
+    _code, model, _pk_attr, attr = DOC_TYPES[doc_type]
+
+    # Mapper events see every row the flush writes, including delete-orphan cascades
+    @event.listens_for(model, "after_insert")
+    def _inserted(mapper, connection, target) -> None:
+        value = target.__dict__.get(attr)
+        if value:
+            _stage(target, doc_type, value)
+
+    @event.listens_for(model, "after_update")
+    def _updated(mapper, connection, target) -> None:
+        if inspect(target).attrs[attr].history.has_changes():
+            _stage(target, doc_type, target.__dict__.get(attr))
+
+    @event.listens_for(model, "after_delete")
+    def _deleted(mapper, connection, target) -> None:
+        _stage(target, doc_type, None)
+
+
+for _doc_type in DOC_TYPES:
+    _make_listeners(_doc_type)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _index_flushed_documents(session: Session, flush_context) -> None:
+    # Written in one batch per flush, inside the same transaction as the rows
+    docs = session.info.pop(_PENDING_KEY, None)
+    if docs:
+        upsert_documents(session.connection(), list(docs.items()))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending_documents(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- Backfill ----------------------------------------------------------------------
+
+
+def reindex(conn: Connection) -> int:
+    """Rebuild the whole index from the source tables; returns the documents indexed."""
+    create_index(conn)
+    conn.execute(text("DELETE FROM search_documents" if _is_postgres(conn) else "DELETE FROM search_index"))
+    indexed = 0
+    for doc_type, (_code, model, pk_attr, attr) in DOC_TYPES.items():
+        table = model.__table__
+        pk, column = table.c[pk_attr], table.c[attr]
+        last = 0
+        while True:
+            rows = conn.execute(
+                select(pk, column)
+                .where(pk > last, column.is_not(None))
+                .order_by(pk)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            upsert_documents(conn, [(doc_key(doc_type, row_id), body) for row_id, body in rows])
+            indexed += len(rows)
+            last = rows[-1][0]
+    return indexed
+
+
+# --- Queries -----------------------------------------------------------------------
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax
+    terms = [term.replace('"', '""') for term in q.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search(
+    db: Session,
+    q: str,
+    *,
+    types: Optional[Iterable[str]] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Ranked hits for `q` (best first), each with a highlighted snippet.
+
+    Returns up to `limit` hits as dicts with doc_type, doc_id, score and
+    snippet; callers page with `offset`. Only the newest `RANK_WINDOW`
+    matches are ranked, which keeps very common terms fast on large indexes.
+    """
+    conn = db.connection()
+    codes = sorted(DOC_TYPES[t][0] for t in (types or DOC_TYPES))
+    params: Dict[str, Any] = {
+        "limit": limit, "offset": offset, "window": RANK_WINDOW, "hit_start": _HIT_START, "hit_end": _HIT_END,
+    }
+    code_params = ", ".join(f":c{i}" for i in range(len(codes)))
+    params.update({f"c{i}": code for i, code in enumerate(codes)})
+
+    if _is_postgres(conn):
+        params["q"] = q
+        rows = conn.execute(
+            text(
+                "WITH query AS (SELECT websearch_to_tsquery('english', :q) AS tsq),"
+                " candidates AS ("
+                "  SELECT doc_key, tsv FROM search_documents, query"
+                f"  WHERE tsv @@ query.tsq AND doc_key % 8 IN ({code_params})"
+                "  ORDER BY doc_key DESC LIMIT :window),"
+                " hits AS ("
+                "  SELECT doc_key, ts_rank_cd(tsv, query.tsq) AS score FROM candidates, query"
+                "  ORDER BY score DESC, doc_key LIMIT :limit OFFSET :offset)"
+                " SELECT hits.doc_key, hits.score,"
+                "  ts_headline('english', d.body, query.tsq,"
+                "   'StartSel=' || :hit_start || ', StopSel=' || :hit_end || ', MaxFragments=1, MaxWords=24, MinWords=8')"
+                " FROM hits JOIN search_documents d ON d.doc_key = hits.doc_key, query"
+                " ORDER BY hits.score DESC, hits.doc_key"
+            ),
+            params,
+        ).all()
+    else:
+        params["q"] = _fts5_query(q)
+        if not params["q"]:
+            return []
+        ranked = conn.execute(
+            text(
+                "SELECT rowid, score FROM ("
+                " SELECT rowid, -bm25(search_index) AS score FROM search_index"
+                f" WHERE search_index MATCH :q AND rowid % 8 IN ({code_params})"
+                " ORDER BY rowid DESC LIMIT :window)"
+                " ORDER BY score DESC, rowid LIMIT :limit OFFSET :offset"
+            ),
+            params,
+        ).all()
+        if not ranked:
+            return []
+        # Snippets only for the page, not for every ranked candidate
+        key_params = {f"k{i}": key for i, (key, _) in enumerate(ranked)}
+        snippets = dict(
+            conn.execute(
+                text(
+                    "SELECT rowid, snippet(search_index, 0, :hit_start, :hit_end, '…', 24)"
+                    " FROM search_index WHERE search_index MATCH :q"
+                    f" AND rowid IN ({', '.join(':' + k for k in key_params)})"
+                ),
+                {"q": params["q"], "hit_start": _HIT_START, "hit_end": _HIT_END, **key_params},
+            ).all()
+        )
+        rows = [(key, score, snippets.get(key)) for key, score in ranked]
+
+    hits = []
+    for key, score, snippet in rows:
+        doc_type, doc_id = _split_key(key)
+        hits.append({"doc_type": doc_type, "doc_id": doc_id, "score": float(score), "snippet": _highlight(snippet)})
+    return hits
+
+
+def _highlight(snippet: Optional[str]) -> Optional[str]:
+    """Escape `snippet` for HTML, then turn the database's hit markers into SNIPPET_START/END."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_HIT_START, SNIPPET_START).replace(_HIT_END, SNIPPET_END)
+
+
+def attach_context(db: Session, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add interview_id, user_id and user_name to each hit with one query per doc type."""
+    ids = {t: [h["doc_id"] for h in hits if h["doc_type"] == t] for t in DOC_TYPES}
+    context: Dict[Tuple[str, int], Tuple[Optional[int], Optional[int]]] = {}
+
+    if ids["transcript"]:
+        for interview_id, candidate_id in db.query(
+            models.Interview.interview_id, models.Interview.candidate_id
+        ).filter(models.Interview.interview_id.in_(ids["transcript"])):
+            context[("transcript", interview_id)] = (interview_id, candidate_id)
+    if ids["answer"]:
+        for response_id, interview_id, candidate_id in (
+            db.query(models.Response.response_id, models.Interview.interview_id, models.Interview.candidate_id)
+            .join(models.Question, models.Question.question_id == models.Response.question_id)
+            .join(models.Interview, models.Interview.interview_id == models.Question.interview_id)
+            .filter(models.Response.response_id.in_(ids["answer"]))
+        ):
+            context[("answer", response_id)] = (interview_id, candidate_id)
+    for doc_type in ("resume", "resume_summary"):
+        for user_id in ids[doc_type]:
+            context[(doc_type, user_id)] = (None, user_id)
+
+    user_ids = {user_id for _, user_id in context.values() if user_id is not None}
+    names = dict(
+        db.query(models.User.user_id, models.User.name).filter(models.User.user_id.in_(user_ids))
+    ) if user_ids else {}
+
+    for hit in hits:
+        interview_id, user_id = context.get((hit["doc_type"], hit["doc_id"]), (None, None))
+        hit.update(interview_id=interview_id, user_id=user_id, user_name=names.get(user_id))
+    return hits
+
+
+if __name__ == "__main__":
+    from .db import engine
+
+    parser = argparse.ArgumentParser(description="Full-text search index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("reindex", help="Rebuild the index from the source tables")
+    query_parser = sub.add_parser("query", help="Run a search from the command line")
+    query_parser.add_argument("q")
+    query_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "reindex":
+        with engine.begin() as conn:
+            print(f"Indexed {reindex(conn)} documents")
+    else:
+        with SessionLocal() as db:
+            for hit in attach_context(db, search(db, args.q, limit=args.limit)):
+                print(f"{hit['score']:8.3f}  {hit['doc_type']:<14} {hit['doc_id']:<8} {hit['snippet']}")
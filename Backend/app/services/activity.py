@@ -0,0 +1,132 @@
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from .. import models
+
+
+# Known event types (free-form strings in the table, listed here for the API docs)
+USER_SIGNUP = "user_signup"
+USER_LOGIN = "user_login"
+INTERVIEW_STARTED = "interview_started"
+INTERVIEW_COMPLETED = "interview_completed"
+FEEDBACK_GENERATED = "feedback_generated"
+DOCUMENT_UPLOADED = "document_uploaded"
+
+EVENT_TYPES = (
+    USER_SIGNUP,
+    USER_LOGIN,
+    INTERVIEW_STARTED,
+    INTERVIEW_COMPLETED,
+    FEEDBACK_GENERATED,
+    DOCUMENT_UPLOADED,
+)
+
+# How long `Tail` keeps looking for ids it skipped, and for how many of them
+TAIL_LOOKBACK_SECONDS = 30.0
+TAIL_MAX_WATCHED = 1000
+
+
+def record_event(
+    db: Session,
+    event_type: str,
+    message: str,
+    *,
+    user_id: Optional[int] = None,
+    interview_id: Optional[int] = None,
+) -> None:
+    """Append an event to the activity log as part of the caller's transaction.
+
+    The message is rendered at write time so the feed never needs joins.
+    """
+    db.add(
+        models.ActivityEvent(
+            event_type=event_type,
+            message=message[:255],
+            user_id=user_id,
+            interview_id=interview_id,
+        )
+    )
+
+
+def list_events(
+    db: Session,
+    *,
+    limit: int = 20,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    also_ids: Sequence[int] = (),
+    event_type: Optional[str] = None,
+) -> List[models.ActivityEvent]:
+    """Page through the log by event_id.
+
+    - `before`: newest-first page of events older than that id (feed pagination)
+    - `after`: oldest-first events newer than that id, plus any of `also_ids`
+      (tail mode for live views; see `Tail` for why ids can arrive late)
+    """
+    query = db.query(models.ActivityEvent)
+    if event_type:
+        query = query.filter(models.ActivityEvent.event_type == event_type)
+
+    if after is not None:
+        newer = models.ActivityEvent.event_id > after
+        if also_ids:
+            newer = or_(newer, models.ActivityEvent.event_id.in_(list(also_ids)))
+        return (
+            query.filter(newer)
+            .order_by(models.ActivityEvent.event_id.asc())
+            .limit(limit)
+            .all()
+        )
+
+    if before is not None:
+        query = query.filter(models.ActivityEvent.event_id < before)
+    return query.order_by(models.ActivityEvent.event_id.desc()).limit(limit).all()
+
+
+class Tail:
+    """Follows the log from an event_id, including events that commit out of id order.
+
+    On PostgreSQL ids are drawn from a sequence before commit, so an event can
+    become visible after higher ids were already read. Ids the cursor skips
+    over are re-queried on every poll for TAIL_LOOKBACK_SECONDS and returned
+    once if they show up; rolled-back ids simply expire.
+
+    Gaps are tracked on the unfiltered id sequence and `event_type` is applied
+    to the fetched page; otherwise every id of another type would look skipped
+    and be re-queried on each poll.
+    """
+
+    def __init__(self, after: int, event_type: Optional[str] = None) -> None:
+        self.after = after
+        self.event_type = event_type
+        self._missing: Dict[int, float] = {}  # skipped id -> when to stop looking
+
+    def poll(self, db: Session, limit: int = 100) -> List[models.ActivityEvent]:
+        now = time.monotonic()
+        self._missing = {i: until for i, until in self._missing.items() if until > now}
+        events = list_events(db, limit=limit, after=self.after, also_ids=list(self._missing))
+        for event in events:
+            if self._missing.pop(event.event_id, None) is not None:
+                continue
+            if len(self._missing) < TAIL_MAX_WATCHED:
+                first = max(self.after + 1, event.event_id - (TAIL_MAX_WATCHED - len(self._missing)))
+                for skipped in range(first, event.event_id):
+                    self._missing[skipped] = now + TAIL_LOOKBACK_SECONDS
+            self.after = event.event_id
+        if self.event_type:
+            events = [event for event in events if event.event_type == self.event_type]
+        return events
+
+
+def serialize(event: models.ActivityEvent) -> Dict[str, Any]:
+    return {
+        "event_id": event.event_id,
+        "type": event.event_type,
+        "message": event.message,
+        "timestamp": event.created_at.isoformat(timespec="seconds") if event.created_at else None,
+        "user_id": event.user_id,
+        "interview_id": event.interview_id,
+    }
@@ -0,0 +1,220 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..db import dialect_insert
+
+
+# Counters shown as tiles on the admin dashboard.
+COUNTER_NAMES = ("total_users", "total_interviews", "active_sessions")
+
+# DailyStat columns derived from the interviews table (rebuilt by the compactor).
+_INTERVIEW_DAY_FIELDS = ("interviews_started", "interviews_completed", "score_sum", "score_count")
+
+
+def _bump_counters(db: Session, **deltas: int) -> None:
+    """Atomically add `deltas` to the named counters inside the caller's transaction."""
+    table = models.AdminCounter.__table__
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        stmt = dialect_insert(db, table).values(name=name, value=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={"value": table.c.value + delta},
+        )
+        db.execute(stmt)
+
+
+def _bump_day(db: Session, day: date, **deltas: int) -> None:
+    """Atomically add `deltas` to the rollup row for `day`, creating it if needed."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    table = models.DailyStat.__table__
+    stmt = dialect_insert(db, table).values(day=day, **{**_zero_day(), **deltas})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day],
+        set_={k: table.c[k] + v for k, v in deltas.items()},
+    )
+    db.execute(stmt)
+
+
+def _zero_day() -> Dict[str, int]:
+    return {
+        "new_users": 0,
+        "interviews_started": 0,
+        "interviews_completed": 0,
+        "score_sum": 0,
+        "score_count": 0,
+    }
+
+
+def _score_delta(old: Optional[int], new: Optional[int]) -> Dict[str, int]:
+    return {
+        "score_sum": (new or 0) - (old or 0),
+        "score_count": (new is not None) - (old is not None),
+    }
+
+
+# --- Write hooks (call before the route commits) ----------------------------
+
+
+def record_user_created(db: Session) -> None:
+    _bump_counters(db, total_users=1)
+    _bump_day(db, date.today(), new_users=1)
+
+
+def record_interview_started(db: Session) -> None:
+    _bump_counters(db, total_interviews=1, active_sessions=1)
+    _bump_day(db, date.today(), interviews_started=1)
+
+
+def record_interview_completed(db: Session, interview: models.Interview) -> bool:
+    """Mark `interview` Completed and roll it into today's stats.
+
+    Returns False (and does nothing) if the interview was already completed,
+    so repeated end calls are safe.
+    """
+    if interview.status == "Completed":
+        return False
+    was_active = interview.status == "In Progress"
+    interview.status = "Completed"
+    interview.completed_at = datetime.now()
+    _bump_counters(db, active_sessions=-1 if was_active else 0)
+    _bump_day(
+        db,
+        interview.completed_at.date(),
+        interviews_completed=1,
+        **_score_delta(None, interview.overall_score),
+    )
+    return True
+
+
+def set_overall_score(db: Session, interview: models.Interview, score: Optional[int]) -> None:
+    """Update `interview.overall_score`, keeping the completion-day score rollup in step."""
+    old = interview.overall_score
+    interview.overall_score = score
+    if interview.completed_at is not None and old != score:
+        _bump_day(db, interview.completed_at.date(), **_score_delta(old, score))
+
+
+# --- Reads ---------------------------------------------------------------------
+
+
+def read_counters(db: Session) -> Dict[str, int]:
+    rows = db.query(models.AdminCounter.name, models.AdminCounter.value).all()
+    counters = {name: 0 for name in COUNTER_NAMES}
+    counters.update({name: value for name, value in rows})
+    return counters
+
+
+def read_daily(db: Session, days: int) -> List[Dict[str, Any]]:
+    """Return one zero-filled rollup entry per day for the last `days` days (oldest first)."""
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    rows = (
+        db.query(models.DailyStat)
+        .filter(models.DailyStat.day >= start, models.DailyStat.day <= end)
+        .all()
+    )
+    by_day = {r.day: r for r in rows}
+
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day)
+        values = _zero_day() if row is None else {k: getattr(row, k) for k in _zero_day()}
+        series.append(
+            {
+                "day": day.isoformat(),
+                "new_users": values["new_users"],
+                "interviews_started": values["interviews_started"],
+                "interviews_completed": values["interviews_completed"],
+                "score_sum": values["score_sum"],
+                "scored_interviews": values["score_count"],
+                "average_score": (
+                    round(values["score_sum"] / values["score_count"], 2)
+                    if values["score_count"]
+                    else None
+                ),
+            }
+        )
+    return series
+
+
+# --- Compactor -------------------------------------------------------------------
+
+
+def _as_date(value: Any) -> Optional[date]:
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def rebuild_rollups(db: Session) -> Dict[str, int]:
+    """Recompute counters and interview-derived daily rollups from the source tables.
+
+    Used to seed an existing database and as a periodic compactor to repair
+    drift. `new_users` cannot be derived (users carry no timestamp), so existing
+    per-day user counts are kept as-is. Commits.
+    """
+    counters = {
+        "total_users": db.query(func.count(models.User.user_id)).scalar() or 0,
+        "total_interviews": db.query(func.count(models.Interview.interview_id)).scalar() or 0,
+        "active_sessions": (
+            db.query(func.count(models.Interview.interview_id))
+            .filter(models.Interview.status == "In Progress")
+            .scalar()
+            or 0
+        ),
+    }
+    counter_table = models.AdminCounter.__table__
+    for name, value in counters.items():
+        stmt = dialect_insert(db, counter_table).values(name=name, value=value)
+        db.execute(stmt.on_conflict_do_update(index_elements=[counter_table.c.name], set_={"value": value}))
+
+    per_day: Dict[date, Dict[str, int]] = {}
+    started = (
+        db.query(models.Interview.date, func.count(models.Interview.interview_id))
+        .filter(models.Interview.date.isnot(None))
+        .group_by(models.Interview.date)
+        .all()
+    )
+    for day, count in started:
+        per_day.setdefault(day, dict.fromkeys(_INTERVIEW_DAY_FIELDS, 0))["interviews_started"] = count
+
+    completed_day = func.date(models.Interview.completed_at)
+    completed = (
+        db.query(
+            completed_day,
+            func.count(models.Interview.interview_id),
+            func.coalesce(func.sum(models.Interview.overall_score), 0),
+            func.count(models.Interview.overall_score),
+        )
+        .filter(models.Interview.completed_at.isnot(None))
+        .group_by(completed_day)
+        .all()
+    )
+    for raw_day, count, score_sum, score_count in completed:
+        entry = per_day.setdefault(_as_date(raw_day), dict.fromkeys(_INTERVIEW_DAY_FIELDS, 0))
+        entry.update(interviews_completed=count, score_sum=int(score_sum), score_count=score_count)
+
+    day_table = models.DailyStat.__table__
+    db.execute(day_table.update().values(**dict.fromkeys(_INTERVIEW_DAY_FIELDS, 0)))
+    for day, values in per_day.items():
+        stmt = dialect_insert(db, day_table).values(day=day, new_users=0, **values)
+        db.execute(stmt.on_conflict_do_update(index_elements=[day_table.c.day], set_=values))
+
+    db.commit()
+    return counters
+
+
+def ensure_seeded(db: Session) -> None:
+    """Build the rollups once for databases that predate them."""
+    if db.query(models.AdminCounter.name).first() is None:
+        rebuild_rollups(db)
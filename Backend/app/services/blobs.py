@@ -0,0 +1,215 @@
+"""Content-addressed document storage.
+
+Uploaded files are stored once per distinct content, described by a `Blob`
+row keyed by their SHA-256 (stored under `blobs/ab/<sha256>/<token>.pdf`).
+Documents point at blobs through numbered `DocumentVersion` rows, so:
+
+- uploading bytes that are already stored (by anyone) skips the storage
+  upload and only writes metadata;
+- re-uploading a document's current content changes nothing but its name/date;
+- each (user, file_type) keeps its last DOCUMENT_VERSIONS_KEEP versions.
+
+Documents uploaded before blobs existed have no `blob_sha256` and live at
+`{user_id}/{file_type}.pdf`. Their content was never hashed and storage can't
+be read back, so they can't be imported as a version; the first upload that
+replaces one returns the old path for the caller to delete after commit.
+
+Blobs that no version references any more are deleted by `collect_garbage`,
+which runs periodically in the background (`gc_loop`) and can be run by hand
+with ``python -m app.services.blobs``. Blobs used within BLOB_GC_GRACE_SECONDS
+are never collected, and a blob whose row GC already removed is stored again
+under a new path, so collection can't delete content an upload relies on.
+"""
+
+import asyncio
+import hashlib
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import BinaryIO, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core_config import get_settings
+from ..db import SessionLocal, dialect_insert
+from .storage import get_signed_url_cache, get_storage_service
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+BUCKET = "pdfs"  # Ensure this bucket exists in Supabase
+GC_BATCH_SIZE = 200
+
+_EXTENSIONS = {"application/pdf": "pdf"}
+
+
+def hash_file(file: BinaryIO) -> Tuple[str, int]:
+    """SHA-256 hex digest and size of `file` from the start; leaves it rewound."""
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = file.read(1024 * 1024)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def new_blob_path(sha256: str, content_type: str) -> str:
+    # A fresh path per upload: GC may still be deleting an older copy of the same content
+    return f"blobs/{sha256[:2]}/{sha256}/{uuid.uuid4().hex[:12]}.{_EXTENSIONS.get(content_type, 'bin')}"
+
+
+def reuse(db: Session, sha256: str) -> Optional[str]:
+    """Storage path of blob `sha256` if it is stored, protecting it from GC for the grace period.
+
+    Commits. None means the content has to be uploaded.
+    """
+    result = db.execute(
+        update(models.Blob)
+        .where(models.Blob.sha256 == sha256)
+        .values(last_used_at=datetime.now())
+        .returning(models.Blob.storage_path)
+    ).first()
+    db.commit()
+    return result[0] if result else None
+
+
+def record_version(
+    db: Session,
+    user_id: int,
+    file_type: str,
+    file_name: str,
+    sha256: str,
+    size: int,
+    content_type: str,
+    storage_path: str,
+) -> Tuple[models.Document, bool, Optional[str]]:
+    """Point the user's `file_type` document at blob `sha256` stored at `storage_path`.
+
+    Adds the Blob row if it is new. If a concurrent upload of the same content
+    registered the blob first, the document uses that copy (`document.file_path`
+    then differs from `storage_path`). Returns the document, whether a new
+    version was created (False when the content equals the current version)
+    and the storage path of a replaced legacy upload, which the caller deletes
+    once this has committed. Does not commit.
+    """
+    now = datetime.now()
+    blobs = models.Blob.__table__
+    db.execute(
+        dialect_insert(db, blobs)
+        .values(sha256=sha256, size=size, content_type=content_type, storage_path=storage_path,
+                created_at=now, last_used_at=now)
+        .on_conflict_do_update(index_elements=[blobs.c.sha256], set_={"last_used_at": now})
+    )
+    path = db.execute(select(models.Blob.storage_path).where(models.Blob.sha256 == sha256)).scalar_one()
+
+    # Serialize this user's uploads until commit: version numbers are read then
+    # inserted, and the first upload of a type creates the document itself
+    db.execute(select(models.User.user_id).where(models.User.user_id == user_id).with_for_update())
+    document = (
+        db.query(models.Document)
+        .filter(models.Document.user_id == user_id, models.Document.file_type == file_type)
+        .populate_existing()
+        .first()
+    )
+    if document is None:
+        document = models.Document(user_id=user_id, file_type=file_type, file_name=file_name, file_path=path)
+        db.add(document)
+        db.flush()
+    changed = document.blob_sha256 != sha256
+    legacy_path = document.file_path if document.blob_sha256 is None and document.file_path != path else None
+    document.file_name = file_name
+    document.file_path = path
+    document.file_url = get_storage_service().public_url(BUCKET, path)
+    document.blob_sha256 = sha256
+    document.created_at = now.date()
+    if changed:
+        latest = document.versions[0].version if document.versions else 0
+        document.versions.insert(
+            0, models.DocumentVersion(version=latest + 1, blob_sha256=sha256, file_name=file_name, created_at=now)
+        )
+        for old in document.versions[settings.DOCUMENT_VERSIONS_KEEP:]:
+            document.versions.remove(old)  # its blob is collected once nothing else uses it
+    return document, changed, legacy_path
+
+
+# --- Garbage collection -------------------------------------------------------------
+
+
+def _unreferenced(cutoff: datetime):
+    versions, documents = models.DocumentVersion, models.Document
+    return and_(
+        models.Blob.last_used_at < cutoff,
+        ~exists().where(versions.blob_sha256 == models.Blob.sha256),
+        ~exists().where(documents.blob_sha256 == models.Blob.sha256),
+    )
+
+
+def claim_garbage(db: Session, grace_seconds: Optional[int] = None) -> List[str]:
+    """Delete up to GC_BATCH_SIZE unreferenced Blob rows and return their storage paths.
+
+    Each row is deleted with the unreferenced condition re-checked, so a blob
+    an upload just started using again survives. Commits.
+    """
+    grace = settings.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = datetime.now() - timedelta(seconds=grace)
+    candidates = db.execute(
+        select(models.Blob.sha256, models.Blob.storage_path).where(_unreferenced(cutoff)).limit(GC_BATCH_SIZE)
+    ).all()
+    claimed = []
+    for sha256, path in candidates:
+        result = db.execute(delete(models.Blob).where(models.Blob.sha256 == sha256, _unreferenced(cutoff)))
+        if result.rowcount:
+            claimed.append(path)
+    db.commit()
+    return claimed
+
+
+def _claim_batch(grace_seconds: Optional[int]) -> List[str]:
+    with SessionLocal() as db:
+        return claim_garbage(db, grace_seconds)
+
+
+async def collect_garbage(grace_seconds: Optional[int] = None) -> int:
+    """Remove unreferenced blobs from the database and from storage; returns how many."""
+    removed = 0
+    while True:
+        paths = await asyncio.to_thread(_claim_batch, grace_seconds)
+        for path in paths:
+            try:
+                await get_storage_service().delete(BUCKET, path)
+            except Exception:
+                # The row is gone, so nothing links here any more; the object just lingers
+                logger.exception("Deleting blob %s from storage failed", path)
+            get_signed_url_cache().invalidate(BUCKET, path)
+        removed += len(paths)
+        if len(paths) < GC_BATCH_SIZE:
+            return removed
+
+
+async def gc_loop() -> None:
+    """Collect garbage every BLOB_GC_INTERVAL_SECONDS until cancelled."""
+    while True:
+        await asyncio.sleep(settings.BLOB_GC_INTERVAL_SECONDS)
+        try:
+            removed = await collect_garbage()
+            if removed:
+                logger.info("Blob GC removed %s unreferenced blobs", removed)
+        except Exception:
+            logger.exception("Blob GC failed")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Delete stored blobs no document version references")
+    parser.add_argument("--grace-seconds", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(f"Removed {asyncio.run(collect_garbage(args.grace_seconds))} blobs")
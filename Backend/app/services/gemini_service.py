@@ -1,15 +1,71 @@
-from typing import Any, Dict, List
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+import base64
+import io
+import json
 import logging
+import os
+from functools import lru_cache
 
-import requests
 
 from ..core_config import get_settings
+from ..metrics import instrument_upstream
+from ..tracing import traced_session
 
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
+class _InlineFileBody:
+    """A generateContent JSON body with a file inlined as base64, encoded as it is sent.
+
+    `payload` holds the placeholder ``"@inline@"`` where the base64 data goes.
+    requests streams any object with `read` and `__len__`, with a real
+    Content-Length, so neither the encoded file nor the JSON string is ever
+    built in memory.
+    """
+
+    _PLACEHOLDER = "@inline@"
+    _CHUNK = 48 * 1024  # multiple of 3: base64 of consecutive chunks concatenates cleanly
+
+    def __init__(self, payload: Dict[str, Any], file: BinaryIO) -> None:
+        head, tail = json.dumps(payload).split(json.dumps(self._PLACEHOLDER))
+        self._head, self._tail = (head + '"').encode(), ('"' + tail).encode()
+        self._file = file
+        start = file.tell()
+        size = file.seek(0, os.SEEK_END) - start
+        file.seek(start)
+        self._length = len(self._head) + 4 * ((size + 2) // 3) + len(self._tail)
+        self._buffer = io.BytesIO()
+        self._parts = self._iter_parts()
+
+    def _iter_parts(self) -> Iterator[bytes]:
+        yield self._head
+        while True:
+            chunk = self._file.read(self._CHUNK)
+            if not chunk:
+                break
+            yield base64.b64encode(chunk)
+        yield self._tail
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._parts
+
+    def read(self, size: int = -1) -> bytes:
+        out = self._buffer.read(size)
+        while size < 0 or len(out) < size:
+            part = next(self._parts, None)
+            if part is None:
+                break
+            self._buffer = io.BytesIO(part)
+            out += self._buffer.read(-1 if size < 0 else size - len(out))
+        return out
+
+
+@instrument_upstream("gemini", internal=("_generate",))
 class GeminiService:
     """Wrapper around Gemini API for question generation and answer evaluation."""
 
@@ -17,7 +73,8 @@ class GeminiService:
         self.api_key = settings.GEMINI_API_KEY
         # You can change the model name here if needed.
         self.model = "gemini-1.5-flash-001"
-        self.base_url = "https://generativelanguage.googleapis.com/v1"
+        self.base_url = settings.GEMINI_BASE_URL.rstrip("/")
+        self.session = traced_session("gemini")
 
     def _generate(self, prompt: str, system_instruction: str | None = None) -> str:
         if not self.api_key:
@@ -32,7 +89,7 @@ class GeminiService:
 
         payload = {"contents": contents}
 
-        resp = requests.post(url, json=payload, timeout=60)
+        resp = self.session.post(url, json=payload, timeout=60)
         if resp.status_code >= 400:
             raise RuntimeError(f"Gemini error {resp.status_code}: {resp.text}")
 
@@ -45,20 +102,20 @@ class GeminiService:
         texts = [p.get("text", "") for p in parts]
         return " ".join(texts).strip()
 
-    def extract_resume_text_from_pdf(self, pdf_bytes: bytes) -> str:
+    def extract_resume_text_from_pdf(self, pdf: Union[bytes, BinaryIO]) -> str:
         """Use Gemini to extract plain text from a PDF resume.
 
         This sends the PDF as inlineData and asks Gemini to return only the
         extracted plain text. This generally yields better structure than
-        basic PDF parsing.
+        basic PDF parsing. `pdf` may be a binary file, which is base64-encoded
+        while the request is sent rather than copied into memory.
         """
 
         if not self.api_key:
             raise RuntimeError("GEMINI_API_KEY is not configured")
 
-        import base64
-
-        b64 = base64.b64encode(pdf_bytes).decode("utf-8")
+        if isinstance(pdf, (bytes, bytearray)):
+            pdf = io.BytesIO(pdf)
 
         url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
 
@@ -69,7 +126,7 @@ class GeminiService:
                     {
                         "inlineData": {
                             "mimeType": "application/pdf",
-                            "data": b64,
+                            "data": _InlineFileBody._PLACEHOLDER,
                         }
                     },
                     {
@@ -81,8 +138,11 @@ class GeminiService:
                 ],
             }
         ]
+        body = _InlineFileBody({"contents": contents}, pdf)
 
-        resp = requests.post(url, json={"contents": contents}, timeout=90)
+        resp = self.session.post(
+            url, data=body, headers={"Content-Type": "application/json"}, timeout=90
+        )
         if resp.status_code >= 400:
             raise RuntimeError(f"Gemini PDF error {resp.status_code}: {resp.text}")
 
@@ -323,12 +383,17 @@ class GeminiService:
             return fallback[:1800]
 
 
-    def generate_interview_questions(self, candidate_profile: Dict[str, Any], count: int = 5) -> List[str]:
+    def generate_interview_questions(
+        self, candidate_profile: Dict[str, Any], count: int = 5, avoid: Optional[List[str]] = None
+    ) -> List[str]:
         role = candidate_profile.get("role") or "the target role"
         name = candidate_profile.get("name") or "the candidate"
         summary = candidate_profile.get("resume_summary") or ""
         skills = candidate_profile.get("skills") or []
         skills_str = ", ".join(skills) if skills else "unspecified skills"
+        avoid_str = ""
+        if avoid:
+            avoid_str = "4. Do NOT repeat or rephrase any of these questions:\n" + "\n".join(f"- {q}" for q in avoid) + "\n"
 
         prompt = (
             f"You are an AI interview designer. Generate {count} high-quality, targeted interview questions "
@@ -338,7 +403,8 @@ class GeminiService:
             f"Requirements:\n"
             f"1. Mix technical and behavioral questions.\n"
             f"2. Questions should be progressive (starting easier, getting harder).\n"
-            f"3. Return ONLY a JSON list of strings, e.g., [\"Question 1\", \"Question 2\"]."
+            f"3. Return ONLY a JSON list of strings, e.g., [\"Question 1\", \"Question 2\"].\n"
+            f"{avoid_str}"
         )
 
         try:
@@ -381,4 +447,8 @@ class GeminiService:
         except Exception:
             return "Keep going! Remember to use specific examples from your past experience."
 
-gemini_service = GeminiService()
+
+@lru_cache
+def get_gemini_service() -> GeminiService:
+    """The shared GeminiService, built on first use; a FastAPI dependency."""
+    return GeminiService()
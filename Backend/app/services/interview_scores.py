@@ -0,0 +1,100 @@
+from typing import Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .. import models
+from . import admin_stats, score_analytics
+
+
+Scores = Tuple[Optional[int], Optional[int]]  # (relevance_score, confidence_level)
+
+
+def recompute_aggregates(db: Session, interview: models.Interview) -> None:
+    """Rebuild the running sums for `interview` with one SQL aggregate.
+
+    Only needed for interviews whose aggregates were never initialised or are
+    suspected to have drifted; the normal path is `record_answer_scores`.
+    """
+    rel_sum, conf_sum, count = (
+        db.query(
+            func.coalesce(func.sum(models.Response.relevance_score), 0),
+            func.coalesce(func.sum(models.Response.confidence_level), 0),
+            func.count(models.Response.response_id),
+        )
+        .join(models.Question)
+        .filter(
+            models.Question.interview_id == interview.interview_id,
+            models.Response.relevance_score.isnot(None),
+            models.Response.confidence_level.isnot(None),
+        )
+        .one()
+    )
+    interview.relevance_sum = int(rel_sum)
+    interview.confidence_sum = int(conf_sum)
+    interview.scored_responses = count
+
+
+def record_answer_scores(db: Session, interview: models.Interview, old: Scores, new: Scores) -> None:
+    """Fold one answer's score change into the interview's running aggregates, O(1).
+
+    `old` is the response's previous scores ((None, None) for a first answer),
+    read while holding a lock on its question so that no concurrent chunk
+    of the same answer subtracts them too. The response row itself must
+    already be written (added or updated) in this session. Also refreshes
+    `overall_score`.
+    """
+    if interview.scored_responses is None:
+        db.flush()
+        recompute_aggregates(db, interview)
+    else:
+        relevance = confidence = count = 0
+        if None not in old:
+            relevance, confidence, count = -old[0], -old[1], -1
+        if None not in new:
+            relevance, confidence, count = relevance + new[0], confidence + new[1], count + 1
+        # Incremented in SQL, not read-modify-write here: concurrent answers to
+        # the same interview would otherwise lose each other's scores. The
+        # UPDATE also locks the row until commit, so `overall_score` below is
+        # written from sums that include every earlier answer.
+        Interview = models.Interview
+        row = db.execute(
+            update(Interview)
+            .where(Interview.interview_id == interview.interview_id)
+            .values(
+                relevance_sum=Interview.relevance_sum + relevance,
+                confidence_sum=Interview.confidence_sum + confidence,
+                scored_responses=Interview.scored_responses + count,
+            )
+            .returning(
+                Interview.relevance_sum, Interview.confidence_sum,
+                Interview.scored_responses, Interview.overall_score,
+            )
+            .execution_options(synchronize_session=False)
+        ).one()
+        for attr, value in zip(("relevance_sum", "confidence_sum", "scored_responses", "overall_score"), row):
+            set_committed_value(interview, attr, value)
+        score_analytics.mark_scores_changed(db, interview.candidate_id)
+
+    if interview.scored_responses:
+        admin_stats.set_overall_score(db, interview, overall_score(interview))
+
+
+def overall_score(interview: models.Interview) -> Optional[int]:
+    """Mean of (relevance + confidence) / 2 across scored responses."""
+    if not interview.scored_responses:
+        return None
+    return int((interview.relevance_sum + interview.confidence_sum) / 2 / interview.scored_responses)
+
+
+def average_relevance(interview: models.Interview) -> Optional[float]:
+    if not interview.scored_responses:
+        return None
+    return round(interview.relevance_sum / interview.scored_responses, 2)
+
+
+def average_confidence(interview: models.Interview) -> Optional[float]:
+    if not interview.scored_responses:
+        return None
+    return round(interview.confidence_sum / interview.scored_responses, 2)
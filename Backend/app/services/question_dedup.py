@@ -0,0 +1,180 @@
+"""Near-duplicate detection for interview questions (MinHash, no external service).
+
+Every question gets a MinHash signature of its (stemmed) content words,
+stored on the row (`Question.fingerprint`, `QuestionBank.fingerprint`) when it
+is inserted. Two signatures agreeing in a fraction f of positions estimate a
+Jaccard similarity of f between the questions.
+
+- Per candidate: the signatures of everything the candidate was asked before
+  come back in one indexed query and are compared to new questions in one
+  vectorised NumPy operation. Archived interviews keep their questions'
+  signatures on the stub row, so they still count.
+- QuestionBank: `bank_fill` tops up an interview from the newest matching
+  bank questions, checking a bounded batch of their stored signatures
+  against the history, so its cost doesn't grow with the bank.
+"""
+
+import re
+import zlib
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam, event, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core_config import get_settings
+from .skills import skill_key
+
+settings = get_settings()
+
+NUM_PERM = 64
+BANK_SCAN_FACTOR = 20  # bank_fill checks at most this many bank questions per question needed
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.RandomState(20240601)  # fixed: stored signatures must stay comparable
+_A = _rng.randint(1, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+
+# Built once: constructing it per lookup costs more than running it
+_questions, _interviews = models.Question.__table__, models.Interview.__table__
+_CANDIDATE_FINGERPRINTS = (
+    select(_questions.c.fingerprint)
+    .join(_interviews, _interviews.c.interview_id == _questions.c.interview_id)
+    .where(_interviews.c.candidate_id == bindparam("candidate_id"), _questions.c.fingerprint.is_not(None))
+    .union_all(
+        select(_interviews.c.question_fingerprints).where(
+            _interviews.c.candidate_id == bindparam("candidate_id"),
+            _interviews.c.question_fingerprints.is_not(None),
+        )
+    )
+)
+
+_STOPWORDS = frozenset(
+    """a about an and any are as at be been by can could describe detail do does did example explain for
+    from give have how i if in into is it its me more most of on or our please should some tell than that
+    the their them there these this those through to us walk was we what when where which while who why
+    will with within would you your""".split()
+)
+_WORD = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ("ing", "ies", "es", "ed", "ly", "s")
+
+
+def _stem(word: str) -> str:
+    # Crude suffix stripping is enough to match "handling/handled" or "decorator/decorators"
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _shingles(text: str) -> List[int]:
+    # Word sets rather than n-grams: paraphrased questions mostly reorder the same content words
+    words = {_stem(w) for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+    return [zlib.crc32(w.encode("utf-8")) for w in words]
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32s) of `text`, or None if it has no content words."""
+    shingles = _shingles(text or "")
+    if not shingles:
+        return None
+    x = np.asarray(shingles, dtype=np.uint64)[:, None]
+    hashed = (x * _A + _B) % _PRIME  # (shingles, NUM_PERM); products stay below 2**64
+    return (hashed.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def fingerprint(text: str) -> Optional[bytes]:
+    sig = signature(text)
+    return sig.tobytes() if sig is not None else None
+
+
+def _from_bytes(blobs: Iterable[Optional[bytes]]) -> np.ndarray:
+    # A blob is one signature, or several back to back (archived interviews)
+    rows = [np.frombuffer(b, dtype=np.uint32).reshape(-1, NUM_PERM) for b in blobs if b]
+    return np.vstack(rows) if rows else np.empty((0, NUM_PERM), dtype=np.uint32)
+
+
+def similarity(sig: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity between `sig` and each row of `others`."""
+    if others.shape[0] == 0:
+        return np.empty(0)
+    return (others == sig).mean(axis=1)
+
+
+# --- Candidate history ---------------------------------------------------------------
+
+
+def candidate_signatures(db: Session, candidate_id: int) -> np.ndarray:
+    """Signatures of every question `candidate_id` has been asked, one row each."""
+    blobs = db.execute(_CANDIDATE_FINGERPRINTS, {"candidate_id": candidate_id})
+    return _from_bytes(b for (b,) in blobs)
+
+
+def filter_repeats(
+    texts: Sequence[str], history: np.ndarray, threshold: Optional[float] = None
+) -> List[str]:
+    """Drop texts that nearly repeat `history` or an earlier text in the same list."""
+    threshold = settings.QUESTION_DEDUP_THRESHOLD if threshold is None else threshold
+    seen = history
+    kept = []
+    for text in texts:
+        sig = signature(text)
+        if sig is None:
+            continue
+        if seen.shape[0] and similarity(sig, seen).max() >= threshold:
+            continue
+        kept.append(text)
+        seen = np.vstack([seen, sig])
+    return kept
+
+
+def extend(history: np.ndarray, texts: Iterable[str]) -> np.ndarray:
+    """`history` with the signatures of `texts` appended."""
+    sigs = [sig for sig in map(signature, texts) if sig is not None]
+    return np.vstack([history, *sigs]) if sigs else history
+
+
+# --- Question bank -----------------------------------------------------------------------
+
+
+def bank_fill(db: Session, history: np.ndarray, skill_names: Sequence[str], needed: int) -> List[str]:
+    """Up to `needed` active bank questions (matching the skills when possible) new to this history."""
+    if needed <= 0:
+        return []
+    query = db.query(models.QuestionBank.text, models.QuestionBank.fingerprint).filter(
+        models.QuestionBank.is_active.is_(True)
+    )
+    keys = list(dict.fromkeys(k for k in map(skill_key, skill_names) if k))
+    if keys:
+        # EXISTS rather than join + DISTINCT, which PostgreSQL won't order by an unselected column
+        links = models.QuestionBankSkill
+        query = query.filter(
+            select(links.question_id)
+            .join(models.Skill, models.Skill.skill_id == links.skill_id)
+            .where(links.question_id == models.QuestionBank.id, func.lower(models.Skill.skill_name).in_(keys))
+            .exists()
+        )
+    picked: List[str] = []
+    seen = history
+    threshold = settings.QUESTION_DEDUP_THRESHOLD
+    for text, blob in query.order_by(models.QuestionBank.id.desc()).limit(needed * BANK_SCAN_FACTOR):
+        sig = np.frombuffer(blob, dtype=np.uint32) if blob else signature(text)
+        if sig is None or (seen.shape[0] and similarity(sig, seen).max() >= threshold):
+            continue
+        picked.append(text)
+        seen = np.vstack([seen, sig])
+        if len(picked) == needed:
+            break
+    return picked
+
+
+# --- Write hooks ------------------------------------------------------------------------
+
+
+@event.listens_for(models.Question, "before_insert")
+@event.listens_for(models.QuestionBank, "before_insert")
+def _set_fingerprint(mapper, connection, target) -> None:
+    if target.__dict__.get("fingerprint") is None:
+        text = target.question_text if isinstance(target, models.Question) else target.text
+        target.fingerprint = fingerprint(text)
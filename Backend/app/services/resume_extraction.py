@@ -0,0 +1,204 @@
+"""Tiered text extraction for uploaded resume PDFs.
+
+1. Local: PyPDF2 pulls the text layer. Longer PDFs are split into page
+   ranges extracted in parallel by a process pool (the parsing is pure-Python
+   and CPU bound), shorter ones inline.
+2. The text is scored (`quality`): enough characters per page, few garbled
+   glyphs, no spaced-out letters or run-together words.
+3. Only when the score is below PDF_QUALITY_THRESHOLD (scans, broken font
+   encodings) is the PDF sent to Gemini. If Gemini is unavailable the local
+   text is still returned.
+
+Every extraction is recorded in `resume_extractions` with the tier that
+produced the text.
+"""
+
+import logging
+import multiprocessing
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional
+
+from PyPDF2 import PdfReader
+
+from .. import models
+from ..core_config import get_settings
+from ..db import SessionLocal
+from .gemini_service import get_gemini_service
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+TIER_LOCAL = "local"
+TIER_GEMINI = "gemini"
+TIER_LOCAL_FALLBACK = "local_fallback"  # low quality, but Gemini failed
+
+# Non-whitespace characters per page below which a page counts as image-only
+MIN_PAGE_CHARS = 200
+
+_GARBLED = re.compile(r"\ufffd|\(cid:\d+\)|[\ue000-\uf8ff]|[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_TOKEN = re.compile(r"\S+")
+_WORDLIKE = re.compile(r"^[^\W\d_]{2,}[.,;:)]*$")
+
+
+@dataclass
+class Extraction:
+    text: str
+    tier: str
+    pages: int
+    quality: float
+    duration_ms: int
+
+
+# --- Local extraction -------------------------------------------------------------
+
+
+def _extract_pages(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of the PDF at `path` (runs in the pool)."""
+    reader = PdfReader(path, strict=False)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Same reasoning as the password hashing pool (see auth_utils): fork
+            # starts every worker at once, which start_pool() does at app startup
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context(method)
+            )
+        return _pool
+
+
+def start_pool() -> None:
+    if settings.PDF_EXTRACT_WORKERS > 1:
+        _executor().submit(int).result()  # the first job launches the workers
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_local(pdf: BinaryIO) -> List[str]:
+    """Text of every page, extracted in parallel for PDFs of PDF_PARALLEL_MIN_PAGES or more."""
+    pdf.seek(0)
+    reader = PdfReader(pdf, strict=False)
+    count = len(reader.pages)
+    workers = settings.PDF_EXTRACT_WORKERS
+    if workers <= 1 or count < settings.PDF_PARALLEL_MIN_PAGES:
+        return [(page.extract_text() or "") for page in reader.pages]
+
+    # Workers read the PDF from a named copy on disk rather than being sent its bytes
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as copy:
+        pdf.seek(0)
+        shutil.copyfileobj(pdf, copy, 1024 * 1024)
+        copy.flush()
+        step = -(-count // workers)
+        futures = [
+            _executor().submit(_extract_pages, copy.name, start, min(start + step, count))
+            for start in range(0, count, step)
+        ]
+        return [text for future in futures for text in future.result()]
+
+
+# --- Quality ----------------------------------------------------------------------
+
+
+def quality(pages: List[str]) -> float:
+    """0..1 estimate of how usable locally extracted text is.
+
+    Multiplies four factors: the share of pages with a real text layer, how
+    close the text comes to MIN_PAGE_CHARS per page, the share of
+    non-garbled characters, and the share of tokens that look like words
+    (spaced-out letters "J o h n" or run-together "SeniorSoftwareEngineerat" drag it down).
+    """
+    if not pages:
+        return 0.0
+    text = "\n".join(pages)
+    chars = sum(1 for c in text if not c.isspace())
+    if chars == 0:
+        return 0.0
+
+    text_pages = sum(1 for p in pages if len(p.strip()) >= MIN_PAGE_CHARS // 4)
+    coverage = text_pages / len(pages)
+    density = min(1.0, chars / (MIN_PAGE_CHARS * len(pages)))
+    garbled = sum(len(m.group()) for m in _GARBLED.finditer(text))
+    clean = max(0.0, 1.0 - 5.0 * garbled / chars)
+
+    tokens = _TOKEN.findall(text)
+    alpha = [t for t in tokens if any(c.isalpha() for c in t)]
+    if not alpha:
+        return 0.0
+    single = sum(1 for t in alpha if len(t) == 1) / len(alpha)
+    glued = sum(1 for t in alpha if len(t) > 24) / len(alpha)
+    wordlike = sum(1 for t in alpha if _WORDLIKE.match(t)) / len(alpha)
+    layout = max(0.0, min(1.0, wordlike + 0.3) - 2.0 * single - 4.0 * glued)
+
+    return round(coverage * density * clean * layout, 3)
+
+
+# --- Tiers ------------------------------------------------------------------------
+
+
+def extract_resume_text(pdf: BinaryIO) -> Extraction:
+    """Resume text from local extraction, or Gemini when the local text is poor."""
+    start = time.perf_counter()
+    try:
+        pages = extract_local(pdf)
+    except Exception:
+        logger.exception("Local PDF extraction failed")
+        pages = []
+    score = quality(pages)
+    text = "\n".join(pages).strip()
+    tier = TIER_LOCAL
+
+    if score < settings.PDF_QUALITY_THRESHOLD:
+        try:
+            pdf.seek(0)
+            text = get_gemini_service().extract_resume_text_from_pdf(pdf)
+            tier = TIER_GEMINI
+        except Exception:
+            logger.warning("Gemini PDF extraction failed; using local text (quality %.2f)", score)
+            tier = TIER_LOCAL_FALLBACK
+
+    return Extraction(
+        text=text,
+        tier=tier,
+        pages=len(pages),
+        quality=score,
+        duration_ms=int((time.perf_counter() - start) * 1000),
+    )
+
+
+def record(extraction: Extraction, user_id: Optional[int] = None) -> None:
+    """Log which tier served an upload (best effort; never fails the upload)."""
+    try:
+        with SessionLocal() as db:
+            db.add(
+                models.ResumeExtraction(
+                    user_id=user_id,
+                    tier=extraction.tier,
+                    pages=extraction.pages,
+                    chars=len(extraction.text),
+                    quality=extraction.quality,
+                    duration_ms=extraction.duration_ms,
+                )
+            )
+            db.commit()
+    except Exception:
+        logger.exception("Recording resume extraction failed")
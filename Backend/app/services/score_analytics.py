@@ -0,0 +1,345 @@
+"""Score analytics across interviews: candidate trends and cohort distributions.
+
+Per-interview scores come straight from the running aggregates on
+`interviews` (see interview_scores.py), so a candidate's whole history or a
+whole cohort is one column query, loaded into NumPy arrays and reduced
+without Python loops. Archived interviews keep those columns and are included.
+
+Results are cached per process. A candidate's history is dropped when a
+transaction that changed one of their interviews' scores commits; cohort
+results, which every answer anywhere would invalidate, are only refreshed
+by ANALYTICS_CACHE_TTL_SECONDS.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core_config import get_settings
+from ..db import SessionLocal
+
+settings = get_settings()
+
+METRICS = ("overall_score", "average_relevance", "average_confidence")
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class AnalyticsCache:
+    """Process-wide cache of computed analytics, with entries dropped on relevant commits."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def discard(self, match: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if match(k)]:
+                del self._entries[key]
+
+
+analytics_cache = AnalyticsCache(ttl_seconds=settings.ANALYTICS_CACHE_TTL_SECONDS)
+
+_DIRTY_KEY = "score_analytics_dirty"
+_HISTORY_COLUMNS = (
+    "overall_score", "relevance_sum", "confidence_sum", "scored_responses", "status", "date", "type",
+)
+
+
+def mark_scores_changed(session: Session, candidate_id: int) -> None:
+    """Drop `candidate_id`'s cached history once `session` commits.
+
+    Called for score changes made in SQL, which the ORM events below can't see.
+    """
+    session.info.setdefault(_DIRTY_KEY, set()).add(candidate_id)
+
+
+def _mark_dirty(mapper, connection, target: models.Interview) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        mark_scores_changed(session, target.candidate_id)
+
+
+def _mark_dirty_if_scored(mapper, connection, target: models.Interview) -> None:
+    state = inspect(target)
+    if any(state.attrs[a].history.has_changes() for a in _HISTORY_COLUMNS):
+        _mark_dirty(mapper, connection, target)
+
+
+event.listen(models.Interview, "after_update", _mark_dirty_if_scored)
+event.listen(models.Interview, "after_delete", _mark_dirty)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _clear_after_commit(session: Session) -> None:
+    candidates = session.info.pop(_DIRTY_KEY, None)
+    if candidates:
+        analytics_cache.discard(lambda key: key[0] == "candidate" and key[1] in candidates)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_dirty_flag(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+
+
+# --- Loading -----------------------------------------------------------------------
+
+
+def _score_query(db: Session):
+    """Scored interviews with their per-interview metrics, oldest first."""
+    return (
+        db.query(
+            models.Interview.interview_id,
+            models.Interview.candidate_id,
+            models.Interview.date,
+            models.Interview.type,
+            models.Interview.overall_score,
+            models.Interview.relevance_sum,
+            models.Interview.confidence_sum,
+            models.Interview.scored_responses,
+        )
+        .filter(models.Interview.scored_responses > 0)
+        .order_by(models.Interview.date, models.Interview.interview_id)
+    )
+
+
+def _to_arrays(rows: List[tuple]) -> Dict[str, np.ndarray]:
+    if not rows:
+        empty = np.empty(0)
+        return {
+            "interview_id": empty.astype(np.int64),
+            "candidate_id": empty.astype(np.int64),
+            "date": [],
+            "type": [],
+            **{m: empty for m in METRICS},
+        }
+    ids, candidates, dates, types, overall, rel_sum, conf_sum, scored = zip(*rows)
+    scored = np.asarray(scored, dtype=float)
+    return {
+        "interview_id": np.asarray(ids, dtype=np.int64),
+        "candidate_id": np.asarray(candidates, dtype=np.int64),
+        "date": list(dates),
+        "type": list(types),
+        "overall_score": np.asarray([np.nan if v is None else v for v in overall], dtype=float),
+        "average_relevance": np.asarray(rel_sum, dtype=float) / scored,
+        "average_confidence": np.asarray(conf_sum, dtype=float) / scored,
+    }
+
+
+# --- Reductions --------------------------------------------------------------------
+
+
+def _round(value: float) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 2) + 0.0  # no -0.0
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` points, ignoring NaNs; shorter at the start."""
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.where(present, values, 0.0))
+    counts = np.cumsum(present)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def trend_slope(values: np.ndarray) -> Optional[float]:
+    """Least-squares change per interview; None with fewer than two scored points."""
+    present = ~np.isnan(values)
+    if present.sum() < 2:
+        return None
+    x = np.arange(values.size, dtype=float)[present]
+    slope, _ = np.polyfit(x, values[present], 1)
+    return _round(slope)
+
+
+def distribution(values: np.ndarray) -> Dict[str, Optional[float]]:
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"count": 0, "mean": None, "std": None, **{f"p{p}": None for p in PERCENTILES}}
+    quantiles = np.percentile(values, PERCENTILES)
+    return {
+        "count": int(values.size),
+        "mean": _round(values.mean()),
+        "std": _round(values.std()),
+        **{f"p{p}": _round(q) for p, q in zip(PERCENTILES, quantiles)},
+    }
+
+
+def percentile_rank(db: Session, value: Optional[float]) -> Optional[float]:
+    """Share (in %) of scored interviews with an overall score at or below `value`.
+
+    Counted in SQL, so ranking one candidate doesn't load the whole cohort.
+    """
+    if value is None or np.isnan(value):
+        return None
+    score = models.Interview.overall_score
+    at_or_below, total = (
+        db.query(func.count(case((score <= float(value), 1))), func.count(score))
+        .filter(models.Interview.scored_responses > 0)
+        .one()
+    )
+    if not total:
+        return None
+    return _round(100.0 * at_or_below / total)
+
+
+def _group_stats(group_index: np.ndarray, values: np.ndarray, groups: int) -> Dict[str, np.ndarray]:
+    """Per-group count, mean and median of `values`, vectorised over all groups."""
+    present = ~np.isnan(values)
+    group_index, values = group_index[present], values[present]
+    counts = np.bincount(group_index, minlength=groups)
+    sums = np.bincount(group_index, weights=values, minlength=groups)
+    order = np.lexsort((values, group_index))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    medians[has] = (sorted_values[lo] + sorted_values[hi]) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(has, sums / np.maximum(counts, 1), np.nan)
+    return {"count": counts, "mean": means, "median": medians}
+
+
+# --- Public API --------------------------------------------------------------------
+
+
+def candidate_history(db: Session, candidate_id: int, window: int = 3) -> Dict[str, Any]:
+    """A candidate's scores per interview with moving averages, trends and cohort rank."""
+    key = ("candidate", candidate_id, window)
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = _to_arrays(_score_query(db).filter(models.Interview.candidate_id == candidate_id).all())
+    moving = {m: moving_average(data[m], window) for m in METRICS}
+
+    interviews = [
+        {
+            "interview_id": int(data["interview_id"][i]),
+            "date": data["date"][i],
+            "type": data["type"][i],
+            **{m: _round(data[m][i]) for m in METRICS},
+            **{f"{m}_moving_average": _round(moving[m][i]) for m in METRICS},
+        }
+        for i in range(data["interview_id"].size)
+    ]
+    latest_overall = data["overall_score"][-1] if data["overall_score"].size else None
+    result = {
+        "candidate_id": candidate_id,
+        "window": window,
+        "interviews": interviews,
+        "trend": {m: trend_slope(data[m]) for m in METRICS},
+        "summary": {m: distribution(data[m]) for m in METRICS},
+        "latest_overall_percentile": percentile_rank(db, latest_overall),
+    }
+    analytics_cache.put(key, result)
+    return result
+
+
+def _cohort_arrays(db: Session, days: Optional[int]) -> Dict[str, np.ndarray]:
+    query = _score_query(db)
+    if days is not None:
+        query = query.filter(models.Interview.date >= (datetime.now() - timedelta(days=days)).date())
+    return _to_arrays(query.all())
+
+
+def cohort_stats(db: Session, days: Optional[int] = None, top_skills: int = 20) -> Dict[str, Any]:
+    """Distribution of scores across all candidates, plus a per-skill breakdown."""
+    key = ("cohort", days, top_skills)
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = _cohort_arrays(db, days)
+    overall = data["overall_score"]
+    present = overall[~np.isnan(overall)]
+    if present.size:
+        counts, edges = np.histogram(present, bins=10)
+        histogram = [
+            {"from": _round(edges[i]), "to": _round(edges[i + 1]), "count": int(counts[i])}
+            for i in range(counts.size)
+        ]
+    else:
+        histogram = []
+
+    result = {
+        "days": days,
+        "interviews": int(data["interview_id"].size),
+        "candidates": int(np.unique(data["candidate_id"]).size),
+        "distribution": {m: distribution(data[m]) for m in METRICS},
+        "histogram": histogram,
+        "skills": _skill_breakdown(db, data, top_skills),
+    }
+    analytics_cache.put(key, result)
+    return result
+
+
+def _skill_breakdown(db: Session, data: Dict[str, np.ndarray], top: int) -> List[Dict[str, Any]]:
+    """Scores of interviews grouped by the candidate's skills (one join, vectorised grouping)."""
+    if data["candidate_id"].size == 0:
+        return []
+    links = (
+        db.query(models.UserSkill.user_id, models.Skill.skill_id, models.Skill.skill_name)
+        .join(models.Skill, models.Skill.skill_id == models.UserSkill.skill_id)
+        .filter(models.UserSkill.user_id.in_(np.unique(data["candidate_id"]).tolist()))
+        .all()
+    )
+    if not links:
+        return []
+    link_users = np.asarray([u for u, _, _ in links], dtype=np.int64)
+    link_skills = np.asarray([s for _, s, _ in links], dtype=np.int64)
+    names = {skill_id: skill_name for _, skill_id, skill_name in links}
+    skill_ids = np.unique(link_skills)
+    link_skill_index = np.searchsorted(skill_ids, link_skills)
+
+    # Expand interviews x candidate skills: each interview counts once per skill its candidate has
+    order = np.argsort(link_users, kind="stable")
+    link_users, link_skill_index = link_users[order], link_skill_index[order]
+    first = np.searchsorted(link_users, data["candidate_id"], side="left")
+    last = np.searchsorted(link_users, data["candidate_id"], side="right")
+    per_interview = last - first
+    interview_rows = np.repeat(np.arange(data["candidate_id"].size), per_interview)
+    offsets = np.arange(per_interview.sum()) - np.repeat(np.cumsum(per_interview) - per_interview, per_interview)
+    group = link_skill_index[np.repeat(first, per_interview) + offsets]
+
+    stats = {m: _group_stats(group, data[m][interview_rows], skill_ids.size) for m in METRICS}
+    interviews = np.bincount(group, minlength=skill_ids.size)
+    ranking = np.argsort(-interviews, kind="stable")[:top]
+    return [
+        {
+            "skill_id": int(skill_ids[g]),
+            "skill_name": names[int(skill_ids[g])],
+            "interviews": int(interviews[g]),
+            **{
+                m: {"mean": _round(stats[m]["mean"][g]), "median": _round(stats[m]["median"][g])}
+                for m in METRICS
+            },
+        }
+        for g in ranking
+    ]
@@ -0,0 +1,176 @@
+import threading
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..db import SessionLocal, dialect_insert
+
+
+SkillRef = Tuple[int, str]  # (skill_id, canonical skill_name)
+
+
+def skill_key(name: Optional[str]) -> str:
+    """Normalize a skill name for lookups: trim, collapse whitespace, casefold."""
+    return " ".join((name or "").split()).lower()
+
+
+class SkillResolver:
+    """Resolve skill names to Skill rows in bulk, with a process-wide name cache.
+
+    Lookups are case-insensitive (matching the old `ilike` behaviour). A batch
+    of names costs at most one SELECT ... IN and one INSERT ... ON CONFLICT,
+    and nothing at all once every name is cached.
+
+    Skills created inside a transaction are only published to the cache when
+    that transaction commits, so a rollback can never leave dangling ids behind.
+    """
+
+    _PENDING_KEY = "skill_resolver_pending"
+
+    def __init__(self) -> None:
+        self._cache: Dict[str, SkillRef] = {}
+        self._lock = threading.Lock()
+
+    # --- Cache maintenance ------------------------------------------------------
+
+    def invalidate(self, names: Optional[Iterable[str]] = None) -> None:
+        """Drop `names` from the cache, or everything when no names are given."""
+        with self._lock:
+            if names is None:
+                self._cache.clear()
+                return
+            for name in names:
+                self._cache.pop(skill_key(name), None)
+
+    def _stage(self, db: Session, found: Dict[str, SkillRef]) -> None:
+        db.info.setdefault(self._PENDING_KEY, {}).update(found)
+
+    def _publish(self, db: Session) -> None:
+        pending = db.info.pop(self._PENDING_KEY, None)
+        if pending:
+            with self._lock:
+                self._cache.update(pending)
+
+    def _discard(self, db: Session) -> None:
+        db.info.pop(self._PENDING_KEY, None)
+
+    # --- Resolution ----------------------------------------------------------------
+
+    def resolve(self, db: Session, names: Iterable[Optional[str]]) -> Dict[str, SkillRef]:
+        """Map each non-blank name's `skill_key` to its skill, creating missing skills.
+
+        Keys come back in first-seen input order, de-duplicated.
+
+        Does not commit; new skills become visible once the caller commits.
+        """
+        display: Dict[str, str] = {}
+        for name in names:
+            key = skill_key(name)
+            if key and key not in display:
+                display[key] = " ".join(name.split())
+
+        resolved: Dict[str, SkillRef] = {}
+        with self._lock:
+            for key in display:
+                if key in self._cache:
+                    resolved[key] = self._cache[key]
+        pending = db.info.get(self._PENDING_KEY, {})
+        for key in display:
+            if key not in resolved and key in pending:
+                resolved[key] = pending[key]
+
+        missing = [key for key in display if key not in resolved]
+        if not missing:
+            return {key: resolved[key] for key in display}
+
+        existing: Dict[str, SkillRef] = {}
+        rows = (
+            db.query(models.Skill.skill_id, models.Skill.skill_name)
+            .filter(func.lower(models.Skill.skill_name).in_(missing))
+            .order_by(models.Skill.skill_id)
+            .all()
+        )
+        for skill_id, skill_name in rows:
+            existing.setdefault(skill_key(skill_name), (skill_id, skill_name))
+        resolved.update(existing)
+        with self._lock:
+            self._cache.update(existing)
+
+        to_create = [display[key] for key in missing if key not in existing]
+        if to_create:
+            created = self._insert_missing(db, to_create)
+            resolved.update(created)
+            self._stage(db, created)
+
+        # Keep the caller's ordering
+        return {key: resolved[key] for key in display if key in resolved}
+
+    def _insert_missing(self, db: Session, names: Sequence[str]) -> Dict[str, SkillRef]:
+        table = models.Skill.__table__
+        stmt = (
+            dialect_insert(db, table)
+            .values([{"skill_name": n} for n in names])
+            .on_conflict_do_nothing(index_elements=[table.c.skill_name])
+            .returning(table.c.skill_id, table.c.skill_name)
+        )
+        created = {skill_key(name): (skill_id, name) for skill_id, name in db.execute(stmt)}
+
+        # Rows skipped by ON CONFLICT were inserted concurrently; read them back.
+        raced = [n for n in names if skill_key(n) not in created]
+        if raced:
+            rows = db.query(models.Skill.skill_id, models.Skill.skill_name).filter(
+                models.Skill.skill_name.in_(raced)
+            )
+            created.update({skill_key(name): (skill_id, name) for skill_id, name in rows})
+        return created
+
+    def link_user(
+        self,
+        db: Session,
+        user_id: int,
+        skills: Sequence[Tuple[int, Optional[str]]],
+        *,
+        overwrite_proficiency: bool = False,
+    ) -> None:
+        """Attach `(skill_id, proficiency)` pairs to a user with one INSERT ... ON CONFLICT.
+
+        Existing links are left alone unless `overwrite_proficiency` is set.
+        """
+        if not skills:
+            return
+        table = models.UserSkill.__table__
+        rows = [
+            {"user_id": user_id, "skill_id": skill_id, "proficiency": proficiency}
+            for skill_id, proficiency in dict(skills).items()
+        ]
+        stmt = dialect_insert(db, table).values(rows)
+        if overwrite_proficiency:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.skill_id],
+                set_={"proficiency": stmt.excluded.proficiency},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.skill_id])
+        db.execute(stmt)
+
+
+skill_resolver = SkillResolver()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_new_skills(session: Session) -> None:
+    skill_resolver._publish(session)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_new_skills(session: Session) -> None:
+    skill_resolver._discard(session)
+
+
+@event.listens_for(models.Skill, "after_update")
+@event.listens_for(models.Skill, "after_delete")
+def _invalidate_changed_skill(mapper, connection, target: models.Skill) -> None:
+    # Bulk query.update()/delete() bypass ORM events; call invalidate() after those.
+    skill_resolver.invalidate()
@@ -1,58 +1,457 @@
+"""File storage behind one async interface, with Supabase and local-disk backends.
+
+STORAGE_BACKEND picks the backend ("supabase" or "local"; local when no
+Supabase credentials are configured). Every call is awaitable and never
+blocks the event loop: the Supabase client is synchronous, so its calls run
+on a small dedicated executor, and the local backend does its file I/O there
+too. Files at least STORAGE_MULTIPART_THRESHOLD bytes are written as parts in
+parallel by backends that support it. Each backend keeps latency figures per
+operation (`metrics.snapshot()`). The signed URL cache keeps signed links to
+private files so listings don't re-sign on every request.
+
+Both are built on first use (`get_storage_service`, `get_signed_url_cache`),
+so importing this module never imports or connects the Supabase client.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
 import os
-from supabase import create_client, Client
-
-class StorageService:
-    def __init__(self):
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        
-        if not url or not key:
-            print("Warning: Supabase credentials not found in environment variables.")
-            self.supabase: Client = None
-        else:
-            self.supabase: Client = create_client(url, key)
-
-    def upload_file(self, bucket: str, path: str, file_content: bytes, content_type: str = "application/pdf") -> str:
-        """Uploads a file to Supabase Storage and returns the public URL."""
-        if not self.supabase:
-            raise Exception("Supabase client not initialized")
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote, urlencode
 
-        try:
-            # Overwrite if exists logic can be handled by remove then upload, or upsert if supported
-            # user requests "upload another in place of the previous one", so we try upsert logic
-            # upsert=True is supported in some client versions, or we explicitly delete first
-            
-            # Using upsert options
-            self.supabase.storage.from_(bucket).upload(
-                path=path,
-                file=file_content,
-                file_options={"content-type": content_type, "upsert": "true"}
+from .. import tracing
+from ..core_config import get_settings
+
+settings = get_settings()
+
+FileLike = Union[bytes, BinaryIO]
+
+
+class _RawReader(io.RawIOBase):
+    """Raw-IO view of any binary file, so it can be wrapped in a BufferedReader.
+
+    The storage client streams BufferedReader uploads chunk by chunk but treats
+    any other file object as a path, so spooled temp files go through this.
+    """
+
+    def __init__(self, file: BinaryIO) -> None:
+        self._file = file
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._file.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+
+def _size(file: FileLike) -> int:
+    if isinstance(file, (bytes, bytearray)):
+        return len(file)
+    start = file.tell()
+    end = file.seek(0, os.SEEK_END)
+    file.seek(start)
+    return end - start
+
+
+# --- Metrics -----------------------------------------------------------------------
+
+
+class StorageMetrics:
+    """Call counts, errors, bytes and recent latencies per operation."""
+
+    WINDOW = 1024  # latencies kept per operation for the percentiles
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, op: str, seconds: float, nbytes: int = 0, error: bool = False) -> None:
+        with self._lock:
+            entry = self._ops.setdefault(
+                op, {"count": 0, "errors": 0, "bytes": 0, "latencies": deque(maxlen=self.WINDOW)}
             )
-            
-            # Get public URL
-            # Note: For private buckets, we should use create_signed_url instead.
-            # Assuming public for resumes for now as per requirement "return file URL or signed URL"
-            # If bucket is private, this returns a public URL that might not work without RLS policies allowing it
-            # Let's try to get a signed URL for safety if public fails, or just public if configured.
-            
-            # Strategy: Return the path, let the frontend/backend generate signed URLs as needed
-            # But the requirement asks to return the URL.
-            
-            return self.supabase.storage.from_(bucket).get_public_url(path)
-
-        except Exception as e:
-            print(f"Supabase upload failed: {e}")
-            raise e
-
-    def get_signed_url(self, bucket: str, path: str, expires_in: int = 3600) -> str:
-        if not self.supabase:
-            raise Exception("Supabase client not initialized")
-        
+            entry["count"] += 1
+            entry["errors"] += int(error)
+            entry["bytes"] += nbytes
+            entry["latencies"].append(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            ops = {op: (dict(e), sorted(e["latencies"])) for op, e in self._ops.items()}
+        return {
+            op: {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "bytes": entry["bytes"],
+                **{f"p{p}_ms": _percentile_ms(latencies, p) for p in (50, 95, 99)},
+            }
+            for op, (entry, latencies) in ops.items()
+        }
+
+
+def _percentile_ms(ordered: List[float], pct: int) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 2)
+
+
+# --- Interface ---------------------------------------------------------------------
+
+
+class StorageBackend(ABC):
+    """Async file storage. Subclasses implement the underscored methods."""
+
+    name: str = "base"
+    supports_multipart = False
+
+    def __init__(self) -> None:
+        self.metrics = StorageMetrics()
+        # Dedicated threads: blocking storage I/O must not take the request threadpool
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.STORAGE_IO_THREADS, thread_name_prefix=f"storage-{self.name}"
+        )
+        self.io_threads = settings.STORAGE_IO_THREADS
+        self.io_in_flight = 0  # only changed on the event loop
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.io_in_flight += 1
         try:
-           res = self.supabase.storage.from_(bucket).create_signed_url(path, expires_in)
-           return res["signedURL"]
-        except Exception as e:
-            print(f"Failed to sign URL: {e}")
-            return ""
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.io_in_flight -= 1
+
+    async def _timed(self, op: str, nbytes: int, awaitable) -> Any:
+        start = time.perf_counter()
+        with tracing.span(f"storage.{op}", **{"storage.backend": self.name, "storage.bytes": nbytes}):
+            try:
+                result = await awaitable
+            except Exception:
+                self.metrics.record(op, time.perf_counter() - start, nbytes, error=True)
+                raise
+        self.metrics.record(op, time.perf_counter() - start, nbytes)
+        return result
+
+    # Public API
+
+    async def upload(self, bucket: str, path: str, file: FileLike, content_type: str = "application/pdf") -> str:
+        """Store `file` (bytes or a binary file, read from its current position) and return its URL."""
+        size = _size(file)
+        if self.supports_multipart and size >= settings.STORAGE_MULTIPART_THRESHOLD:
+            return await self._timed("upload_multipart", size, self._upload_multipart(bucket, path, file, size))
+        return await self._timed("upload", size, self._upload(bucket, path, file, content_type))
+
+    async def signed_url(self, bucket: str, path: str, expires_in: int = 3600) -> str:
+        return (await self.signed_urls(bucket, [path], expires_in))[path]
+
+    async def signed_urls(self, bucket: str, paths: List[str], expires_in: int = 3600) -> Dict[str, str]:
+        """Signed URLs for many paths in one request; paths that can't be signed are left out."""
+        if not paths:
+            return {}
+        return await self._timed("signed_urls", 0, self._signed_urls(bucket, paths, expires_in))
+
+    async def delete(self, bucket: str, path: str) -> None:
+        await self._timed("delete", 0, self._delete(bucket, path))
+
+    @abstractmethod
+    def public_url(self, bucket: str, path: str) -> str:
+        """The URL `upload` returns for this path, without uploading anything."""
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    # Multipart: parts are read from the source and written concurrently
+
+    async def _upload_multipart(self, bucket: str, path: str, file: FileLike, size: int) -> str:
+        part_size = settings.STORAGE_PART_SIZE
+        start = 0 if isinstance(file, (bytes, bytearray)) else file.tell()
+        handle = await self._run(self._begin_multipart, bucket, path, size)
+        slots = asyncio.Semaphore(settings.STORAGE_UPLOAD_CONCURRENCY)  # bounds the parts held in memory
+        read_lock = threading.Lock()  # parts share the source's file position
+
+        async def put(index: int, offset: int) -> None:
+            async with slots:
+                length = min(part_size, size - offset)
+                data = await self._run(self._read_part, file, read_lock, start + offset, length)
+                await self._run(self._write_part, handle, index, offset, data)
+
+        # Let every part finish before aborting: writes still running would hit a closed file
+        results = await asyncio.gather(
+            *(put(i, off) for i, off in enumerate(range(0, size, part_size))), return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            await self._run(self._abort_multipart, handle)
+            raise errors[0]
+        return await self._run(self._complete_multipart, handle)
+
+    @staticmethod
+    def _read_part(file: FileLike, lock: threading.Lock, offset: int, length: int) -> bytes:
+        if isinstance(file, (bytes, bytearray)):
+            return bytes(file[offset:offset + length])
+        with lock:
+            file.seek(offset)
+            return file.read(length)
+
+    def _begin_multipart(self, bucket: str, path: str, size: int) -> Any:
+        raise NotImplementedError
+
+    def _write_part(self, handle: Any, index: int, offset: int, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _complete_multipart(self, handle: Any) -> str:
+        raise NotImplementedError
+
+    def _abort_multipart(self, handle: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _upload(self, bucket: str, path: str, file: FileLike, content_type: str) -> str: ...
+
+    @abstractmethod
+    async def _signed_urls(self, bucket: str, paths: List[str], expires_in: int) -> Dict[str, str]: ...
+
+    @abstractmethod
+    async def _delete(self, bucket: str, path: str) -> None: ...
+
+
+# --- Supabase ------------------------------------------------------------------------
+
+
+class SupabaseStorage(StorageBackend):
+    """Supabase Storage through its synchronous client, offloaded to the storage executor.
+
+    The client has no multipart API, so large files go up as one streamed request.
+    """
+
+    name = "supabase"
+
+    def __init__(self, url: str, key: str) -> None:
+        super().__init__()
+        from supabase import create_client
+
+        self.client = create_client(url, key)
+
+    async def _upload(self, bucket: str, path: str, file: FileLike, content_type: str) -> str:
+        if not isinstance(file, (bytes, io.BufferedReader)):
+            file = io.BufferedReader(_RawReader(file))
+
+        def upload() -> str:
+            # Overwrites the previous file at this path ("replace my resume")
+            self.client.storage.from_(bucket).upload(
+                path=path, file=file, file_options={"content-type": content_type, "upsert": "true"}
+            )
+            return self.public_url(bucket, path)
+
+        return await self._run(upload)
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return self.client.storage.from_(bucket).get_public_url(path)
+
+    async def _signed_urls(self, bucket: str, paths: List[str], expires_in: int) -> Dict[str, str]:
+        res = await self._run(self.client.storage.from_(bucket).create_signed_urls, paths, expires_in)
+        return {item["path"]: item["signedURL"] for item in res if not item.get("error")}
+
+    async def _delete(self, bucket: str, path: str) -> None:
+        await self._run(self.client.storage.from_(bucket).remove, [path])
+
+
+# --- Local disk ----------------------------------------------------------------------
+
+
+class LocalStorage(StorageBackend):
+    """Files under LOCAL_STORAGE_DIR, served by ``GET /api/documents/files/...``.
+
+    URLs carry an HMAC of bucket, path and expiry (0 = never) so they work
+    without a login, like Supabase's links, but can't be guessed from a path.
+    Writes go to a temporary file that replaces the target atomically.
+    """
+
+    name = "local"
+    supports_multipart = True
+
+    def __init__(self, root: str, base_url: str) -> None:
+        super().__init__()
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self._key = settings.SECRET_KEY.encode("utf-8")
+
+    def file_path(self, bucket: str, path: str) -> str:
+        full = os.path.abspath(os.path.join(self.root, bucket, path))
+        if not full.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage path: {bucket}/{path}")
+        return full
+
+    def _signature(self, bucket: str, path: str, expires: int) -> str:
+        mac = hmac.new(self._key, f"{bucket}/{path}:{expires}".encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(mac[:18]).decode("ascii")
+
+    def url(self, bucket: str, path: str, expires: int = 0) -> str:
+        query = urlencode({"expires": expires, "signature": self._signature(bucket, path, expires)})
+        return f"{self.base_url}/api/documents/files/{quote(bucket)}/{quote(path)}?{query}"
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return self.url(bucket, path)
+
+    def verify(self, bucket: str, path: str, expires: int, signature: str) -> bool:
+        if expires and expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(bucket, path, expires), signature)
+
+    def _temp_for(self, target: str) -> str:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".upload-")
+        os.close(fd)
+        return tmp
+
+    async def _upload(self, bucket: str, path: str, file: FileLike, content_type: str) -> str:
+        def write() -> None:
+            target = self.file_path(bucket, path)
+            tmp = self._temp_for(target)
+            try:
+                with open(tmp, "wb") as out:
+                    if isinstance(file, (bytes, bytearray)):
+                        out.write(file)
+                    else:
+                        shutil.copyfileobj(file, out, 1024 * 1024)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp, target)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+        await self._run(write)
+        return self.url(bucket, path)
+
+    def _begin_multipart(self, bucket: str, path: str, size: int) -> Any:
+        target = self.file_path(bucket, path)
+        tmp = self._temp_for(target)
+        fd = os.open(tmp, os.O_WRONLY)
+        os.ftruncate(fd, size)
+        return {"bucket": bucket, "path": path, "target": target, "tmp": tmp, "fd": fd}
+
+    def _write_part(self, handle: Any, index: int, offset: int, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(handle["fd"], view, offset)
+            view, offset = view[written:], offset + written
+
+    def _complete_multipart(self, handle: Any) -> str:
+        os.fsync(handle["fd"])
+        os.close(handle["fd"])
+        os.replace(handle["tmp"], handle["target"])
+        return self.url(handle["bucket"], handle["path"])
+
+    def _abort_multipart(self, handle: Any) -> None:
+        os.close(handle["fd"])
+        os.unlink(handle["tmp"])
+
+    async def _signed_urls(self, bucket: str, paths: List[str], expires_in: int) -> Dict[str, str]:
+        expires = int(time.time()) + expires_in
+        return {path: self.url(bucket, path, expires) for path in paths}
+
+    async def _delete(self, bucket: str, path: str) -> None:
+        def remove() -> None:
+            try:
+                os.unlink(self.file_path(bucket, path))
+            except FileNotFoundError:
+                pass
+
+        await self._run(remove)
+
+
+# --- Signed URL cache -----------------------------------------------------------------
+
+
+class SignedUrlCache:
+    """Signed URLs per (bucket, path), reused until they get close to expiring.
+
+    URLs are signed for SIGNED_URL_TTL_SECONDS and handed out only while they
+    have at least SIGNED_URL_MIN_REMAINING_SECONDS left, so a link a client
+    receives always stays usable that long. Everything missing or due for
+    renewal in one call is signed in a single batch request.
+    """
+
+    def __init__(self, backend: StorageBackend, ttl_seconds: int, min_remaining_seconds: int, max_entries: int) -> None:
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.min_remaining_seconds = min(min_remaining_seconds, ttl_seconds // 2)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def urls(self, bucket: str, paths: List[str]) -> Dict[str, str]:
+        """Signed URLs for `paths`, costing at most one storage round trip."""
+        now = time.time()
+        found: Dict[str, str] = {}
+        with self._lock:
+            for path in paths:
+                entry = self._entries.get((bucket, path))
+                if entry is not None and entry[0] - now >= self.min_remaining_seconds:
+                    found[path] = entry[1]
+                    self._entries.move_to_end((bucket, path))
+        missing = list(dict.fromkeys(p for p in paths if p not in found))
+        if missing:
+            expires_at = time.time() + self.ttl_seconds
+            signed = await self.backend.signed_urls(bucket, missing, self.ttl_seconds)
+            with self._lock:
+                for path, url in signed.items():
+                    self._entries[(bucket, path)] = (expires_at, url)
+                    self._entries.move_to_end((bucket, path))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            found.update(signed)
+        return found
+
+    def invalidate(self, bucket: str, path: str) -> None:
+        with self._lock:
+            self._entries.pop((bucket, path), None)
+
+
+def create_storage_backend(name: Optional[str] = None) -> StorageBackend:
+    name = (name or settings.STORAGE_BACKEND).lower()
+    if name == "supabase":
+        if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+            raise RuntimeError("STORAGE_BACKEND=supabase needs SUPABASE_URL and SUPABASE_KEY")
+        return SupabaseStorage(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    if name == "local":
+        return LocalStorage(settings.LOCAL_STORAGE_DIR, settings.PUBLIC_BASE_URL)
+    raise ValueError(f"Unknown STORAGE_BACKEND {name!r} (expected 'supabase' or 'local')")
+
+
+@lru_cache
+def get_storage_service() -> StorageBackend:
+    """The configured storage backend, built on first use; a FastAPI dependency."""
+    return create_storage_backend()
+
 
-storage_service = StorageService()
+@lru_cache
+def get_signed_url_cache() -> SignedUrlCache:
+    return SignedUrlCache(
+        get_storage_service(),
+        ttl_seconds=settings.SIGNED_URL_TTL_SECONDS,
+        min_remaining_seconds=settings.SIGNED_URL_MIN_REMAINING_SECONDS,
+        max_entries=settings.SIGNED_URL_CACHE_MAX_ENTRIES,
+    )
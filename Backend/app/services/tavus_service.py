@@ -1,11 +1,13 @@
+from functools import lru_cache
 from typing import Any, Dict, Optional, Tuple
 
 import logging
 
-import requests
 from requests import RequestException
 
 from ..core_config import get_settings
+from ..metrics import instrument_upstream
+from ..tracing import traced_session
 
 
 settings = get_settings()
@@ -13,6 +15,7 @@ settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
+@instrument_upstream("tavus")
 class TavusService:
     """Wrapper around Tavus CVI Create Conversation API.
 
@@ -23,13 +26,14 @@ class TavusService:
     # Use the Tavus CVI base URL that is reachable from this environment.
     # The older host "tavusapi.com" is currently responding correctly for
     # conversation creation and returns `conversation_url`.
-    BASE_URL = "https://tavusapi.com"
+    BASE_URL = settings.TAVUS_BASE_URL.rstrip("/")
 
     def __init__(self) -> None:
         logger.info("TavusService: initializing (no API call)")
         self.api_key = settings.TAVUS_API_KEY
         self.persona_id = settings.TAVUS_PERSONA_ID
         self.replica_id = settings.TAVUS_REPLICA_ID
+        self.session = traced_session("tavus")
 
     def _headers(self) -> Dict[str, str]:
         if not self.api_key:
@@ -59,7 +63,7 @@ class TavusService:
     def get_conversation(self, conversation_id: str) -> Dict[str, Any]:
         url = f"{self.BASE_URL}/v2/conversations/{conversation_id}"
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=20)
+            resp = self.session.get(url, headers=self._headers(), timeout=20)
         except RequestException as exc:
             raise RuntimeError(f"Tavus network error: {exc}") from exc
 
@@ -104,7 +108,7 @@ class TavusService:
         last_exc: Exception | None = None
         for attempt in range(2):
             try:
-                resp = requests.post(url, headers=self._headers(), json=payload, timeout=25)
+                resp = self.session.post(url, headers=self._headers(), json=payload, timeout=25)
                 if resp.status_code >= 400:
                     raise RuntimeError(f"Tavus error {resp.status_code}: {resp.text}")
 
@@ -153,7 +157,7 @@ class TavusService:
         last_error: str | None = None
         for headers in headers_to_try:
             try:
-                resp = requests.post(url, headers=headers, json=payload, timeout=25)
+                resp = self.session.post(url, headers=headers, json=payload, timeout=25)
             except RequestException as exc:
                 last_error = str(exc)
                 continue
@@ -175,7 +179,7 @@ class TavusService:
         url = f"{self.BASE_URL}/v2/conversations/{conversation_id}/end"
         
         try:
-            resp = requests.post(url, headers=self._headers(), timeout=15)
+            resp = self.session.post(url, headers=self._headers(), timeout=15)
         except RequestException as exc:
             # If network fails, we can't do much, just log and re-raise or absorb
             raise RuntimeError(f"Tavus network error: {exc}") from exc
@@ -189,4 +193,7 @@ class TavusService:
         return resp.json()
 
 
-tavus_service = TavusService()
+@lru_cache
+def get_tavus_service() -> TavusService:
+    """The shared TavusService, built on first use; a FastAPI dependency."""
+    return TavusService()
@@ -0,0 +1,494 @@
+"""Per-request span tracing with W3C trace-context propagation.
+
+Each HTTP request gets a server span (`TracingMiddleware`), which continues
+the trace of an incoming ``traceparent`` header. Child spans cover Gemini and
+Tavus service methods (via `metrics.instrument_upstream`), every HTTP call
+they make (`traced_session`, which also sends ``traceparent`` upstream),
+storage operations and every SQL statement (`instrument_engine`).
+
+Spans are buffered per trace and the keep/drop decision is made when the
+request finishes (tail sampling): a trace is exported when the caller sampled
+it, when it falls in the TRACE_SAMPLE_RATE share, when the request took at
+least TRACE_SLOW_MS, or when it failed with a 5xx. Slow requests are therefore
+always kept. Event streams (``text/event-stream``) finish their trace as soon
+as the response starts: the connection stays open for as long as the client
+watches, and the stream's work is not traced.
+
+Exporters (TRACE_EXPORTER):
+
+- ``file``: one JSON line per trace appended to TRACE_FILE, which is rotated
+  to ``TRACE_FILE.1`` at TRACE_FILE_MAX_BYTES;
+- ``otlp``: OTLP/HTTP JSON posted to TRACE_OTLP_ENDPOINT (any OpenTelemetry
+  collector, or ``python -m benchmarks.otlp_collector`` locally);
+- ``none`` (default): tracing off; the middleware passes requests straight through.
+
+Export happens on a background thread and drops traces when it falls behind.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cassettes import CassetteAdapter, open_cassette
+from .core_config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+MAX_SPANS_PER_TRACE = 2000
+MAX_STATEMENT_CHARS = 2000
+
+# Query strings are dropped from recorded URLs and errors (Gemini takes its API key there)
+_QUERY = re.compile(r"\?[^\s'\")]*")
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def describe(exc: BaseException) -> str:
+    """Error text for a span: exception type and message, without URL query strings."""
+    return _QUERY.sub("?...", f"{type(exc).__name__}: {exc}")[:500]
+
+
+class _Trace:
+    __slots__ = ("trace_id", "sampled", "tracestate", "root", "spans", "dropped", "closed", "lock")
+
+    def __init__(self, trace_id: str, sampled: bool, tracestate: Optional[str]) -> None:
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.tracestate = tracestate
+        self.root: Optional["Span"] = None  # the server span
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.closed = False  # finished; spans still open are discarded
+        self.lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: _Trace, name: str, kind: int, parent_id: Optional[str], attributes: Dict[str, Any]) -> None:
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.error = message
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        trace = self.trace
+        with trace.lock:
+            if trace.closed:
+                return
+            if len(trace.spans) < MAX_SPANS_PER_TRACE:
+                trace.spans.append(self)
+            else:
+                trace.dropped += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": {KIND_SERVER: "server", KIND_CLIENT: "client"}.get(self.kind, "internal"),
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes: Any) -> Optional[Span]:
+    """A child of the current span (not made current), or None outside a trace."""
+    parent = _current.get()
+    if parent is None or parent.trace.closed:
+        return None
+    return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Run the block in a child span of the current one; a no-op outside a trace."""
+    child = start_span(name, kind, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.set_error(describe(exc))
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+def set_route(method: str, route: str) -> None:
+    """Name the current request's server span after its route template."""
+    current = _current.get()
+    root = current.trace.root if current is not None else None
+    if root is not None:
+        root.name = f"{method} {route}"
+        root.attributes["http.route"] = route
+
+
+# --- HTTP server side -----------------------------------------------------------------
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent header, or None if invalid."""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match:
+        return None
+    version, trace_id, parent_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest) or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+class TracingMiddleware:
+    """Open a server span per HTTP request and export the trace if it is kept."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = _new_id(16), None
+            sampled = random.random() < settings.TRACE_SAMPLE_RATE
+        tracestate = headers.get(b"tracestate")
+        trace = _Trace(trace_id, sampled, tracestate.decode("latin-1") if tracestate else None)
+        root = Span(trace, f"{scope['method']} unmatched", KIND_SERVER, parent_id, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        trace.root = root
+        status = 500
+
+        def finish() -> None:
+            if trace.closed:
+                return
+            root.attributes["http.status_code"] = status
+            if status >= 500 and root.error is None:
+                root.set_error(f"HTTP {status}")
+            root.end()
+            trace.closed = True
+            duration_ms = (root.end_ns - root.start_ns) / 1e6
+            if trace.sampled or duration_ms >= settings.TRACE_SLOW_MS or root.error is not None:
+                exporter.submit(trace, root)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            streaming = False
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                streaming = any(
+                    k.lower() == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers
+                )
+                message["headers"] = headers + [(b"traceresponse", root.traceparent.encode())]
+            await send(message)
+            if streaming:
+                finish()
+
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            if not trace.closed:
+                root.set_error(describe(exc))
+            raise
+        finally:
+            _current.reset(token)
+            finish()
+
+
+# --- HTTP client side -----------------------------------------------------------------
+
+
+class TracingAdapter(HTTPAdapter):
+    """A client span per outgoing request, with the trace context sent along."""
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        child = start_span(
+            f"HTTP {request.method} {parts.hostname}",
+            KIND_CLIENT,
+            **{"http.method": request.method, "http.host": parts.hostname, "http.path": parts.path},
+        )
+        if child is None:
+            return super().send(request, **kwargs)
+        request.headers["traceparent"] = child.traceparent
+        if child.trace.tracestate:
+            request.headers["tracestate"] = child.trace.tracestate
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as exc:
+            child.set_error(describe(exc))
+            raise
+        else:
+            child.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 400:
+                child.set_error(f"HTTP {response.status_code}")
+            return response
+        finally:
+            child.end()
+
+
+class _CassetteTracingAdapter(TracingAdapter, CassetteAdapter):
+    """Spans around recorded/replayed calls: TracingAdapter.send reaches CassetteAdapter.send via super()."""
+
+
+def traced_session(cassette: Optional[str] = None) -> requests.Session:
+    """A requests Session whose calls become client spans of the current trace.
+
+    With UPSTREAM_CASSETTE_MODE set, its traffic is also recorded to or
+    replayed from the cassette named `cassette` (see app/cassettes.py).
+    """
+    session = requests.Session()
+    recordings = open_cassette(cassette) if cassette else None
+    adapter = _CassetteTracingAdapter(recordings) if recordings else TracingAdapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# --- Database -------------------------------------------------------------------------
+
+
+def instrument_engine(engine) -> None:
+    """A span per SQL statement (text only, never parameters) inside traced requests."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        child = start_span("db.query", KIND_CLIENT, **{
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:MAX_STATEMENT_CHARS],
+        })
+        conn.info.setdefault("trace_spans", []).append(child)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        child = conn.info["trace_spans"].pop()
+        if child is not None:
+            child.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            child = spans.pop()
+            if child is not None:
+                child.set_error(describe(context.original_exception))
+                child.end()
+
+
+# --- Export ---------------------------------------------------------------------------
+
+
+class _Exporter:
+    """Writes kept traces from a queue on a background thread."""
+
+    def __init__(self, max_queue: int = 1000) -> None:
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, trace: _Trace, root: Span) -> None:
+        with trace.lock:
+            spans = list(trace.spans)
+            dropped = trace.dropped
+        item = {
+            "trace_id": trace.trace_id,
+            "name": root.name,
+            "duration_ms": round((root.end_ns - root.start_ns) / 1e6, 3),
+            "spans": spans,
+            "dropped_spans": dropped,
+        }
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < 100:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self._write_safely(batch)
+                    return
+                batch.append(more)
+            self._write_safely(batch)
+
+    def _write_safely(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.write(batch)
+        except Exception:
+            logger.exception("Exporting %s traces failed", len(batch))
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+
+class FileExporter(_Exporter):
+    def __init__(self, path: str, max_bytes: int) -> None:
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as f:
+            for item in batch:
+                record = {**item, "spans": [s.to_dict() for s in item["spans"]]}
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter(_Exporter):
+    """OTLP/HTTP with the JSON encoding (POST {"resourceSpans": [...]})."""
+
+    def __init__(self, endpoint: str, service_name: str) -> None:
+        super().__init__()
+        self.endpoint = endpoint
+        self.service_name = service_name
+        # A plain session: the exporter's own requests must not be traced
+        self.session = requests.Session()
+
+    def _span(self, trace_id: str, span: Span) -> Dict[str, Any]:
+        out = {
+            "traceId": trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        }
+        if span.parent_id:
+            out["parentSpanId"] = span.parent_id
+        return out
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        spans = [self._span(item["trace_id"], s) for item in batch for s in item["spans"]]
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+        resp = self.session.post(self.endpoint, json=body, timeout=10)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"OTLP collector error {resp.status_code}: {resp.text[:200]}")
+
+
+def create_exporter() -> Optional[_Exporter]:
+    kind = settings.TRACE_EXPORTER.lower()
+    if kind == "file":
+        return FileExporter(settings.TRACE_FILE, settings.TRACE_FILE_MAX_BYTES)
+    if kind == "otlp":
+        return OtlpExporter(settings.TRACE_OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME)
+    if kind in ("", "none"):
+        return None
+    raise RuntimeError(f"Unknown TRACE_EXPORTER {settings.TRACE_EXPORTER!r}")
+
+
+exporter = create_exporter()
+
+
+def shutdown() -> None:
+    """Flush queued traces (app shutdown)."""
+    if exporter is not None:
+        exporter.shutdown()
@@ -0,0 +1,102 @@
+"""Size-bounded handling of uploaded PDFs.
+
+Starlette already spools multipart file parts to a SpooledTemporaryFile
+(memory up to 1 MB, disk beyond), so an upload never sits in memory whole
+unless someone calls ``await file.read()``. What it does not do is stop
+reading: `UploadLimitMiddleware` rejects multipart bodies larger than
+MAX_UPLOAD_BYTES with 413 as they stream in, and `open_pdf` checks the spooled
+file (magic bytes, page count) reading only its header, xref and page tree.
+"""
+
+import json
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from PyPDF2 import PdfReader
+
+from .core_config import get_settings
+
+settings = get_settings()
+
+# Multipart framing and the other form fields on top of the file itself
+_FORM_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(HTTPException):
+    # An HTTPException so FastAPI's body parsing re-raises it instead of turning it into a 400
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=413,
+            detail=f"Upload exceeds the {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit",
+        )
+
+
+class UploadLimitMiddleware:
+    """Reject multipart request bodies over MAX_UPLOAD_BYTES while they are received."""
+
+    def __init__(self, app, max_bytes: int = settings.MAX_UPLOAD_BYTES + _FORM_OVERHEAD) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise UploadTooLarge()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _is_multipart(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                return value.lower().startswith(b"multipart/form-data")
+        return False
+
+    async def _reject(self, send) -> None:
+        exc = UploadTooLarge()
+        body = json.dumps({"detail": exc.detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def open_pdf(upload: UploadFile, max_pages: int = settings.MAX_UPLOAD_PAGES) -> BinaryIO:
+    """The upload's spooled file, rewound, after checking it really is a small enough PDF."""
+    if upload.size is not None and upload.size > settings.MAX_UPLOAD_BYTES:
+        raise UploadTooLarge()
+    f = upload.file
+    f.seek(0)
+    # The spec allows the header anywhere in the first 1024 bytes; don't trust Content-Type
+    if b"%PDF-" not in f.read(1024):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
+    f.seek(0)
+    try:
+        pages = len(PdfReader(f, strict=False).pages)
+    except Exception:
+        raise HTTPException(status_code=400, detail="The PDF could not be read.")
+    if pages > max_pages:
+        raise HTTPException(status_code=400, detail=f"PDFs are limited to {max_pages} pages.")
+    f.seek(0)
+    return f
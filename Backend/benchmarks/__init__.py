@@ -0,0 +1,2 @@
+# Benchmarks for the Backend app; run from the Backend directory, e.g.
+#   python -m benchmarks.bench_unit_of_work
@@ -0,0 +1,119 @@
+"""Memory and throughput of the admin list and auth paths with deferred Text columns.
+
+    python -m benchmarks.bench_deferred_columns [--users 2000] [--rounds 20]
+
+"before" loads the same rows with the large columns undeferred, which is
+what every query did before they were deferred; "after" uses the default
+(deferred) mapping the routes now run with.
+"""
+
+import argparse
+import random
+import string
+import time
+import tracemalloc
+
+from .common import print_table, use_database
+
+
+def _text(n: int) -> str:
+    return "".join(random.choices(string.ascii_letters + " \n", k=n))
+
+
+def _seed(db, models, users: int) -> None:
+    for i in range(users):
+        user = models.User(
+            name=f"User {i}",
+            email=f"user{i}@bench",
+            role="candidate",
+            resume_summary=_text(600),
+            resume_raw=_text(20000),
+        )
+        user.candidate_interviews.append(
+            models.Interview(interviewer_id=1, type="Backend", status="Completed", transcript=_text(15000))
+        )
+        db.add(user)
+    db.commit()
+
+
+def _measure(fn, rounds: int) -> dict:
+    fn()  # warm up
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops/s": round(rounds / elapsed, 1), "peak_MiB": round(peak / 2**20, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    use_database(None)
+    from sqlalchemy.orm import undefer, undefer_group
+
+    from app import migrations, models
+    from app.db import Base, SessionLocal, engine
+    from app.dependencies import _load_principal
+
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        _seed(db, models, args.users)
+
+    eager_user = undefer_group("resume")
+    eager_interview = undefer(models.Interview.transcript)
+    ids = list(range(1, args.users + 1))
+
+    def admin_users(eager: bool):
+        def run():
+            with SessionLocal() as db:
+                query = db.query(models.User)
+                if eager:
+                    query = query.options(eager_user)
+                [(u.user_id, u.name, u.email, u.role) for u in query.all()]
+        return run
+
+    def admin_interviews(eager: bool):
+        def run():
+            with SessionLocal() as db:
+                query = db.query(models.Interview)
+                if eager:
+                    query = query.options(eager_interview)
+                for i in query.all():
+                    # Old list endpoint: one full User load per row
+                    candidate = db.query(models.User)
+                    if eager:
+                        candidate = candidate.options(eager_user)
+                    candidate.filter(models.User.user_id == i.candidate_id).first()
+        return run
+
+    def auth(eager: bool):
+        def run():
+            with SessionLocal() as db:
+                for user_id in random.sample(ids, 200):
+                    if eager:
+                        db.query(models.User).options(eager_user).filter(models.User.user_id == user_id).first()
+                    else:
+                        _load_principal(db, user_id)
+        return run
+
+    rows = []
+    for name, factory, rounds in (
+        ("admin users list", admin_users, args.rounds),
+        ("admin interviews list", admin_interviews, max(1, args.rounds // 10)),
+        ("auth lookup x200 (cold cache)", auth, args.rounds),
+    ):
+        for label, eager in (("before", True), ("after", False)):
+            rows.append({"path": name, "mode": label, **_measure(factory(eager), rounds)})
+
+    print_table(rows, ["path", "mode", "ops/s", "peak_MiB"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Login throughput and latency under a burst of concurrent sign-ins.
+
+    python -m benchmarks.bench_login [--users 200] [--concurrency 64] [--seconds 15]
+
+Starts the API under uvicorn once per configuration, then has `--concurrency`
+clients log in back to back for `--seconds` while one more client polls
+``GET /health/db`` (a cheap route sharing the same threadpool). Compares:
+
+- inline: bcrypt on the request threads (PASSWORD_HASH_WORKERS=0, unbounded),
+  which is how login worked before the hashing pool;
+- pool: the default process pool with its bounded queue, shedding the excess
+  as 503 + Retry-After.
+
+Reports successful logins per second, login p50/p99, the number of 503s and
+health-check p99 during the burst.
+"""
+
+import argparse
+import os
+import threading
+import time
+from typing import Dict, List
+
+import bcrypt
+import requests
+
+from .common import print_table, serve_api, summarize_ms, use_database
+
+
+def _seed(users: int, rounds: int) -> None:
+    from app import models
+    from app.db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    password_hash = bcrypt.hashpw(b"secret-password", bcrypt.gensalt(rounds)).decode()
+    with SessionLocal() as db:
+        db.add_all(
+            models.User(name=f"User {i}", email=f"user{i}@bench", role="candidate", password_hash=password_hash)
+            for i in range(users)
+        )
+        db.commit()
+
+
+def _run(name: str, env: Dict[str, str], args: argparse.Namespace) -> Dict[str, object]:
+    with serve_api(env) as base:
+        stop = time.monotonic() + args.seconds
+        lock = threading.Lock()
+        logins: List[float] = []
+        health: List[float] = []
+        shed = errors = 0
+
+        def client(i: int) -> None:
+            nonlocal shed, errors
+            session = requests.Session()
+            n = i
+            while time.monotonic() < stop:
+                body = {"email": f"user{n % args.users}@bench", "password": "secret-password"}
+                n += args.concurrency
+                t0 = time.perf_counter()
+                resp = session.post(f"{base}/api/auth/login", json=body, timeout=120)
+                elapsed = time.perf_counter() - t0
+                with lock:
+                    if resp.status_code == 200:
+                        logins.append(elapsed)
+                    elif resp.status_code == 503:
+                        shed += 1
+                    else:
+                        errors += 1
+                if resp.status_code == 503:
+                    time.sleep(float(resp.headers.get("Retry-After", "1")))
+
+        def poller() -> None:
+            session = requests.Session()
+            while time.monotonic() < stop:
+                t0 = time.perf_counter()
+                session.get(f"{base}/health/db", timeout=120)
+                health.append(time.perf_counter() - t0)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+        threads.append(threading.Thread(target=poller))
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        login_stats = summarize_ms(logins)
+        return {
+            "config": name,
+            "logins_per_s": round(len(logins) / wall, 1),
+            "login_p50_ms": login_stats["p50_ms"],
+            "login_p99_ms": login_stats["p99_ms"],
+            "shed_503": shed,
+            "errors": errors,
+            "health_p99_ms": summarize_ms(health)["p99_ms"],
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost of the seeded hashes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hashing pool size")
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    url = use_database(args.database_url)
+    _seed(args.users, args.rounds)
+
+    common = {"DATABASE_URL": url, "BCRYPT_ROUNDS": str(args.rounds)}
+    configs = {
+        "inline": {"PASSWORD_HASH_WORKERS": "0", "PASSWORD_HASH_QUEUE_SIZE": "100000"},
+        "pool": {"PASSWORD_HASH_WORKERS": str(args.workers)},
+    }
+    rows = [_run(name, {**common, **env}, args) for name, env in configs.items()]
+    print_table(
+        rows,
+        ["config", "logins_per_s", "login_p50_ms", "login_p99_ms", "shed_503", "errors", "health_p99_ms"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Latency of near-duplicate question lookups on a large question bank and history.
+
+    python -m benchmarks.bench_question_dedup [--bank 200000] [--history 200] [--lookups 500]
+
+Seeds the question bank (with fingerprints) with synthetic questions, and one
+candidate with `--history` past questions, then times:
+
+- `candidate_signatures` + `filter_repeats` of a 5-question set, which is
+  what `start_interview` adds per interview;
+- `bank_fill` of 5 questions against that history, the bank fallback.
+"""
+
+import argparse
+import random
+import time
+
+from .common import print_table, summarize_ms, use_database
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+
+
+def _question(rng: random.Random) -> str:
+    # Zipf-distributed content words: a few very common ones, a long tail of rare ones
+    words = [VOCABULARY[min(int(rng.paretovariate(1.2)) - 1, len(VOCABULARY) - 1)] for _ in range(rng.randint(5, 9))]
+    return "How would you " + " ".join(words) + "?"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bank", type=int, default=200_000)
+    parser.add_argument("--history", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app import migrations, models
+    from app.db import Base, SessionLocal, engine
+    from app.services import question_dedup
+
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+
+    rng = random.Random(7)
+    bank_texts = [_question(rng) for _ in range(args.bank)]
+    start = time.perf_counter()
+    bank = models.QuestionBank.__table__
+    with engine.begin() as conn:
+        for offset in range(0, args.bank, 5000):
+            chunk = bank_texts[offset:offset + 5000]
+            sigs = [question_dedup.signature(t) for t in chunk]
+            conn.execute(
+                bank.insert(),
+                [
+                    {"id": offset + i + 1, "text": t, "difficulty": "medium", "is_active": True, "fingerprint": s.tobytes()}
+                    for i, (t, s) in enumerate(zip(chunk, sigs))
+                ],
+            )
+    print(f"Seeded {args.bank} bank questions in {time.perf_counter() - start:.1f}s")
+
+    with SessionLocal() as db:
+        candidate = models.User(name="Bench", email="bench@dedup", role="candidate")
+        db.add(candidate)
+        db.flush()
+        for i in range(0, args.history, 5):
+            db.add(
+                models.Interview(
+                    candidate_id=candidate.user_id,
+                    interviewer_id=candidate.user_id,
+                    questions=[models.Question(question_text=_question(rng)) for _ in range(5)],
+                )
+            )
+        db.commit()
+        candidate_id = candidate.user_id
+
+    rows = []
+    with SessionLocal() as db:
+        samples = []
+        for _ in range(args.lookups // 5):
+            t0 = time.perf_counter()
+            history = question_dedup.candidate_signatures(db, candidate_id)
+            question_dedup.filter_repeats([_question(rng) for _ in range(5)], history)
+            samples.append(time.perf_counter() - t0)
+        rows.append({"lookup": f"candidate history ({args.history}) x5", **summarize_ms(samples)})
+
+        history = question_dedup.candidate_signatures(db, candidate_id)
+        samples = []
+        for _ in range(args.lookups // 5):
+            t0 = time.perf_counter()
+            question_dedup.bank_fill(db, history, [], 5)
+            samples.append(time.perf_counter() - t0)
+        rows.append({"lookup": "bank fill x5", **summarize_ms(samples)})
+
+    print_table(rows, ["lookup", "n", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Latency of the admin full-text search on a large index.
+
+    python -m benchmarks.bench_search [--docs 200000] [--queries 200]
+
+Fills the search table with synthetic documents drawn from a Zipf-like
+vocabulary (so common and rare terms both occur), then times `search.search`
+plus `attach_context` for one page of results, which is what
+``GET /api/admin/search`` does. Target: p99 under 50 ms at a million documents
+(``--docs 1000000``).
+"""
+
+import argparse
+import random
+import time
+
+from .common import print_table, summarize_ms, use_database
+
+VOCABULARY = [f"term{i}" for i in range(20000)] + [
+    "python", "kubernetes", "postgres", "react", "latency", "microservices", "docker", "graphql",
+]
+
+
+def _document(rng: random.Random, words: int) -> str:
+    return " ".join(VOCABULARY[min(int(rng.paretovariate(1.1)) - 1, len(VOCABULARY) - 1)] if rng.random() < 0.9
+                    else rng.choice(VOCABULARY) for _ in range(words))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    from app import migrations, search
+    from app.db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        batch = []
+        for i in range(1, args.docs + 1):
+            doc_type = ("transcript", "answer", "resume", "resume_summary")[i % 4]
+            batch.append((search.doc_key(doc_type, i), _document(rng, args.words)))
+            if len(batch) == 5000:
+                search.upsert_documents(conn, batch)
+                batch = []
+        search.upsert_documents(conn, batch)
+    print(f"Indexed {args.docs} documents in {time.perf_counter() - start:.1f}s")
+
+    queries = {
+        "common term": ["term1", "term2", "term3"],
+        "rare term": ["kubernetes", "graphql", "microservices"],
+        "two terms": ["python postgres", "react latency", "docker term5"],
+        "answers only": ["python"],
+    }
+    rows = []
+    with SessionLocal() as db:
+        for name, texts in queries.items():
+            types = ["answer"] if name == "answers only" else None
+            samples = []
+            for i in range(args.queries):
+                t0 = time.perf_counter()
+                hits = search.search(db, texts[i % len(texts)], types=types, limit=21)
+                search.attach_context(db, hits[:20])
+                samples.append(time.perf_counter() - t0)
+            rows.append({"query": name, **summarize_ms(samples)})
+
+    print_table(rows, ["query", "n", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Commits per request and latency for interview start / answer submission.
+
+    python -m benchmarks.bench_unit_of_work [--iterations 100] [--postgres-url postgresql://...]
+
+Runs against a scratch SQLite file, and additionally against PostgreSQL when
+--postgres-url (or BENCH_POSTGRES_URL) is given. Upstream Gemini/Tavus calls
+are stubbed so only request handling and SQL are measured.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+from .common import print_table, run_child, stub_upstreams, summarize_ms, use_database
+
+
+def _child(database_url: str, iterations: int) -> dict:
+    use_database(database_url)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.db import engine
+    from app.main import create_app
+
+    stub_upstreams()
+
+    commits = {"n": 0}
+    event.listen(engine, "commit", lambda conn: commits.__setitem__("n", commits["n"] + 1))
+
+    latencies = defaultdict(list)
+    commit_counts = defaultdict(list)
+
+    def timed(name, fn):
+        before = commits["n"]
+        start = time.perf_counter()
+        resp = fn()
+        latencies[name].append(time.perf_counter() - start)
+        commit_counts[name].append(commits["n"] - before)
+        resp.raise_for_status()
+        return resp.json()
+
+    with TestClient(create_app()) as client:
+        run_id = int(time.time() * 1000)
+        interviewer = client.post(
+            "/api/auth/register",
+            json={"name": "Interviewer", "email": f"iv-{run_id}@bench", "password": "pw"},
+        ).json()["user"]
+        token = client.post(
+            "/api/auth/register",
+            json={"name": "Candidate", "email": f"cand-{run_id}@bench", "password": "pw"},
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for i in range(iterations):
+            started = timed(
+                "POST /interview/start",
+                lambda: client.post(
+                    "/api/interview/start",
+                    json={
+                        "interviewer_id": interviewer["user_id"],
+                        "skills": ["Python", "SQL", f"Skill {i % 7}"],
+                    },
+                    headers=headers,
+                ),
+            )
+            for q in started["questions"]:
+                for chunk in ("first part of the answer", "second part"):
+                    timed(
+                        "POST /interview/{id}/questions/{id}/answer",
+                        lambda: client.post(
+                            f"/api/interview/{started['interview_id']}/questions/{q['question_id']}/answer",
+                            json={"answer_text": chunk},
+                            headers=headers,
+                        ),
+                    )
+
+    backend = database_url.split(":", 1)[0]
+    return {
+        "rows": [
+            {
+                "backend": backend,
+                "endpoint": name,
+                "commits/req": round(sum(commit_counts[name]) / len(commit_counts[name]), 2),
+                **summarize_ms(samples),
+            }
+            for name, samples in latencies.items()
+        ]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--postgres-url", default=os.getenv("BENCH_POSTGRES_URL"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--database-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.database_url, args.iterations)))
+        return
+
+    targets = [use_database(None)]
+    if args.postgres_url:
+        targets.append(args.postgres_url)
+
+    rows = []
+    for url in targets:
+        rows += run_child(
+            "benchmarks.bench_unit_of_work",
+            ["--database-url", url, "--iterations", str(args.iterations)],
+        )["rows"]
+    print_table(rows, ["backend", "endpoint", "commits/req", "n", "p50_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    main()
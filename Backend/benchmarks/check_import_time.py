@@ -0,0 +1,115 @@
+"""Import-time budgets for the API, measured with ``python -X importtime``.
+
+    python -m benchmarks.check_import_time [--runs 5] [--scale 1.0]
+
+Imports `app.main` and calls `create_app()` in fresh interpreters, then
+exits 1 when:
+
+- a module's cumulative import time (best of `--runs`) is over its budget in
+  BUDGETS_MS; `--scale` multiplies every budget, for slower machines;
+- importing `app.main` already imported the routers;
+- building the app imported a module that should only load on first use
+  (LAZY_MODULES);
+- building the app constructed the Gemini, Tavus or storage clients.
+
+Prints the slowest imports when a budget is exceeded.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from .common import use_database
+
+# Cumulative milliseconds, with headroom over a typical developer machine
+BUDGETS_MS = {
+    "app.main": 1500,
+    "app.models": 400,
+    "app.routers.interview": 150,
+    "app.routers.admin": 400,
+}
+
+# Only ever imported when first needed
+LAZY_MODULES = ("supabase", "uvicorn")
+
+_CHILD = """
+import json, sys
+import app.main
+routers = sorted(m for m in sys.modules if m.startswith("app.routers."))
+app.main.create_app()
+from app.services.gemini_service import get_gemini_service
+from app.services.storage import get_signed_url_cache, get_storage_service
+from app.services.tavus_service import get_tavus_service
+print(json.dumps({
+    "routers_on_import": routers,
+    "lazy_loaded": [m for m in %r if m in sys.modules],
+    "built": [f.__name__ for f in (get_gemini_service, get_tavus_service, get_storage_service, get_signed_url_cache)
+              if f.cache_info().currsize],
+}))
+""" % (LAZY_MODULES,)
+
+
+def _measure() -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        check=True, capture_output=True, text=True, env=os.environ,
+    )
+    cumulative: Dict[str, float] = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        try:
+            cumulative.setdefault(name.strip(), int(cum) / 1000)
+        except ValueError:
+            continue  # the header line
+    return cumulative, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every budget")
+    args = parser.parse_args()
+    use_database(None)
+
+    best: Dict[str, float] = {}
+    for _ in range(args.runs):
+        cumulative, state = _measure()
+        for name, ms in cumulative.items():
+            best[name] = min(ms, best.get(name, ms))
+
+    failures = []
+    for name, budget in BUDGETS_MS.items():
+        limit = budget * args.scale
+        ms = best.get(name)
+        status = "missing" if ms is None else ("OVER" if ms > limit else "ok")
+        shown = "-" if ms is None else f"{ms:.1f}"
+        print(f"{name:<24} {shown:>8} ms  budget {limit:>5.0f} ms  {status}")
+        if status == "OVER":
+            failures.append(f"{name} took {ms:.0f} ms (budget {limit:.0f} ms)")
+        elif status == "missing":
+            failures.append(f"{name} was never imported; update BUDGETS_MS")
+    if state["routers_on_import"]:
+        failures.append(f"importing app.main imported routers: {', '.join(state['routers_on_import'])}")
+    if state["lazy_loaded"]:
+        failures.append(f"create_app() imported {', '.join(state['lazy_loaded'])}")
+    if state["built"]:
+        failures.append(f"create_app() built services: {', '.join(state['built'])}")
+
+    if failures:
+        print("\nSlowest imports:")
+        for name, ms in sorted(best.items(), key=lambda kv: -kv[1])[:15]:
+            print(f"  {ms:9.1f} ms  {name}")
+        print("\nFailed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll import budgets met")
+
+
+if __name__ == "__main__":
+    main()
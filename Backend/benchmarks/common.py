@@ -0,0 +1,134 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks import the app *after* pointing DATABASE_URL at a scratch
+database, so call `use_database()` before importing anything from `app`.
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+
+def use_database(url: Optional[str]) -> str:
+    """Point the app at `url` (or a fresh temporary SQLite file) and return it."""
+    if not url:
+        url = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    os.environ["DATABASE_URL"] = url
+    return url
+
+
+def stub_upstreams() -> None:
+    """Replace Gemini/Tavus calls with instant, deterministic answers.
+
+    Keeps the numbers about our own request handling and SQL, not network.
+    """
+    from app.services.gemini_service import get_gemini_service
+    from app.services.tavus_service import get_tavus_service
+
+    gemini_service, tavus_service = get_gemini_service(), get_tavus_service()
+
+    # Distinct topics per call, so the repeat-question filter keeps every one
+    topics = itertools.count()
+    gemini_service.generate_interview_questions = lambda profile, count=5, avoid=None: [
+        f"Question about topic{next(topics)} for {profile.get('name')}" for _ in range(count)
+    ]
+    gemini_service.generate_tavus_interviewer_context = lambda payload: "context"
+    gemini_service.evaluate_answer = lambda q, a: {"relevance_score": 7, "confidence_level": 8}
+    gemini_service.summarize_candidate_profile = lambda raw: {
+        "resume_summary": "summary",
+        "skills": list(raw.get("tech_stack") or []),
+    }
+    tavus_service.create_conversation = lambda **kwargs: {
+        "conversation_id": "c-bench",
+        "conversation_url": "https://tavus.example/c-bench",
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base: str, proc: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if requests.get(f"{base}/health/db", timeout=1).ok:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready")
+
+
+@contextlib.contextmanager
+def serve_api(env: Dict[str, str]) -> Iterator[str]:
+    """Run the API under uvicorn with `env` on top of ours; yields its base URL."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+    try:
+        wait_ready(base, proc)
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize_ms(samples: List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as milliseconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+def run_child(module: str, args: Iterable[str]) -> Dict[str, Any]:
+    """Run `python -m module --child ...` in a fresh interpreter and parse its JSON output.
+
+    Each database target needs its own process because the engine is
+    created from DATABASE_URL at import time.
+    """
+    out = subprocess.run(
+        [sys.executable, "-m", module, "--child", *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def print_table(rows: List[Dict[str, Any]], columns: List[str]) -> None:
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
@@ -0,0 +1,104 @@
+"""Compare two load-test baselines written by ``benchmarks.loadtest --save``.
+
+    python -m benchmarks.compare_baselines base.json new.json [--threshold 0.10] [--slack-ms 5]
+
+Prints per-endpoint p50/p95/p99 and SQL statement counts side by side with
+the relative change, plus overall throughput. Exits 1 when the new run
+regressed:
+
+- an endpoint's p95 or p99 grew by more than `--threshold` (and by more than
+  `--slack-ms`, so sub-millisecond noise on fast routes doesn't count);
+- an endpoint runs more SQL statements per request than before;
+- lifecycle throughput dropped by more than `--threshold`;
+- lifecycles failed that didn't before.
+
+Runs are only comparable under the same load configuration; a differing
+config is reported before the table.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+from .common import print_table
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _change(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "-"
+    if not old:
+        return "new" if new else "0%"
+    return f"{(new - old) / old:+.0%}"
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, slack_ms: float) -> List[str]:
+    """Print the comparison and return the regressions found."""
+    regressions: List[str] = []
+    old_config, new_config = base["meta"]["config"], new["meta"]["config"]
+    for key in sorted(set(old_config) | set(new_config)):
+        if old_config.get(key) != new_config.get(key):
+            print(f"config differs: {key} {old_config.get(key)!r} -> {new_config.get(key)!r}")
+
+    rows = []
+    for endpoint in dict.fromkeys([*base["endpoints"], *new["endpoints"]]):
+        old, cur = base["endpoints"].get(endpoint), new["endpoints"].get(endpoint)
+        if old is None or cur is None:
+            rows.append({"endpoint": endpoint, "p95_ms": "only in " + ("new" if old is None else "base")})
+            continue
+        row = {"endpoint": endpoint}
+        for stat in ("p50_ms", "p95_ms", "p99_ms", "db_statements"):
+            row[stat] = f"{old[stat]} -> {cur[stat]} ({_change(old[stat], cur[stat])})"
+        rows.append(row)
+
+        for stat in ("p95_ms", "p99_ms"):
+            grew = cur[stat] - old[stat]
+            if grew > slack_ms and grew > old[stat] * threshold:
+                regressions.append(f"{endpoint} {stat} {old[stat]} -> {cur[stat]}")
+        if old["db_statements"] is not None and cur["db_statements"] is not None:
+            if cur["db_statements"] > old["db_statements"]:
+                regressions.append(f"{endpoint} db_statements {old['db_statements']} -> {cur['db_statements']}")
+
+    print_table(rows, ["endpoint", "p50_ms", "p95_ms", "p99_ms", "db_statements"])
+
+    old_totals, new_totals = base["totals"], new["totals"]
+    print(
+        f"\nlifecycles/s {old_totals['lifecycles_per_s']} -> {new_totals['lifecycles_per_s']} "
+        f"({_change(old_totals['lifecycles_per_s'], new_totals['lifecycles_per_s'])}), "
+        f"requests/s {old_totals['requests_per_s']} -> {new_totals['requests_per_s']}, "
+        f"failed {old_totals['lifecycles_failed']} -> {new_totals['lifecycles_failed']}"
+    )
+    if new_totals["lifecycles_per_s"] < old_totals["lifecycles_per_s"] * (1 - threshold):
+        regressions.append(f"lifecycles/s {old_totals['lifecycles_per_s']} -> {new_totals['lifecycles_per_s']}")
+    if new_totals["lifecycles_failed"] > old_totals["lifecycles_failed"]:
+        regressions.append(f"failed lifecycles {old_totals['lifecycles_failed']} -> {new_totals['lifecycles_failed']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="Latency growth always tolerated")
+    args = parser.parse_args()
+
+    base, new = _load(args.base), _load(args.new)
+    print(f"base {base['meta'].get('git_commit')} ({base['meta']['created_at']}) "
+          f"vs new {new['meta'].get('git_commit')} ({new['meta']['created_at']})\n")
+    regressions = compare(base, new, args.threshold, args.slack_ms)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""End-to-end load test: whole interview lifecycles against local upstream stand-ins.
+
+    python -m benchmarks.loadtest [--concurrency 8] [--lifecycles 40] [--answers 5] [--polls 1]
+        [--gemini-latency lognormal:300:0.5] [--gemini-error-rate 0] [--tavus-latency lognormal:150:0.3]
+        [--tavus-error-rate 0] [--database-url URL] [--env KEY=VALUE ...] [--save baseline.json]
+
+Starts the Gemini/Tavus stand-ins (`benchmarks.upstream_standins`) and the
+API under uvicorn pointed at them, then has `--concurrency` virtual users
+run `--lifecycles` interviews between them, each one:
+
+    register -> enrich profile -> start interview -> answer each question
+    (polling the live transcript `--polls` times after every answer)
+    -> finish -> fetch feedback
+
+Reports throughput and per-endpoint latency (p50/p95/p99, keyed by route
+template) plus the SQL statements each endpoint ran, taken from the API's
+own ``/metrics``. `--save` writes the results as a JSON baseline for
+``python -m benchmarks.compare_baselines``.
+
+Shed requests (503 + Retry-After from the password-hashing pool) are
+retried after the advertised delay and counted separately; any other
+failure abandons that user's lifecycle.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from . import upstream_standins
+from .common import print_table, serve_api, summarize_ms, use_database
+
+MAX_SHED_RETRIES = 10
+
+
+class LifecycleFailed(Exception):
+    pass
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.shed: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        with self._lock:
+            if status == 503:
+                self.shed[endpoint] += 1
+            elif status >= 400:
+                self.errors[endpoint] += 1
+            else:
+                self.latencies[endpoint].append(seconds)
+
+
+class _User:
+    """One virtual user: a keep-alive session and the bearer token once registered."""
+
+    def __init__(self, base: str, recorder: _Recorder) -> None:
+        self.base = base
+        self.recorder = recorder
+        self.session = requests.Session()
+
+    def call(self, method: str, route: str, body: Optional[Dict[str, Any]] = None, **params: Any) -> Dict[str, Any]:
+        endpoint = f"{method} {route}"
+        url = self.base + route.format(**params)
+        for _ in range(MAX_SHED_RETRIES):
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, json=body, timeout=120)
+            except requests.RequestException as exc:
+                self.recorder.record(endpoint, time.perf_counter() - start, 599)
+                raise LifecycleFailed(f"{endpoint}: {exc}") from exc
+            self.recorder.record(endpoint, time.perf_counter() - start, resp.status_code)
+            if resp.status_code == 503 and "Retry-After" in resp.headers:
+                time.sleep(float(resp.headers["Retry-After"]))
+                continue
+            if resp.status_code >= 400:
+                raise LifecycleFailed(f"{endpoint}: {resp.status_code} {resp.text[:200]}")
+            return resp.json()
+        raise LifecycleFailed(f"{endpoint}: still shed after {MAX_SHED_RETRIES} attempts")
+
+    def lifecycle(self, n: int, run_id: str, interviewer_id: int, args: argparse.Namespace) -> None:
+        auth = self.call("POST", "/api/auth/register", {
+            "name": f"Load User {n}",
+            "email": f"load-{run_id}-{n}@bench",
+            "password": "load-test-password",
+        })
+        self.session.headers["Authorization"] = f"Bearer {auth['access_token']}"
+        self.call("POST", "/api/profile/enrich", {
+            "tech_stack": ["Python", "FastAPI", "PostgreSQL"],
+            "target_role": "Backend Engineer",
+            "resume_text": "Backend engineer, four years of Python services and SQL tuning.",
+        })
+        started = self.call("POST", "/api/interview/start", {
+            "interview_type": "technical",
+            "skills": ["Python", "SQL"],
+            "interviewer_id": interviewer_id,
+        })
+        interview_id = started["interview_id"]
+        for question in started["questions"][:args.answers]:
+            self.call(
+                "POST", "/api/interview/{interview_id}/questions/{question_id}/answer",
+                {"answer_text": f"I would start by measuring, then fix the biggest cost first. ({question['text'][:40]})"},
+                interview_id=interview_id, question_id=question["question_id"],
+            )
+            for _ in range(args.polls):
+                self.call("GET", "/api/interview/{interview_id}/transcript", interview_id=interview_id)
+        self.call("POST", "/api/interview/{interview_id}/finish", interview_id=interview_id)
+        self.call("GET", "/api/interview/{interview_id}/feedback", interview_id=interview_id)
+
+
+# --- Server-side statement counts ----------------------------------------------------
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _scrape(base: str, token: str) -> Dict[Tuple[str, str], float]:
+    """``db_queries_per_request`` and ``db_time_per_request_seconds`` sums/counts by (sample, endpoint)."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    text = requests.get(f"{base}/metrics", headers=headers, timeout=30).text
+    samples: Dict[Tuple[str, str], float] = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match or not match.group(1).startswith(("db_queries_per_request_", "db_time_per_request_seconds_")):
+            continue
+        if match.group(1).endswith("_bucket"):
+            continue
+        labels = dict(_LABEL.findall(match.group(2)))
+        samples[(match.group(1), f"{labels.get('method')} {labels.get('route')}")] = float(match.group(3))
+    return samples
+
+
+def _db_per_request(before: Dict, after: Dict, endpoint: str) -> Tuple[Optional[float], Optional[float]]:
+    def delta(name: str) -> float:
+        return after.get((name, endpoint), 0.0) - before.get((name, endpoint), 0.0)
+
+    requests_seen = delta("db_queries_per_request_count")
+    if not requests_seen:
+        return None, None
+    return (
+        round(delta("db_queries_per_request_sum") / requests_seen, 2),
+        round(delta("db_time_per_request_seconds_sum") / requests_seen * 1000, 3),
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    database_url = use_database(args.database_url)
+    gemini, tavus = upstream_standins.behaviours(args)
+    standins = upstream_standins.start("127.0.0.1", 0, gemini, tavus)
+    env = {
+        "DATABASE_URL": database_url,
+        "GEMINI_BASE_URL": f"{standins.url}/v1",
+        "GEMINI_API_KEY": "standin",
+        "TAVUS_BASE_URL": standins.url,
+        "TAVUS_API_KEY": "standin",
+        "TAVUS_PERSONA_ID": "standin",
+        "TRACE_EXPORTER": "none",
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    token = env.get("METRICS_TOKEN") or os.environ.get("METRICS_TOKEN", "")
+    recorder = _Recorder()
+    failures: List[str] = []
+    completed = 0
+    try:
+        with serve_api(env) as base:
+            interviewer_id = requests.post(f"{base}/api/auth/register_admin", timeout=60).json()["user_id"]
+            before = _scrape(base, token)
+            run_id = uuid.uuid4().hex[:8]
+            numbers = itertools.count()
+            lock = threading.Lock()
+
+            def virtual_user() -> None:
+                nonlocal completed
+                while (n := next(numbers)) < args.lifecycles:
+                    try:
+                        _User(base, recorder).lifecycle(n, run_id, interviewer_id, args)
+                    except LifecycleFailed as exc:
+                        with lock:
+                            failures.append(str(exc))
+                        continue
+                    with lock:
+                        completed += 1
+
+            threads = [threading.Thread(target=virtual_user) for _ in range(args.concurrency)]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            wall = time.perf_counter() - started
+            after = _scrape(base, token)
+    finally:
+        standins.shutdown()
+
+    endpoints: Dict[str, Dict[str, Any]] = {}
+    for endpoint in dict.fromkeys([*recorder.latencies, *recorder.errors, *recorder.shed]):
+        statements, db_ms = _db_per_request(before, after, endpoint)
+        endpoints[endpoint] = {
+            **summarize_ms(recorder.latencies[endpoint]),
+            "errors": recorder.errors[endpoint],
+            "shed": recorder.shed[endpoint],
+            "db_statements": statements,
+            "db_ms": db_ms,
+        }
+    total_requests = sum(e["n"] + e["errors"] + e["shed"] for e in endpoints.values())
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "config": {
+                "concurrency": args.concurrency,
+                "lifecycles": args.lifecycles,
+                "answers": args.answers,
+                "polls": args.polls,
+                "gemini_latency": args.gemini_latency,
+                "gemini_error_rate": args.gemini_error_rate,
+                "tavus_latency": args.tavus_latency,
+                "tavus_error_rate": args.tavus_error_rate,
+                "database": database_url.split(":", 1)[0],
+                "env": args.env,
+            },
+        },
+        "totals": {
+            "wall_s": round(wall, 3),
+            "lifecycles_completed": completed,
+            "lifecycles_failed": len(failures),
+            "lifecycles_per_s": round(completed / wall, 3),
+            "requests": total_requests,
+            "requests_per_s": round(total_requests / wall, 2),
+            "upstream": standins.stats(),
+        },
+        "endpoints": endpoints,
+        "failures": failures[:20],
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    rows = [{"endpoint": name, **stats} for name, stats in result["endpoints"].items()]
+    print_table(rows, ["endpoint", "n", "errors", "shed", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "db_statements", "db_ms"])
+    totals = result["totals"]
+    print(
+        f"\n{totals['lifecycles_completed']} lifecycles in {totals['wall_s']}s "
+        f"({totals['lifecycles_per_s']}/s, {totals['requests_per_s']} requests/s), "
+        f"{totals['lifecycles_failed']} failed"
+    )
+    for service, stats in totals["upstream"].items():
+        print(f"{service}: {stats['calls']} calls, {stats['injected_errors']} injected errors")
+    for failure in result["failures"][:5]:
+        print(f"  failed: {failure}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users")
+    parser.add_argument("--lifecycles", type=int, default=40, help="Interviews to run in total")
+    parser.add_argument("--answers", type=int, default=5, help="Questions answered per interview")
+    parser.add_argument("--polls", type=int, default=1, help="Transcript polls after each answer")
+    upstream_standins.add_arguments(parser)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra API settings")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as out:
+            json.dump(result, out, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
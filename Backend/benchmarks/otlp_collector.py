@@ -0,0 +1,66 @@
+"""Local stand-in for an OpenTelemetry collector (OTLP/HTTP, JSON encoding).
+
+    python -m benchmarks.otlp_collector [--port 4318] [--out spans.jsonl]
+
+Run the API with ``TRACE_EXPORTER=otlp`` (the default TRACE_OTLP_ENDPOINT
+points here) and every exported span is appended to `--out` as one JSON
+line, with a one-line summary per received trace printed to stdout.
+"""
+
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="spans.jsonl")
+    args = parser.parse_args()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError:
+                self.send_error(400, "Body is not JSON")
+                return
+            traces = defaultdict(list)
+            with lock, open(args.out, "a", encoding="utf-8") as out:
+                for resource in body.get("resourceSpans", []):
+                    for scope in resource.get("scopeSpans", []):
+                        for span in scope.get("spans", []):
+                            out.write(json.dumps(span) + "\n")
+                            traces[span["traceId"]].append(span)
+            for trace_id, spans in traces.items():
+                ids = {s["spanId"] for s in spans}
+                # The server span; its parent, if any, lives in the calling service
+                root = next((s for s in spans if s.get("parentSpanId") not in ids), spans[0])
+                ms = (int(root["endTimeUnixNano"]) - int(root["startTimeUnixNano"])) / 1e6
+                print(f"{trace_id}  {root['name']:<50} {ms:9.1f} ms  {len(spans)} spans", flush=True)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Collecting OTLP traces on http://{args.host}:{args.port}/v1/traces into {args.out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Local stand-ins for the Gemini and Tavus APIs, for load tests.
+
+    python -m benchmarks.upstream_standins [--port 8600] [--gemini-latency lognormal:300:0.5]
+        [--gemini-error-rate 0.01] [--tavus-latency fixed:150] [--tavus-error-rate 0]
+
+Point the API at it with ``GEMINI_BASE_URL=http://127.0.0.1:8600/v1`` and
+``TAVUS_BASE_URL=http://127.0.0.1:8600`` (any GEMINI_API_KEY, TAVUS_API_KEY
+and TAVUS_PERSONA_ID will do). Gemini answers are shaped after the prompt
+(question lists, answer scores, profile summaries, interview evaluations,
+free text), so every route takes its normal success path. Tavus keeps
+conversations in memory; each transcript fetch adds a turn, like a live call.
+
+Latency is drawn per call from a distribution:
+
+- ``fixed:MS``
+- ``uniform:LO_MS:HI_MS``
+- ``lognormal:MEDIAN_MS:SIGMA`` (the usual shape of LLM latencies)
+
+and a share of calls (`--*-error-rate`) fails with a 503 after that delay.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class Behaviour:
+    """Latency distribution and injected error rate of one stand-in service."""
+
+    latency: str = "fixed:0"
+    error_rate: float = 0.0
+
+    def __post_init__(self) -> None:
+        kind, *params = self.latency.split(":")
+        try:
+            values = [float(p) for p in params]
+        except ValueError:
+            values = []
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if expected.get(kind) != len(values):
+            raise ValueError(
+                f"Bad latency {self.latency!r}; use fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA"
+            )
+        self._kind, self._params = kind, values
+
+    def delay(self) -> float:
+        """One latency sample in seconds."""
+        if self._kind == "fixed":
+            ms = self._params[0]
+        elif self._kind == "uniform":
+            ms = random.uniform(*self._params)
+        else:
+            median, sigma = self._params
+            ms = median * random.lognormvariate(0, sigma)
+        return max(ms, 0.0) / 1000
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+# --- Gemini ----------------------------------------------------------------------------
+
+_questions = itertools.count()
+_topics = ["concurrency", "indexing", "caching", "testing", "API design", "deployments", "profiling"]
+
+
+def _gemini_text(prompt: str, has_file: bool) -> str:
+    if has_file:
+        return "Jane Doe\nSoftware Engineer\nExperience: Python, FastAPI, PostgreSQL\nProjects: Interview platform"
+    if "JSON list of strings" in prompt:
+        match = re.search(r"Generate (\d+)", prompt)
+        count = int(match.group(1)) if match else 5
+        # Distinct per call, so the repeat-question filter keeps every one
+        return json.dumps([
+            f"Question {n}: how would you approach {_topics[n % len(_topics)]} in your last project?"
+            for n in itertools.islice(_questions, count)
+        ])
+    if "relevance_score" in prompt:
+        return json.dumps({"relevance_score": random.randint(5, 9), "confidence_level": random.randint(5, 9)})
+    if "resume_summary" in prompt:
+        return json.dumps({
+            "resume_summary": "Backend engineer with four years of Python and SQL experience.",
+            "skills": ["Python", "FastAPI", "SQL"],
+        })
+    if "overall_score" in prompt:
+        return json.dumps({
+            "overall_score": random.randint(55, 90),
+            "comments": "Clear answers with good technical depth; stayed on the questions asked.",
+            "suggestions": "Quantify impact in examples. Practise system design trade-offs.",
+        })
+    return "You are interviewing a backend candidate. Ask one question at a time and keep a friendly tone."
+
+
+def _gemini(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    parts = [p for c in body.get("contents") or [] for p in c.get("parts") or []]
+    prompt = "\n".join(p.get("text", "") for p in parts)
+    text = _gemini_text(prompt, any("inlineData" in p for p in parts))
+    return 200, {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+# --- Tavus -----------------------------------------------------------------------------
+
+_LINES = [
+    ("conversational_ai", "Hi, thanks for joining. Could you walk me through your recent work?"),
+    ("user", "Sure, I have been building APIs in Python and tuning our Postgres queries."),
+    ("conversational_ai", "What was the hardest performance problem you solved there?"),
+    ("user", "An N+1 query pattern on our dashboard; batching the loads cut latency in half."),
+]
+
+
+class _Conversations:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._transcripts: Dict[str, List[Dict[str, str]]] = {}
+
+    def create(self, base: str) -> Dict[str, Any]:
+        conv_id = f"c{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._transcripts[conv_id] = []
+        return {"conversation_id": conv_id, "conversation_url": f"{base}/room/{conv_id}", "status": "active"}
+
+    def fetch(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            transcript = self._transcripts.get(conv_id)
+            if transcript is None:
+                return None
+            role, text = _LINES[len(transcript) % len(_LINES)]
+            transcript.append({"role": role, "text": text, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+            return {"conversation_id": conv_id, "status": "active", "transcript": list(transcript)}
+
+    def exists(self, conv_id: str) -> bool:
+        with self._lock:
+            return conv_id in self._transcripts
+
+
+# --- Server ----------------------------------------------------------------------------
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Serves ``/v1/models/*:generateContent`` (Gemini) and ``/v2/conversations*`` (Tavus)."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], gemini: Behaviour, tavus: Behaviour) -> None:
+        super().__init__(address, _Handler)
+        self.behaviours = {"gemini": gemini, "tavus": tavus}
+        self.conversations = _Conversations()
+        self.calls: Counter = Counter()
+        self.injected_errors: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, service: str, failed: bool) -> None:
+        with self._lock:
+            self.calls[service] += 1
+            if failed:
+                self.injected_errors[service] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {s: {"calls": self.calls[s], "injected_errors": self.injected_errors[s]} for s in self.behaviours}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StandinServer
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        path = self.path.split("?", 1)[0]
+        service = "gemini" if path.startswith("/v1/") else "tavus" if path.startswith("/v2/") else None
+        if service is None:
+            self._reply(404, {"error": "unknown path"})
+            return
+
+        behaviour = self.server.behaviours[service]
+        failed = behaviour.fails()
+        self.server.count(service, failed)
+        time.sleep(behaviour.delay())
+        if failed:
+            self._reply(503, {"error": {"code": 503, "message": "stand-in injected failure"}})
+            return
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            self._reply(400, {"error": "body is not JSON"})
+            return
+        self._reply(*(self._gemini(method, path, body) if service == "gemini" else self._tavus(method, path)))
+
+    def _gemini(self, method: str, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if method != "POST" or not path.endswith(":generateContent"):
+            return 404, {"error": "unknown Gemini endpoint"}
+        return _gemini(body)
+
+    def _tavus(self, method: str, path: str) -> Tuple[int, Dict[str, Any]]:
+        if not self.headers.get("x-api-key"):
+            return 401, {"message": "missing x-api-key"}
+        segments = path.strip("/").split("/")[1:]  # drop "v2"
+        conversations = self.server.conversations
+        if segments == ["conversations"] and method == "POST":
+            return 200, conversations.create(self.server.url)
+        if len(segments) == 2 and segments[0] == "conversations" and method == "GET":
+            detail = conversations.fetch(segments[1])
+            return (200, detail) if detail else (404, {"message": "conversation not found"})
+        if len(segments) == 3 and segments[2] in ("end", "messages") and method == "POST":
+            if not conversations.exists(segments[1]):
+                return 404, {"message": "conversation not found"}
+            return 200, {"conversation_id": segments[1], "status": "ended" if segments[2] == "end" else "active"}
+        return 404, {"message": "unknown Tavus endpoint"}
+
+    def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start(host: str, port: int, gemini: Behaviour, tavus: Behaviour) -> StandinServer:
+    """Serve the stand-ins from a daemon thread; call ``shutdown()`` when done."""
+    server = StandinServer((host, port), gemini, tavus)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--gemini-latency", default="lognormal:300:0.5", help="fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--tavus-latency", default="lognormal:150:0.3")
+    parser.add_argument("--tavus-error-rate", type=float, default=0.0)
+
+
+def behaviours(args: argparse.Namespace) -> Tuple[Behaviour, Behaviour]:
+    return (
+        Behaviour(args.gemini_latency, args.gemini_error_rate),
+        Behaviour(args.tavus_latency, args.tavus_error_rate),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = StandinServer((args.host, args.port), *behaviours(args))
+    print(f"Gemini stand-in on {server.url}/v1, Tavus stand-in on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()